@@ -1,17 +1,36 @@
 from typing import List
 from typing import List, Dict, Any
 import os
-import time
 import json
-from pydantic import BaseModel, Field
-from typing import List, Dict, Union
+import operator
+from pydantic import BaseModel, Field, SkipValidation
+from functools import partial
+from typing import Annotated, Callable, List, Dict, Optional, Sequence, Union
 from langchain_anthropic import ChatAnthropic
 from langgraph.graph import StateGraph, END
-import requests
-from bs4 import BeautifulSoup
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from dotenv import load_dotenv
-import tiktoken
 from notion_client import Client
+from llm import ModelCall, TokenCallback, call_model
+from reducers import append_messages
+from llm_cache import cache_enabled, configure_cache, get_cache
+from mapreduce import ARTICLE_MODES, estimate_note_calls, map_reduce_notes, notes_article_prompt
+from context_window import CONTEXT_TOKEN_BUDGET, build_context, evicted_turns, update_digest
+from panel import DEBATE_MODES, fan_out
+from fake_llm import fake_model_from_env
+from costs import call_record
+from metrics import serve_from_env, timed_node
+from tracing import run_trace, traced_node
+from budget import (BudgetExceeded, RunBudget, estimate_tokens_cost, get_governor,
+                    max_output_tokens)
+from dedup import dedup_mode, get_duplicate_index
+from feeds import auto_topic
+from fetcher import fetch_title
+from ingest import resolve_topics
+from notion_blocks import NotionWriter, PartialPageError
+from notion_outbox import PUBLISHED_STATUSES, get_worker, pending_id, pending_url
+from notion_schema import NotionSchema, get_schema, invalidate_schema, is_schema_error
+from checkpoints import get_checkpointer, new_run_id, recent_runs, run_config, run_personas
 import streamlit as st
 from typing import List, Dict, Any
 
@@ -34,21 +53,31 @@ if NOTION_TOKEN and NOTION_DATABASE_ID:
         # Streamlit에서는 st.warning을 사용하지만 여기서는 초기화 단계이므로 패스
 
 # 상태 정의
+# messages와 토큰/비용은 리듀서로 누적됩니다 (messages는 append-only 로그)
 
 
 class ConversationState(BaseModel):
     topic: str
-    messages: List[Dict[str, str]] = Field(default_factory=list)
+    messages: Annotated[List[Dict[str, str]], SkipValidation,
+                        append_messages] = Field(default_factory=list)
     summary: str = ""
     content: str = ""
-    input_tokens: int = 0
-    output_tokens: int = 0
-    cost: float = 0.0
+    input_tokens: Annotated[int, operator.add] = 0
+    output_tokens: Annotated[int, operator.add] = 0
+    cost: Annotated[float, operator.add] = 0.0
     title: str = ""
     subtitle: str = ""
     description: str = ""
     slug: str = ""
     notion_url: str = ""
+    personas: List[str] = Field(default_factory=list)  # 실행을 재개할 때 같은 현인을 다시 구성
+    article_mode: str = "single"  # "map_reduce"이면 구간별 노트를 거쳐 기사를 작성
+    digest: str = ""  # 최근 창에서 밀려난 턴의 누적 요약
+    turn_input_tokens: Annotated[List[int], operator.add] = Field(default_factory=list)
+    debate_mode: str = "round_robin"  # "panel"이면 라운드마다 모든 현인이 동시에 답변
+    duplicate_of: str = ""  # 비슷한 주제의 지난 기사를 재사용했으면 그 기사의 주제
+    budget_exceeded: str = ""  # 예산 때문에 실행을 멈췄으면 그 이유
+    calls: Annotated[List[Dict[str, Any]], operator.add] = Field(default_factory=list)  # 호출별 비용 기록
 
 # AI 현인 페르소나 정의
 
@@ -58,46 +87,27 @@ class AISage(BaseModel):
     instruction: str
     color: str
 
-# 토큰 계산 함수
-
-
-def count_tokens(text: str) -> int:
-    encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
-
-# 비용 계산 함수
-
-
-def calculate_cost(input_tokens: int, output_tokens: int, model: str) -> float:
-    if model == "claude-3-opus-20240229":
-        input_cost_per_1k = 0.015
-        output_cost_per_1k = 0.075
-    elif model == "claude-3-5-sonnet-20240620":
-        input_cost_per_1k = 0.003
-        output_cost_per_1k = 0.015
-    else:
-        raise ValueError("Unsupported model")
+# 도구 정의
 
-    input_cost = (input_tokens / 1000) * input_cost_per_1k
-    output_cost = (output_tokens / 1000) * output_cost_per_1k
-    return input_cost + output_cost
 
-# 도구 정의
+# 주제를 정하지 못했을 때 쓰는 대체 주제. 실행마다 같은 문자열이므로 중복 감지에서 제외합니다
+NO_TITLE_TOPIC = "웹 페이지 제목을 찾을 수 없습니다"
+FETCH_FAILED_TOPIC = "URL에서 주제를 가져오는데 실패했습니다"
+DEFAULT_TOPIC = "최신 AI 기술 동향"
+FALLBACK_TOPICS = (NO_TITLE_TOPIC, FETCH_FAILED_TOPIC, DEFAULT_TOPIC)
 
 
 def get_topic(input: Union[str, None] = None) -> str:
     if input:
         if input.startswith("http"):
             try:
-                response = requests.get(input)
-                soup = BeautifulSoup(response.text, 'html.parser')
-                return soup.title.string or "웹 페이지 제목을 찾을 수 없습니다"
-            except:
-                return "URL에서 주제를 가져오는데 실패했습니다"
+                return fetch_title(input) or NO_TITLE_TOPIC
+            except Exception:
+                return FETCH_FAILED_TOPIC
         else:
             return input
     else:
-        return "최신 AI 기술 동향"
+        return auto_topic() or DEFAULT_TOPIC
 
 
 def generate_summary(conversation: List[Dict[str, str]]) -> str:
@@ -114,13 +124,16 @@ def create_content(summary: str, conversation: List[Dict[str, str]]) -> str:
     return content
 
 
+DEBATE_MESSAGES = int(os.getenv("DEBATE_MESSAGES", 5))
+
+
 def evaluate_conversation(state: ConversationState) -> bool:
-    return len(state.messages) >= 5 or state.cost >= 50.0
+    return len(state.messages) >= DEBATE_MESSAGES or state.cost >= 50.0
 
 
 # LLM 모델 설정
 model_name = "claude-3-5-sonnet-20240620"
-model = ChatAnthropic(model=model_name)
+model = fake_model_from_env() or ChatAnthropic(model=model_name)
 
 # JSON 파일에서 페르소나 로드
 
@@ -130,23 +143,111 @@ def load_personas(file_path: str) -> List[AISage]:
         data = json.load(f)
     return [AISage(**persona) for persona in data['personas']]
 
-# 노드 함수 정의
+# 스트리밍 콜백: (역할, 텍스트 조각)
+StreamCallback = Callable[[str, str], None]
+ARTICLE_ROLE = "기사"
 
 
-def initiate_conversation(state: ConversationState):
+def role_stream(on_token: Optional[StreamCallback], role: str) -> Optional[TokenCallback]:
+    if on_token is None:
+        return None
+    return lambda text: on_token(role, text)
+
+
+class StreamlitStreamer:
+    """스트리밍된 토큰을 st.empty() 자리표시자에 바로 그립니다."""
+
+    def __init__(self, placeholder):
+        self.placeholder = placeholder
+        self.role: Optional[str] = None
+        self.text = ""
+
+    def __call__(self, role: str, text: str):
+        if role != self.role:
+            self.role = role
+            self.text = ""
+        self.text += text
+        self.placeholder.markdown(f"**{role}**: {self.text}▌")
+
+    def finish(self):
+        self.placeholder.empty()
+        self.role = None
+        self.text = ""
+
+# 노드 함수 정의
+# 노드는 전체 상태 대신 변경분만 반환하고, LangGraph 리듀서가 이를 누적합니다.
+
+
+def usage_update(node: str, *results: ModelCall, personas: Sequence[str] = ()) -> Dict[str, Any]:
+    return {
+        "input_tokens": sum(result.input_tokens for result in results),
+        "output_tokens": sum(result.output_tokens for result in results),
+        "cost": sum(result.cost for result in results),
+        "calls": [call_record(node, result, persona) for result, persona in
+                  zip(results, [*personas, *[""] * (len(results) - len(personas))])]
+    }
+
+
+def run_budget(state: ConversationState) -> Optional[RunBudget]:
+    governor = get_governor()
+    return governor.run(state.cost) if governor is not None else None
+
+
+REUSED_FIELDS = ("title", "subtitle", "description", "slug", "content", "notion_url")
+
+
+def duplicate_update(topic: str) -> Optional[Dict[str, Any]]:
+    """비슷한 주제로 쓴 지난 기사가 있으면 토론 없이 그 기사로 끝내는 변경분을 반환합니다."""
+    index = get_duplicate_index()
+    if index is None or topic in FALLBACK_TOPICS:
+        return None
+    match = index.find_topic(topic)
+    if match is None:
+        return None
+    st.warning(f"비슷한 주제의 지난 기사가 있습니다 (유사도 {match['similarity']:.2f}): "
+               f"{match['topic']}")
+    if dedup_mode() != "reuse":
+        return None
+    page_url = reusable_page_url(match["notion_url"])
+    if page_url is None:
+        st.info("지난 기사의 Notion 페이지가 없어 새로 토론합니다.")
+        return None
+    return {"topic": topic, "duplicate_of": match["topic"],
+            **{field: match[field] for field in REUSED_FIELDS}, "notion_url": page_url}
+
+
+def page_reference(notion_url: str) -> str:
+    """색인에 기록할 페이지 URL 또는 아웃박스 대기 표시. 저장 실패/미설정 문구는 기록하지 않습니다."""
+    if notion_url.startswith("https://") or pending_id(notion_url) is not None:
+        return notion_url
+    return ""
+
+
+def reusable_page_url(notion_url: str) -> Optional[str]:
+    """지난 기사의 페이지 URL. 게시 대기 중이면 아웃박스 상태를 확인하고, 페이지가 없으면 None."""
+    if notion_url.startswith("https://"):
+        return notion_url
+    item_id = pending_id(notion_url)
+    worker = get_worker(publish_article) if item_id is not None else None
+    item = worker.outbox.get(item_id) if worker is not None else None
+    if item is None or item["status"] == "failed":
+        return None
+    return item["url"] if item["status"] in PUBLISHED_STATUSES else notion_url
+
+
+def initiate_conversation(state: ConversationState, on_token: Optional[StreamCallback] = None):
     topic = get_topic(state.topic)
+    duplicate = duplicate_update(topic)
+    if duplicate is not None:
+        return duplicate
     prompt = f"'{topic}'에 대해 토론을 시작해주세요."
-    input_tokens = count_tokens(prompt)
-    response = model.invoke(prompt)
-    output_tokens = count_tokens(response.content)
-    cost = calculate_cost(input_tokens, output_tokens, model_name)
-    return ConversationState(
-        topic=topic,
-        messages=[{"role": "assistant", "content": response.content}],
-        input_tokens=input_tokens,
-        output_tokens=output_tokens,
-        cost=cost
-    )
+    result = call_model(model, model_name, prompt,
+                        role_stream(on_token, "assistant"), budget=run_budget(state))
+    return {
+        "topic": topic,
+        "messages": [{"role": "assistant", "content": result.content}],
+        **usage_update("initiate", result)
+    }
 
 
 def get_messages(state: Any) -> List[Dict[str, str]]:
@@ -167,67 +268,77 @@ def get_state_value(state: Any, key: str, default: Any = None) -> Any:
         return default
 
 
-def continue_conversation(state: Any, sages: List[AISage]) -> Any:
-    messages = get_messages(state)
+def continue_conversation(state: ConversationState, sages: List[AISage],
+                          on_token: Optional[StreamCallback] = None) -> Dict[str, Any]:
+    messages = state.messages
     sage = sages[len(messages) % len(sages)]
-    last_message = messages[-1]["content"] if messages else ""
-    prompt = f"{sage.instruction} 이전 메시지를 고려하여 대화를 계속하세요: {last_message}"
-    input_tokens = count_tokens(prompt)
-    response = model.invoke(prompt)
-    output_tokens = count_tokens(response.content)
-    new_cost = calculate_cost(input_tokens, output_tokens, model_name)
-    new_message = {"role": sage.name, "content": response.content}
-
-    if isinstance(state, ConversationState):
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages + [new_message],
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens + input_tokens,
-            output_tokens=state.output_tokens + output_tokens,
-            cost=state.cost + new_cost
-        )
-    elif isinstance(state, dict):
-        new_state = state.copy()
-        new_state['messages'] = state.get('messages', []) + [new_message]
-        new_state['input_tokens'] = state.get('input_tokens', 0) + input_tokens
-        new_state['output_tokens'] = state.get(
-            'output_tokens', 0) + output_tokens
-        new_state['cost'] = state.get('cost', 0.0) + new_cost
-        return new_state
-    else:
-        raise ValueError("Unexpected state type")
+    # 최근 턴과 이전 턴 요약을 토큰 예산 안에서 전달합니다
+    context = build_context(state.digest, messages)
+    prompt = f"{sage.instruction} 아래 토론 맥락을 고려하여 대화를 계속하세요:\n\n{context}"
+    result = call_model(model, model_name, prompt,
+                        role_stream(on_token, sage.name), budget=run_budget(state))
+    return debate_update(state, [sage], [result])
+
+
+def panel_round(state: ConversationState, sages: List[AISage],
+                on_token: Optional[StreamCallback] = None) -> Dict[str, Any]:
+    # 모든 현인에게 같은 맥락으로 동시에 질문합니다. Streamlit은 스크립트 스레드에서만
+    # 그릴 수 있으므로 답변은 모두 받은 뒤 현인 순서대로 표시합니다.
+    context = build_context(state.digest, state.messages)
+    budget = run_budget(state)
+    results = fan_out([
+        partial(call_model, model, model_name,
+                f"{sage.instruction} 아래 토론 맥락을 고려하여 대화를 계속하세요:\n\n{context}",
+                budget=budget)
+        for sage in sages])
+    update = debate_update(state, sages, results)
+    if on_token is not None:
+        for message in update["messages"]:
+            on_token(message["role"], message["content"])
+    return update
+
+
+def debate_update(state: ConversationState, sages: List[AISage],
+                  results: List[ModelCall]) -> Dict[str, Any]:
+    new = [{"role": sage.name, "content": result.content}
+           for sage, result in zip(sages, results)]
+    update = {
+        "messages": new,
+        "turn_input_tokens": [result.input_tokens for result in results],
+        **usage_update("panel" if state.debate_mode == "panel" else "continue", *results,
+                       personas=[sage.name for sage in sages])
+    }
+    evicted = evicted_turns(state.messages, new)
+    if evicted:
+        update["digest"] = update_digest(state.digest, evicted)
+    return update
 
 
 def summarize_conversation(state: ConversationState):
-    summary = generate_summary(state.messages)
-    return ConversationState(**{**state.dict(), "summary": summary})
+    return {"summary": generate_summary(state.messages)}
 
 
-def generate_final_content(state: ConversationState):
-    full_conversation = "\n".join(
-        [f"{msg['role']}: {msg['content']}" for msg in state.messages])
-    prompt = f"""다음 대화를 정리하여 뉴욕타임즈 스타일의 기사를 작성해 보세요. 대화 내용은 다음과 같습니다:
+def generate_final_content(state: ConversationState, on_token: Optional[StreamCallback] = None):
+    budget = run_budget(state)
+    note_calls: List[ModelCall] = []
+    if state.article_mode == "map_reduce":
+        # 구간별 노트를 병렬로 만든 뒤 노트만으로 기사를 작성합니다
+        notes, note_calls = map_reduce_notes(
+            partial(call_model, model, model_name, budget=budget), state.topic, state.messages)
+        prompt = notes_article_prompt(state.topic, notes)
+    else:
+        full_conversation = "\n".join(
+            [f"{msg['role']}: {msg['content']}" for msg in state.messages])
+        prompt = f"""다음 대화를 정리하여 뉴욕타임즈 스타일의 기사를 작성해 보세요. 대화 내용은 다음과 같습니다:
 
 {full_conversation}
 
 이 대화를 바탕으로 뉴욕타임즈 스타일의 기사 본문을 작성해주세요."""
 
-    input_tokens = count_tokens(prompt)
-    response = model.invoke(prompt)
-    output_tokens = count_tokens(response.content)
-    new_cost = calculate_cost(input_tokens, output_tokens, model_name)
-
-    return ConversationState(
-        topic=state.topic,
-        messages=state.messages,
-        summary=state.summary,
-        content=response.content.strip(),
-        input_tokens=state.input_tokens + input_tokens,
-        output_tokens=state.output_tokens + output_tokens,
-        cost=state.cost + new_cost
-    )
+    result = call_model(model, model_name, prompt,
+                        role_stream(on_token, ARTICLE_ROLE), budget=budget)
+
+    return {"content": result.content.strip(), **usage_update("generate", result, *note_calls)}
 
 
 def generate_metadata(state: ConversationState):
@@ -242,13 +353,10 @@ def generate_metadata(state: ConversationState):
 슬러그: [여기에 슬러그 입력]"""
 
     try:
-        input_tokens = count_tokens(prompt)
-        response = model.invoke(prompt)
-        output_tokens = count_tokens(response.content)
-        new_cost = calculate_cost(input_tokens, output_tokens, model_name)
+        result = call_model(model, model_name, prompt, budget=run_budget(state))
 
         # 응답에서 각 항목 추출
-        lines = response.content.strip().split("\n")
+        lines = result.content.strip().split("\n")
         metadata = {}
         for line in lines:
             if ":" in line:
@@ -262,140 +370,133 @@ def generate_metadata(state: ConversationState):
             "..." if state.content else "내용 없음"
         default_slug = "-".join(default_title.lower().split()[:5])
 
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens + input_tokens,
-            output_tokens=state.output_tokens + output_tokens,
-            cost=state.cost + new_cost,
-            title=metadata.get('제목', default_title),
-            subtitle=metadata.get('부제목', default_subtitle),
-            description=metadata.get('요약', default_description),
-            slug=metadata.get('슬러그', default_slug)
-        )
+        return {
+            "title": metadata.get('제목', default_title),
+            "subtitle": metadata.get('부제목', default_subtitle),
+            "description": metadata.get('요약', default_description),
+            "slug": metadata.get('슬러그', default_slug),
+            **usage_update("generate_metadata", result)
+        }
     except Exception as e:
         st.error(f"메타데이터 생성 중 오류 발생: {str(e)}")
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens,
-            output_tokens=state.output_tokens,
-            cost=state.cost,
-            title=state.topic or "무제",
-            subtitle="AI가 생성한 기사",
-            description=state.content[:100] +
+        return {
+            "title": state.topic or "무제",
+            "subtitle": "AI가 생성한 기사",
+            "description": state.content[:100] +
             "..." if state.content else "내용 없음",
-            slug="-".join((state.topic or "무제").lower().split()[:5])
-        )
+            "slug": "-".join((state.topic or "무제").lower().split()[:5])
+        }
 
 
-def save_to_notion(state: ConversationState):
+def notion_page_properties(schema: NotionSchema, state: ConversationState) -> Dict[str, Any]:
+    if not schema.title_field:
+        raise ValueError("Title field not found in the database")
+
+    page_properties = {
+        schema.title_field: {"title": [{"text": {"content": state.title}}]}}
+
+    values = {'Subtitle': state.subtitle, 'Description': state.description, 'Slug': state.slug}
+    for field in schema.text_fields:
+        page_properties[field] = {
+            "rich_text": [{"text": {"content": values[field]}}]}
+    return page_properties
+
+
+def create_notion_page(state: ConversationState) -> Dict[str, Any]:
+    # 속성 구조는 데이터베이스마다 한 번만 조회하고, 속성 오류가 나면 새로 조회해 한 번 재시도합니다
+    for attempt in range(2):
+        schema = get_schema(notion, NOTION_DATABASE_ID)
+        try:
+            # 본문은 블록으로 나누어 첫 100개로 페이지를 만들고 나머지를 이어 붙입니다
+            return NotionWriter(notion).create_page(
+                NOTION_DATABASE_ID, notion_page_properties(schema, state), state.content)
+        except Exception as e:
+            if attempt or not is_schema_error(e):
+                raise
+            invalidate_schema(NOTION_DATABASE_ID)
+
+
+def notion_page_url(page: Dict[str, Any]) -> str:
+    return f"https://www.notion.so/{page['id'].replace('-', '')}"
+
+
+ARTICLE_FIELDS = {"topic", "title", "subtitle", "description", "slug", "content"}
+
+
+def publish_article(payload: Dict[str, Any]) -> str:
+    # 아웃박스 작업자 스레드에서 호출되므로 st를 사용하지 않습니다
+    try:
+        return notion_page_url(create_notion_page(ConversationState(**payload)))
+    except PartialPageError as e:
+        e.url = notion_page_url(e.page)
+        raise
+
+
+def publish_to_notion(state: ConversationState):
     # Notion이 설정되지 않은 경우
     if not notion or not NOTION_DATABASE_ID:
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens,
-            output_tokens=state.output_tokens,
-            cost=state.cost,
-            title=state.title,
-            subtitle=state.subtitle,
-            description=state.description,
-            slug=state.slug,
-            notion_url="Notion 미설정"
-        )
+        return {"notion_url": "Notion 미설정"}
+
+    # 아웃박스에 기록하고 바로 끝냅니다. 게시는 백그라운드 작업자가 재시도하며 처리합니다.
+    worker = get_worker(publish_article)
+    if worker is not None:
+        item_id = worker.submit(state.model_dump(include=ARTICLE_FIELDS))
+        return {"notion_url": pending_url(item_id)}
 
     try:
-        database = notion.databases.retrieve(NOTION_DATABASE_ID)
-        properties = database.get('properties', {})
-
-        page_properties = {}
-
-        title_field = next((k for k, v in properties.items()
-                           if v['type'] == 'title'), None)
-        if not title_field:
-            raise ValueError("Title field not found in the database")
-
-        page_properties[title_field] = {
-            "title": [{"text": {"content": state.title}}]}
-
-        for field, value in [('Subtitle', state.subtitle), ('Description', state.description), ('Slug', state.slug)]:
-            if field in properties:
-                page_properties[field] = {
-                    "rich_text": [{"text": {"content": value}}]}
-
-        new_page = notion.pages.create(
-            parent={"database_id": NOTION_DATABASE_ID},
-            properties=page_properties,
-            children=[
-                {
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": state.content}}]
-                    }
-                }
-            ]
-        )
-        notion_url = f"https://www.notion.so/{new_page['id'].replace('-', '')}"
-
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens,
-            output_tokens=state.output_tokens,
-            cost=state.cost,
-            title=state.title,
-            subtitle=state.subtitle,
-            description=state.description,
-            slug=state.slug,
-            notion_url=notion_url
-        )
+        new_page = create_notion_page(state)
+        notion_url = notion_page_url(new_page)
+
+        return {"notion_url": notion_url}
+    except PartialPageError as e:
+        st.warning(f"Notion 페이지는 만들었지만 본문 일부가 빠졌습니다: {e}")
+        return {"notion_url": notion_page_url(e.page)}
     except Exception as e:
         st.error(f"Notion에 저장 중 오류 발생: {str(e)}")
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens,
-            output_tokens=state.output_tokens,
-            cost=state.cost,
-            title=state.title,
-            subtitle=state.subtitle,
-            description=state.description,
-            slug=state.slug,
-            notion_url="Notion 저장 실패"
-        )
+        return {"notion_url": "Notion 저장 실패"}
+
+
+def save_to_notion(state: ConversationState):
+    """노션에 생성된 콘텐츠를 저장하고, 중복 감지 색인에 기사를 기록합니다."""
+    index = get_duplicate_index()
+    match = index.find_content(state.content) if index is not None else None
+    if match is not None:
+        st.warning(f"본문이 지난 기사와 거의 같습니다 (유사도 {match['similarity']:.2f}): "
+                   f"{match['title']}")
+    update = publish_to_notion(state)
+    if index is not None:
+        index.add({**state.model_dump(include=ARTICLE_FIELDS),
+                   "notion_url": page_reference(update["notion_url"])})
+    return update
 
 # 워크플로우 수정
 
 
-def create_workflow(sages: List[AISage]):
+def create_workflow(sages: List[AISage], on_token: Optional[StreamCallback] = None,
+                    checkpointer: Optional[BaseCheckpointSaver] = None):
     workflow = StateGraph(ConversationState)
-    workflow.add_node("initiate", initiate_conversation)
-    workflow.add_node(
-        "continue", lambda state: continue_conversation(state, sages))
-    workflow.add_node("summarize", summarize_conversation)
-    workflow.add_node("generate", generate_final_content)
-    workflow.add_node("generate_metadata", generate_metadata)
-    workflow.add_node("save_to_notion", save_to_notion)
+    nodes = {
+        "initiate": budget_guarded(partial(initiate_conversation, on_token=on_token)),
+        "continue": budget_guarded(partial(
+            continue_conversation, sages=sages, on_token=on_token)),
+        "panel": budget_guarded(partial(panel_round, sages=sages, on_token=on_token)),
+        "summarize": summarize_conversation,
+        "generate": budget_guarded(partial(generate_final_content, on_token=on_token)),
+        "generate_metadata": generate_metadata,
+        "save_to_notion": save_to_notion,
+    }
+    for name, node in nodes.items():
+        workflow.add_node(name, traced_node(name, timed_node(name, node)))
 
     workflow.set_entry_point("initiate")
+    route = partial(should_continue, sages=sages)
 
     workflow.add_conditional_edges(
         "initiate",
-        should_continue,
+        route,
         {
             "continue": "continue",
+            "panel": "panel",
             "summarize": "summarize",
             "generate": "generate",
             "end": END
@@ -404,9 +505,21 @@ def create_workflow(sages: List[AISage]):
 
     workflow.add_conditional_edges(
         "continue",
-        should_continue,
+        route,
         {
             "continue": "continue",
+            "panel": "panel",
+            "summarize": "summarize",
+            "generate": "generate",
+            "end": END
+        }
+    )
+
+    workflow.add_conditional_edges(
+        "panel",
+        route,
+        {
+            "panel": "panel",
             "summarize": "summarize",
             "generate": "generate",
             "end": END
@@ -415,23 +528,71 @@ def create_workflow(sages: List[AISage]):
 
     workflow.add_conditional_edges(
         "summarize",
-        should_continue,
+        route,
         {
             "generate": "generate",
             "end": END
         }
     )
 
-    workflow.add_edge("generate", "generate_metadata")
+    workflow.add_conditional_edges(
+        "generate",
+        after_generate,
+        {
+            "generate_metadata": "generate_metadata",
+            "end": END
+        }
+    )
     workflow.add_edge("generate_metadata", "save_to_notion")
     workflow.add_edge("save_to_notion", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def budget_guarded(node: Callable) -> Callable:
+    """예산 초과로 호출이 거부되면 실행을 실패시키는 대신 멈춘 이유를 상태에 남깁니다."""
+    def guarded(state: ConversationState):
+        try:
+            return node(state)
+        except BudgetExceeded as e:
+            st.warning(str(e))
+            return {"budget_exceeded": str(e)}
+    return guarded
+
+
+ARTICLE_PROMPT_OVERHEAD = 200
+
+
+def estimate_article_cost(state: ConversationState, model: Any, name: str) -> float:
+    """기사 작성(map_reduce이면 노트 요약 호출 포함)의 비용 상한"""
+    conversation_tokens = state.output_tokens
+    note_cost = 0.0
+    if state.article_mode == "map_reduce":
+        note_inputs, conversation_tokens = estimate_note_calls(
+            state.output_tokens, max_output_tokens(model))
+        note_cost = sum(estimate_tokens_cost(model, name, tokens) for tokens in note_inputs)
+    return note_cost + estimate_tokens_cost(model, name,
+                                            conversation_tokens + ARTICLE_PROMPT_OVERHEAD)
 
 
-def should_continue(state: ConversationState):
-    if not evaluate_conversation(state):
-        return "continue"
+def debate_affordable(state: ConversationState, sages: Optional[List[AISage]] = None) -> bool:
+    """다음 토론 라운드를 하고도 기사를 쓸 예산이 남는지 호출 전에 추정합니다."""
+    budget = run_budget(state)
+    if budget is None:
+        return True
+    turn_tokens = state.turn_input_tokens[-1] if state.turn_input_tokens else CONTEXT_TOKEN_BUDGET
+    speakers = len(sages) if sages and state.debate_mode == "panel" else 1
+    return budget.can_afford(
+        speakers * estimate_tokens_cost(model, model_name, turn_tokens),
+        estimate_article_cost(state, model, model_name))
+
+
+def should_continue(state: ConversationState, sages: Optional[List[AISage]] = None):
+    if state.duplicate_of or state.budget_exceeded:
+        return "end"
+    # 다음 라운드를 감당할 수 없으면 토론을 끝내고 남은 예산으로 기사를 씁니다
+    if not evaluate_conversation(state) and debate_affordable(state, sages):
+        return "panel" if state.debate_mode == "panel" else "continue"
     elif not state.summary:
         return "summarize"
     elif not state.content:
@@ -440,47 +601,152 @@ def should_continue(state: ConversationState):
         return "end"
 
 
-def run_workflow(graph, initial_state: ConversationState, selected_persona_objects: List[AISage]):
+def after_generate(state: ConversationState):
+    return "end" if state.budget_exceeded else "generate_metadata"
+
+
+def run_workflow(graph, initial_state: Optional[ConversationState],
+                 streamer: Optional[StreamlitStreamer] = None,
+                 config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """그래프를 한 번만 실행하며 노드가 끝날 때마다 진행 상황과 대화를 갱신합니다.
+
+    initial_state가 None이면 config의 실행 ID로 저장된 체크포인트에서 이어서 실행합니다.
+    """
     conversation_history = st.empty()
     progress_bar = st.progress(0)
     status_text = st.empty()
 
-    steps = ["initiate", "continue", "summarize",
+    steps = ["initiate", "continue", "panel", "summarize",
              "generate", "generate_metadata", "save_to_notion"]
     total_steps = len(steps)
 
-    # 초기 상태 설정
-    state = initial_state
-
-    for i, step in enumerate(steps):
-        progress = (i + 1) / total_steps
-        progress_bar.progress(progress)
-        status_text.text(f"진행 중: {step}")
-
-        if step == "continue":
-            for _ in range(len(selected_persona_objects)):
-                state = continue_conversation(state, selected_persona_objects)
+    state: Dict[str, Any] = initial_state.model_dump() if initial_state else {}
+
+    # updates: 방금 끝난 노드 이름, values: 해당 시점의 전체 상태
+    run_id = (config or {}).get("configurable", {}).get("thread_id") or new_run_id()
+    with run_trace(run_id) as trace:
+        for mode, chunk in graph.stream(initial_state, config,
+                                        stream_mode=["updates", "values"]):
+            if mode == "updates":
+                if streamer is not None:
+                    streamer.finish()
+                for step, update in chunk.items():
+                    if step == "initiate" and (update or {}).get("topic"):
+                        st.write(f"선택된 주제: {update['topic']}")
+                    if step in steps:
+                        progress_bar.progress((steps.index(step) + 1) / total_steps)
+                        status_text.text(f"완료: {step}")
+            else:
+                state = chunk
                 messages = get_messages(state)
                 conversation_history.markdown(
                     "\n".join([f"**{msg['role']}**: {msg['content']}" for msg in messages]))
-                time.sleep(0.5)
-        else:
-            state = graph.invoke(state)
 
-        messages = get_messages(state)
-        conversation_history.markdown(
-            "\n".join([f"**{msg['role']}**: {msg['content']}" for msg in messages]))
+    if trace is not None and trace.path:
+        st.caption(f"실행 추적: {trace.path}")
+    return state
 
-        if step == "generate":
-            break  # generate 단계 후 중단
 
-        time.sleep(0.5)  # 진행 상황을 보기 위한 짧은 지연
+@st.cache_resource
+def load_checkpointer():
+    # 스크립트가 다시 실행될 때마다 연결을 새로 열지 않도록 한 번만 만듭니다
+    return get_checkpointer()
+
+
+def show_result(final_state: Dict[str, Any]):
+    st.success("콘텐츠 생성 완료!")
+    st.write("## 생성된 뉴욕타임즈 스타일 기사")
+    st.write(
+        f"**제목:** {get_state_value(final_state, 'title', '제목 없음')}")
+    st.write(
+        f"**부제목:** {get_state_value(final_state, 'subtitle', '부제목 없음')}")
+    st.write(
+        f"**설명:** {get_state_value(final_state, 'description', '설명 없음')}")
+    st.write(
+        f"**슬러그:** {get_state_value(final_state, 'slug', '슬러그 없음')}")
+    budget_exceeded = get_state_value(final_state, 'budget_exceeded', '')
+    if budget_exceeded:
+        st.warning(f"예산 때문에 실행을 멈췄습니다: {budget_exceeded}")
+    duplicate_of = get_state_value(final_state, 'duplicate_of', '')
+    if duplicate_of:
+        st.info(f"비슷한 주제 '{duplicate_of}'의 지난 기사를 재사용했습니다.")
+    st.write("### 본문:")
+    st.write(get_state_value(final_state, 'content', '본문 없음'))
+    st.write(
+        f"**총 입력 토큰:** {get_state_value(final_state, 'input_tokens', 0)}")
+    st.write(
+        f"**총 출력 토큰:** {get_state_value(final_state, 'output_tokens', 0)}")
+    st.write(
+        f"**총 비용:** ${get_state_value(final_state, 'cost', 0.0):.4f}")
+    turn_tokens = get_state_value(final_state, 'turn_input_tokens', [])
+    if turn_tokens:
+        st.write(f"**턴별 입력 토큰:** {turn_tokens} (최대 {max(turn_tokens)})")
+    notion_url = get_state_value(final_state, 'notion_url', 'URL 없음')
+    item_id = pending_id(notion_url)
+    worker = get_worker(publish_article) if item_id is not None else None
+    if worker is not None:
+        with st.spinner("Notion에 게시하는 중..."):
+            item = worker.wait(item_id, timeout=30)
+        if item and item["status"] in PUBLISHED_STATUSES:
+            notion_url = item["url"]
+            if item["status"] == "partial":
+                st.warning(f"Notion 페이지에 본문 일부가 빠졌습니다: {item['last_error']}")
+        elif item and item["status"] == "failed":
+            st.error(f"Notion 게시에 실패했습니다: {item['last_error']}")
+        else:
+            st.info("Notion 게시가 지연되어 백그라운드에서 재시도합니다.")
+    st.write(f"**노션 페이지 URL:** {notion_url}")
+    cache = get_cache()
+    if cache is not None:
+        stats = cache.stats()
+        st.caption(
+            f"LLM 캐시: 적중 {stats['hits']}회, 미스 {stats['misses']}회")
+
+
+def resume_workflow(checkpointer, personas: List[AISage], run_id: str):
+    """저장된 실행을 마지막으로 끝난 노드 다음부터 이어서 실행합니다."""
+    names = run_personas(checkpointer, run_id) or []
+    sages = [persona for name in names
+             for persona in personas if persona.name == name]
+    if not sages:
+        st.warning(f"실행 {run_id}의 AI 현인 정보를 찾을 수 없습니다.")
+        return
+
+    streamer = StreamlitStreamer(st.empty())
+    graph = create_workflow(sages, on_token=streamer, checkpointer=checkpointer)
+    config = run_config(run_id)
+    snapshot = graph.get_state(config)
+    if snapshot.next:
+        st.write(f"'{', '.join(snapshot.next)}' 단계부터 이어서 실행합니다.")
+        final_state = run_workflow(graph, None, streamer, config)
+    else:
+        st.write("이미 완료된 실행입니다.")
+        final_state = snapshot.values
+    show_result(final_state)
 
-    return state
+
+def choose_url_topic() -> Optional[str]:
+    """여러 URL의 제목을 동시에 가져와 그중 하나를 주제로 고르게 합니다."""
+    urls_text = st.text_area("URL을 한 줄에 하나씩 입력하세요:")
+    if st.button("제목 가져오기"):
+        urls = [line.strip() for line in urls_text.splitlines() if line.strip()]
+        with st.spinner(f"URL {len(urls)}개의 제목을 가져오는 중..."):
+            st.session_state.url_topics = resolve_topics(urls)
+
+    results = st.session_state.get("url_topics", [])
+    for result in results:
+        if not result.ok:
+            st.warning(f"{result.url}: {result.error}")
+    topics = [result.topic for result in results if result.ok]
+    if not topics:
+        return None
+    return st.selectbox("주제로 사용할 제목을 선택하세요:", topics)
 
 
 def main():
     st.title("AI 현인 콘텐츠 생성기")
+    # Streamlit은 상호작용마다 스크립트를 다시 실행하지만 지표 서버는 한 번만 시작됩니다
+    serve_from_env()
 
     # JSON 파일에서 페르소나 로드
     personas = load_personas('personas.json')
@@ -492,6 +758,28 @@ def main():
         default=[personas[0].name]
     )
 
+    # LLM 응답 캐시 사용 여부 (같은 주제/페르소나로 프롬프트를 조정할 때 비용 절감)
+    use_cache = st.sidebar.checkbox("LLM 응답 캐시 사용", value=cache_enabled())
+    configure_cache(enabled=use_cache)
+
+    # 기사 생성 방식 (긴 토론은 구간별 노트로 요약한 뒤 작성)
+    article_mode = st.sidebar.radio(
+        "기사 생성 방식", ARTICLE_MODES,
+        format_func=lambda mode: "대화 전체로 작성" if mode == "single" else "구간별 노트로 요약 후 작성")
+
+    # 토론 방식 (패널: 라운드마다 모든 현인이 동시에 답변)
+    debate_mode = st.sidebar.radio(
+        "토론 방식", DEBATE_MODES,
+        format_func=lambda mode: "한 명씩 차례로" if mode == "round_robin" else "패널 (동시 답변)")
+
+    # 중단된 실행 이어서 하기
+    checkpointer = load_checkpointer()
+    resume_id = st.sidebar.selectbox(
+        "중단된 실행 ID", options=[""] + recent_runs(checkpointer))
+    if st.sidebar.button("이어서 실행") and resume_id:
+        resume_workflow(checkpointer, personas, resume_id)
+        return
+
     # 선택된 페르소나 객체 리스트 생성
     selected_persona_objects = [
         persona for persona in personas if persona.name in selected_personas
@@ -500,13 +788,15 @@ def main():
     # 주제 입력 방식 선택
     topic_input_method = st.radio(
         "주제 입력 방식을 선택하세요:",
-        ("직접 입력", "URL 입력", "자동 주제 선택")
+        ("직접 입력", "URL 입력", "URL 목록에서 선택", "자동 주제 선택")
     )
 
     if topic_input_method == "직접 입력":
         topic = st.text_input("주제를 입력하세요:")
     elif topic_input_method == "URL 입력":
         topic = st.text_input("URL을 입력하세요:")
+    elif topic_input_method == "URL 목록에서 선택":
+        topic = choose_url_topic()
     else:
         topic = None
 
@@ -515,41 +805,26 @@ def main():
         if not selected_persona_objects:
             st.warning("적어도 하나의 AI 현인을 선택해주세요.")
         else:
-            # get_topic 함수를 사용하여 유효한 문자열 주제를 얻습니다
-            final_topic = get_topic(topic)
-            st.write(f"선택된 주제: {final_topic}")
-
-            # 워크플로우 생성
-            graph = create_workflow(selected_persona_objects)
-
-            # 초기 상태 생성
-            initial_state = ConversationState(topic=final_topic)
+            # 실행 ID로 노드마다 체크포인트를 저장하여 중단되어도 이어서 실행할 수 있습니다
+            run_id = new_run_id()
+            st.info(f"실행 ID: {run_id}")
+
+            # 워크플로우 생성 (토론 발언과 기사를 토큰 단위로 표시)
+            streamer = StreamlitStreamer(st.empty())
+            graph = create_workflow(selected_persona_objects, on_token=streamer,
+                                    checkpointer=checkpointer)
+
+            # 초기 상태 생성. URL/자동 주제는 첫 노드가 get_topic으로 정하므로 실행 추적에 기록됩니다
+            initial_state = ConversationState(
+                topic=topic or "",
+                personas=[persona.name for persona in selected_persona_objects],
+                article_mode=article_mode,
+                debate_mode=debate_mode)
 
             # 워크플로우 실행
-            final_state = run_workflow(
-                graph, initial_state, selected_persona_objects)
-
-            # 최종 결과 표시
-            st.success("콘텐츠 생성 완료!")
-            st.write("## 생성된 뉴욕타임즈 스타일 기사")
-            st.write(
-                f"**제목:** {get_state_value(final_state, 'title', '제목 없음')}")
-            st.write(
-                f"**부제목:** {get_state_value(final_state, 'subtitle', '부제목 없음')}")
-            st.write(
-                f"**설명:** {get_state_value(final_state, 'description', '설명 없음')}")
-            st.write(
-                f"**슬러그:** {get_state_value(final_state, 'slug', '슬러그 없음')}")
-            st.write("### 본문:")
-            st.write(get_state_value(final_state, 'content', '본문 없음'))
-            st.write(
-                f"**총 입력 토큰:** {get_state_value(final_state, 'input_tokens', 0)}")
-            st.write(
-                f"**총 출력 토큰:** {get_state_value(final_state, 'output_tokens', 0)}")
-            st.write(
-                f"**총 비용:** ${get_state_value(final_state, 'cost', 0.0):.4f}")
-            st.write(
-                f"**노션 페이지 URL:** {get_state_value(final_state, 'notion_url', 'URL 없음')}")
+            final_state = run_workflow(graph, initial_state, streamer,
+                                       run_config(run_id))
+            show_result(final_state)
 
 
 if __name__ == "__main__":
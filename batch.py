@@ -0,0 +1,141 @@
+"""
+배치 생성 실행기
+
+JSONL 파일의 작업(주제 또는 URL, 페르소나, 모델)을 동시 실행 개수를 제한하여 처리하고,
+기사 하나가 끝날 때마다 결과를 JSONL 한 줄로 기록합니다.
+출력 파일에 이미 성공한 작업은 건너뛰므로 중단된 지점부터 다시 실행할 수 있습니다.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+
+class BatchJob(BaseModel):
+    id: str = ""
+    topic: Optional[str] = None
+    url: Optional[str] = None
+    personas: List[str] = Field(default_factory=list)
+    model: Optional[str] = None
+    article_mode: Optional[Literal["single", "map_reduce"]] = None
+    debate_mode: Optional[Literal["round_robin", "panel"]] = None
+
+
+def job_key(job: BatchJob) -> str:
+    """id가 없는 작업은 내용으로 식별자를 만듭니다."""
+    if job.id:
+        return job.id
+    fields = [job.topic, job.url, job.personas, job.model]
+    # 선택 항목은 지정된 경우에만 포함하여 기존 작업의 id를 그대로 유지합니다
+    fields.extend(mode for mode in (job.article_mode, job.debate_mode) if mode)
+    payload = json.dumps(fields, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def load_jobs(path: str) -> List[BatchJob]:
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = BatchJob(**json.loads(line))
+            except Exception as e:
+                raise ValueError(f"{path}:{line_no} 잘못된 작업 정의: {e}")
+            job.id = job_key(job)
+            jobs.append(job)
+    return jobs
+
+
+def completed_job_ids(output_path: str) -> Set[str]:
+    """출력 파일에서 성공적으로 끝난 작업 id를 읽습니다."""
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 중단 중에 잘린 마지막 줄은 무시합니다
+                continue
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+
+def rewrite_urls(output_path: str, resolve: Callable[[str], Optional[str]]) -> int:
+    """결과의 notion_url을 resolve가 돌려준 URL로 바꿔 씁니다. 바꾼 줄 수를 반환합니다.
+
+    resolve가 None을 반환하면(아직 게시되지 않음) 그 줄은 그대로 둡니다. 파일은 임시 파일에
+    쓴 뒤 교체하므로 중간에 중단되어도 기존 결과가 손상되지 않습니다.
+    """
+    if not os.path.exists(output_path):
+        return 0
+    with open(output_path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    updated = 0
+    for i, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        url = resolve(record.get("notion_url") or "")
+        if url is not None and url != record.get("notion_url"):
+            record["notion_url"] = url
+            lines[i] = json.dumps(record, ensure_ascii=False) + "\n"
+            updated += 1
+    if updated:
+        temp_path = f"{output_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(temp_path, output_path)
+    return updated
+
+
+def end_last_line(output_path: str):
+    """중단 중에 잘린 마지막 줄이 있으면 줄바꿈으로 끝내, 이어 쓰는 결과가 그 줄에 붙지 않게 합니다."""
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+async def run_batch(
+    jobs: List[BatchJob],
+    output_path: str,
+    run_job: Callable[[BatchJob], Awaitable[Dict[str, Any]]],
+    concurrency: int = 4,
+) -> Tuple[int, int]:
+    """작업을 동시에 최대 concurrency개까지 실행합니다. (성공 수, 실패 수)를 반환합니다."""
+    done = completed_job_ids(output_path)
+    pending = [job for job in jobs if job.id not in done]
+    if len(pending) < len(jobs):
+        print(f"이미 완료된 작업 {len(jobs) - len(pending)}개를 건너뜁니다.")
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    counts = {"ok": 0, "error": 0}
+
+    end_last_line(output_path)
+    with open(output_path, "a", encoding="utf-8") as out:
+        async def worker(job: BatchJob):
+            async with semaphore:
+                try:
+                    record = {"id": job.id, "status": "ok", **await run_job(job)}
+                except Exception as e:
+                    record = {"id": job.id, "status": "error", "error": str(e)}
+            counts[record["status"]] += 1
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"[{record['status']}] {job.id}")
+
+        await asyncio.gather(*(worker(job) for job in pending))
+
+    return counts["ok"], counts["error"]
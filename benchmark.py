@@ -0,0 +1,296 @@
+"""
+종단간 벤치마크
+
+가짜 모델(fake_llm.py)로 create_workflow 전체를 실행하여 현인 수, 토론 길이, 동시 실행 수
+조합별로 분당 기사 수, 기사당 지연 시간(p50/p95), 최대 RSS, 토큰 계산 CPU 시간을 잽니다.
+시나리오마다 새 프로세스에서 실행하므로 최대 RSS와 캐시 상태가 다른 시나리오의 영향을
+받지 않습니다. 결과는 JSON으로 저장하고, --compare로 이전 결과와 비교해 처리량이나 p95
+지연이 허용 범위보다 나빠지면 종료 코드 1로 끝납니다.
+
+사용 예:
+    python benchmark.py --personas 1,3 --debate-messages 5,11 --concurrency 1,8 \\
+        --articles 16 --fake "latency=lognormal:0.05,0.3" --output bench.json
+    python benchmark.py --personas 1,3 --compare bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence
+
+import token_counter
+from fake_llm import FakeChatModel
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_FAKE = "latency=lognormal:0.05,0.3;tokens=150-300"
+DEFAULT_TOLERANCE = 0.1
+
+
+@dataclass
+class Scenario:
+    personas: int = 1
+    debate_messages: int = 5
+    concurrency: int = 1
+    articles: int = 8
+    debate_mode: str = "round_robin"
+    article_mode: str = "single"
+
+    def key(self) -> str:
+        return (f"p{self.personas}-m{self.debate_messages}-c{self.concurrency}"
+                f"-{self.debate_mode}-{self.article_mode}")
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """선형 보간 백분위수 (q는 0~100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트 단위입니다
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class TimedEncoding:
+    """인코딩 호출의 CPU 시간을 모읍니다.
+
+    한 문자열 인코딩은 호출한 스레드의 CPU 시간을, 배치 인코딩은 작업 스레드를 함께 쓰므로
+    프로세스 CPU 시간을 잽니다.
+    """
+
+    def __init__(self, encoding: Any):
+        self.encoding = encoding
+        self.seconds = 0.0
+        self.calls = 0
+        self._lock = Lock()
+
+    def _add(self, seconds: float):
+        with self._lock:
+            self.seconds += seconds
+            self.calls += 1
+
+    def encode_ordinary(self, text: str):
+        start = time.thread_time()
+        try:
+            return self.encoding.encode_ordinary(text)
+        finally:
+            self._add(time.thread_time() - start)
+
+    def encode_ordinary_batch(self, texts: List[str], **kwargs):
+        start = time.process_time()
+        try:
+            return self.encoding.encode_ordinary_batch(texts, **kwargs)
+        finally:
+            self._add(time.process_time() - start)
+
+
+def scenario_sages(count: int) -> List[Any]:
+    """personas.json의 현인을 순서대로 쓰고, 모자라면 이름을 바꿔 복제합니다."""
+    import main
+    personas = main.load_personas('personas.json')
+    return [persona if i < len(personas) else
+            persona.model_copy(update={"name": f"{persona.name} {i + 1}"})
+            for i, persona in ((i, personas[i % len(personas)]) for i in range(count))]
+
+
+async def arun_scenario(scenario: Scenario, model: Any) -> Dict[str, Any]:
+    """시나리오의 기사들을 동시 실행 수를 지키며 생성하고 측정값을 반환합니다."""
+    import main
+
+    saved = (main.model, main.DEBATE_MESSAGES, token_counter.get_encoding)
+    get_encoding = token_counter.get_encoding
+    timed = TimedEncoding(get_encoding())
+    main.model = model
+    main.DEBATE_MESSAGES = scenario.debate_messages
+    token_counter.get_encoding = lambda *args: timed
+    token_counter.clear_cache()
+    try:
+        graph = main.create_workflow(scenario_sages(scenario.personas), use_async=True)
+        semaphore = asyncio.Semaphore(max(1, scenario.concurrency))
+        latencies: List[float] = []
+        failures: List[str] = []
+        totals = {"input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+
+        async def article(number: int):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await graph.ainvoke({
+                        "topic": f"벤치마크 주제 {number}",
+                        "debate_mode": scenario.debate_mode,
+                        "article_mode": scenario.article_mode})
+                except Exception as e:
+                    failures.append(f"{type(e).__name__}: {e}")
+                    return
+                latencies.append(time.perf_counter() - start)
+                for key in totals:
+                    totals[key] += result.get(key, 0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(article(i) for i in range(scenario.articles)))
+        wall = time.perf_counter() - start
+    finally:
+        main.model, main.DEBATE_MESSAGES, token_counter.get_encoding = saved
+
+    return {
+        **asdict(scenario),
+        "key": scenario.key(),
+        "completed": len(latencies),
+        "failures": len(failures),
+        "errors": sorted(set(failures))[:5],
+        "wall_seconds": wall,
+        "articles_per_minute": len(latencies) / wall * 60 if wall else None,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "peak_rss_mb": peak_rss_mb(),
+        "token_cpu_seconds": timed.seconds,
+        "token_encode_calls": timed.calls,
+        "model_calls": getattr(model, "calls", None),
+        **totals,
+    }
+
+
+def run_scenario(scenario: Scenario, fake_spec: str) -> Dict[str, Any]:
+    """외부 부작용(응답 캐시, 중복 색인, 예산 기록, Notion 게시) 없이 시나리오를 실행합니다."""
+    import main
+    from budget import configure_budget
+    from dedup import configure_dedup
+    from llm_cache import configure_cache
+
+    configure_cache(enabled=False)
+    configure_dedup("off")
+    configure_budget(enabled=False)
+    main.notion = None
+    return asyncio.run(arun_scenario(scenario, FakeChatModel.from_spec(fake_spec)))
+
+
+def run_isolated(scenario: Scenario, fake_spec: str) -> Dict[str, Any]:
+    """새 프로세스에서 시나리오를 실행합니다."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_scenario, scenario, fake_spec).result()
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """기준 결과보다 처리량이 줄거나 p95 지연이 늘어난 시나리오를 설명하는 문장 목록"""
+    previous = {entry["key"]: entry for entry in baseline.get("scenarios", [])}
+    regressions = []
+    for entry in results:
+        base = previous.get(entry["key"])
+        if base is None:
+            continue
+        if (base["articles_per_minute"] and entry["articles_per_minute"] is not None and
+                entry["articles_per_minute"] < base["articles_per_minute"] * (1 - tolerance)):
+            regressions.append(
+                f"{entry['key']}: 분당 기사 {base['articles_per_minute']:.1f} → "
+                f"{entry['articles_per_minute']:.1f}")
+        if (base["latency_p95"] and entry["latency_p95"] is not None and
+                entry["latency_p95"] > base["latency_p95"] * (1 + tolerance)):
+            regressions.append(
+                f"{entry['key']}: p95 지연 {base['latency_p95']:.3f}s → "
+                f"{entry['latency_p95']:.3f}s")
+    return regressions
+
+
+def report(fake_spec: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fake": fake_spec,
+        "scenarios": results,
+    }
+
+
+def format_row(entry: Dict[str, Any]) -> str:
+    def number(value, digits=3):
+        return "-" if value is None else f"{value:.{digits}f}"
+    return (f"{entry['key']:<32} {number(entry['articles_per_minute'], 1):>8} "
+            f"{number(entry['latency_p50']):>8} {number(entry['latency_p95']):>8} "
+            f"{number(entry['peak_rss_mb'], 1):>8} {number(entry['token_cpu_seconds']):>8} "
+            f"{entry['failures']:>4}")
+
+
+def _ints(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="가짜 모델로 워크플로우 처리량을 잽니다")
+    parser.add_argument("--personas", type=_ints, default=[1, 3],
+                        help="현인 수 목록 (기본값: 1,3)")
+    parser.add_argument("--debate-messages", type=_ints, default=[5],
+                        help="토론을 마치는 메시지 수 목록 (기본값: 5)")
+    parser.add_argument("--concurrency", type=_ints, default=[1, 4],
+                        help="동시에 생성할 기사 수 목록 (기본값: 1,4)")
+    parser.add_argument("--articles", type=int, default=8,
+                        help="시나리오마다 생성할 기사 수 (기본값: 8)")
+    parser.add_argument("--debate-mode", default="round_robin",
+                        choices=("round_robin", "panel"))
+    parser.add_argument("--article-mode", default="single", choices=("single", "map_reduce"))
+    parser.add_argument("--fake", default=DEFAULT_FAKE,
+                        help=f"가짜 모델 설정 (기본값: {DEFAULT_FAKE})")
+    parser.add_argument("--output", default="benchmark.json", help="결과 JSON 파일")
+    parser.add_argument("--compare", metavar="BASELINE_JSON",
+                        help="이전 결과와 비교하여 나빠졌으면 종료 코드 1로 끝납니다")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="비교할 때 허용하는 변화 비율 (기본값: 0.1)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="시나리오를 별도 프로세스 없이 실행합니다 (최대 RSS가 누적됩니다)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    scenarios = [Scenario(personas, messages, concurrency, args.articles,
+                          args.debate_mode, args.article_mode)
+                 for personas in args.personas
+                 for messages in args.debate_messages
+                 for concurrency in args.concurrency]
+    run = run_scenario if args.in_process else run_isolated
+
+    print(f"{'scenario':<32} {'art/min':>8} {'p50(s)':>8} {'p95(s)':>8} "
+          f"{'rss(MB)':>8} {'tok(s)':>8} {'fail':>4}")
+    results = []
+    for scenario in scenarios:
+        results.append(run(scenario, args.fake))
+        print(format_row(results[-1]))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report(args.fake, results), f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"⚠ {line}")
+        if regressions:
+            return 1
+        print("기준 결과 대비 성능 저하 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
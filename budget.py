@@ -0,0 +1,203 @@
+"""
+예산 관리
+
+모델을 호출하기 전에 프롬프트 토큰 수와 최대 출력 토큰 수로 비용 상한을 추정하고,
+실행별/일별/전체 예산을 넘을 호출은 보내지 않습니다. 동시에 진행 중인 호출과 실행이
+같은 예산을 나눠 쓰므로 추정 비용을 먼저 예약하고, 호출이 끝나면 실제 비용으로
+정산합니다. 일별/전체 사용액은 SQLite 파일에 기록되어 재시작 후에도 이어지고
+여러 프로세스가 함께 사용할 수 있습니다.
+
+환경 변수:
+    BUDGET            "off"/"0"/"false"이면 예산을 확인하지 않습니다
+    BUDGET_PER_RUN    실행 하나의 예산(달러, 기본값: 50)
+    BUDGET_PER_DAY    하루(UTC) 예산(달러, 기본값: 제한 없음)
+    BUDGET_TOTAL      전체 예산(달러, 기본값: 제한 없음)
+    BUDGET_PATH       사용액 기록 파일 경로 (기본값: .cache/budget.sqlite3)
+"""
+
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Callable, Optional
+
+from llm import calculate_cost
+from token_counter import count_tokens
+
+DEFAULT_PATH = os.path.join(".cache", "budget.sqlite3")
+DEFAULT_PER_RUN = 50.0
+# 모델에 max_tokens가 없을 때 가정하는 최대 출력 토큰 수
+DEFAULT_MAX_OUTPUT = 4096
+
+
+class BudgetExceeded(Exception):
+    """다음 호출이 예산을 넘을 것으로 추정되어 호출하지 않았습니다."""
+
+    def __init__(self, scope: str, limit: float, committed: float, estimate: float):
+        super().__init__(
+            f"{scope} 예산 ${limit:.2f}을 넘을 수 있어 호출을 중단합니다 "
+            f"(사용+예약 ${committed:.4f}, 다음 호출 최대 ${estimate:.4f})")
+        self.scope = scope
+        self.limit = limit
+
+
+def max_output_tokens(model: Any) -> int:
+    value = getattr(model, "max_tokens", None)
+    return value if isinstance(value, int) and value > 0 else DEFAULT_MAX_OUTPUT
+
+
+def estimate_tokens_cost(model: Any, model_name: str, input_tokens: int) -> float:
+    """입력 토큰 수와 모델의 최대 출력 토큰 수로 계산한 비용 상한"""
+    return calculate_cost(input_tokens, max_output_tokens(model), model_name)
+
+
+def estimate_cost(model: Any, model_name: str, prompt: str) -> float:
+    return estimate_tokens_cost(model, model_name, count_tokens(prompt))
+
+
+class BudgetGovernor:
+    """일별/전체 사용액과 진행 중인 호출의 예약액을 관리합니다."""
+
+    def __init__(self, per_run: Optional[float] = DEFAULT_PER_RUN,
+                 per_day: Optional[float] = None, total: Optional[float] = None,
+                 path: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.per_run = per_run
+        self.per_day = per_day
+        self.total = total
+        self._clock = clock
+        self._lock = Lock()
+        self._reserved = 0.0
+        self._memory = {}
+        self._conn = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS spend (day TEXT PRIMARY KEY, amount REAL NOT NULL)")
+            self._conn.commit()
+
+    def _day(self) -> str:
+        return time.strftime("%Y-%m-%d", time.gmtime(self._clock()))
+
+    def _spent(self, day: Optional[str]) -> float:
+        if self._conn is None:
+            return self._memory.get(day, 0.0) if day else sum(self._memory.values())
+        if day:
+            row = self._conn.execute("SELECT amount FROM spend WHERE day = ?", (day,)).fetchone()
+        else:
+            row = self._conn.execute("SELECT SUM(amount) FROM spend").fetchone()
+        return (row[0] if row else None) or 0.0
+
+    def spent_today(self) -> float:
+        with self._lock:
+            return self._spent(self._day())
+
+    def spent_total(self) -> float:
+        with self._lock:
+            return self._spent(None)
+
+    def _limits(self, run: "RunBudget"):
+        """(범위, 한도, 사용+예약액) 목록"""
+        limits = []
+        if self.per_run is not None:
+            limits.append(("실행", self.per_run, run.spent + run.reserved))
+        if self.per_day is not None:
+            limits.append(("일일", self.per_day, self._spent(self._day()) + self._reserved))
+        if self.total is not None:
+            limits.append(("전체", self.total, self._spent(None) + self._reserved))
+        return limits
+
+    def remaining(self, run: "RunBudget") -> float:
+        with self._lock:
+            return min((limit - committed for _, limit, committed in self._limits(run)),
+                       default=float("inf"))
+
+    def reserve(self, run: "RunBudget", estimate: float):
+        with self._lock:
+            for scope, limit, committed in self._limits(run):
+                if committed + estimate > limit:
+                    raise BudgetExceeded(scope, limit, committed, estimate)
+            run.reserved += estimate
+            self._reserved += estimate
+
+    def settle(self, run: "RunBudget", estimate: float, actual: float):
+        with self._lock:
+            run.reserved -= estimate
+            run.spent += actual
+            self._reserved -= estimate
+            if not actual:
+                return
+            day = self._day()
+            if self._conn is None:
+                self._memory[day] = self._memory.get(day, 0.0) + actual
+            else:
+                self._conn.execute(
+                    "INSERT INTO spend VALUES (?, ?) "
+                    "ON CONFLICT(day) DO UPDATE SET amount = amount + excluded.amount",
+                    (day, actual))
+                self._conn.commit()
+
+    def run(self, spent: float = 0.0) -> "RunBudget":
+        """지금까지 spent만큼 쓴 실행의 예산"""
+        return RunBudget(self, spent)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+class RunBudget:
+    """실행 하나의 예산. 한 노드 안에서 동시에 보내는 호출들이 함께 사용합니다."""
+
+    def __init__(self, governor: BudgetGovernor, spent: float = 0.0):
+        self.governor = governor
+        self.spent = spent
+        self.reserved = 0.0
+
+    def reserve_call(self, model: Any, model_name: str, prompt: str) -> float:
+        """호출 비용 상한을 예약하고 예약액을 반환합니다. 예산을 넘으면 BudgetExceeded."""
+        estimate = estimate_cost(model, model_name, prompt)
+        self.governor.reserve(self, estimate)
+        return estimate
+
+    def settle(self, estimate: float, actual: float):
+        self.governor.settle(self, estimate, actual)
+
+    def can_afford(self, *estimates: float) -> bool:
+        return sum(estimates) <= self.governor.remaining(self)
+
+
+def _limit(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+_enabled = os.getenv("BUDGET", "on").lower() not in ("off", "0", "false", "no")
+_governor: Optional[BudgetGovernor] = None
+_init_lock = Lock()
+
+
+def get_governor() -> Optional[BudgetGovernor]:
+    """프로세스의 모든 실행이 공유하는 예산 관리자. 예산 확인이 꺼져 있으면 None."""
+    global _governor
+    if not _enabled:
+        return None
+    with _init_lock:
+        if _governor is None:
+            _governor = BudgetGovernor(
+                per_run=_limit("BUDGET_PER_RUN", DEFAULT_PER_RUN),
+                per_day=_limit("BUDGET_PER_DAY", None),
+                total=_limit("BUDGET_TOTAL", None),
+                path=os.getenv("BUDGET_PATH", DEFAULT_PATH))
+    return _governor
+
+
+def configure_budget(enabled: bool = True, governor: Optional[BudgetGovernor] = None):
+    """예산 확인을 켜거나 끄고, 필요하면 사용할 관리자를 지정합니다."""
+    global _enabled, _governor
+    _enabled = enabled
+    if governor is not None:
+        _governor = governor
@@ -0,0 +1,418 @@
+"""
+요청 녹화/재생 카세트
+
+실제 실행의 모델 호출(invoke/ainvoke/stream/astream), Notion API 요청, 주제 가져오기(URL
+제목, 뉴스 피드 주제)를 카세트 파일에 녹화하고, 재생 모드에서는 네트워크 없이 같은 응답을
+돌려줍니다. 응답의 사용량(usage) 정보까지 그대로 재생하므로 토큰 수와 비용이 녹화할 때와
+정확히 같습니다. 녹화한 지연 시간을 그대로 흉내 내거나(1), 배수를 곱하거나, 기다리지 않고(0)
+재생할 수 있습니다.
+
+카세트는 JSON Lines 파일이며 한 줄이 요청 하나입니다. 요청 본문(프롬프트 등)은 저장하지 않고
+(종류, 작업, 요청)의 해시를 키로 저장합니다. 같은 키의 요청은 녹화된 순서대로 재생하며,
+녹화에 없는 요청이 오면 CassetteMissError를 던집니다. 프롬프트를 바꾸면 해당 호출부터
+카세트에 없는 요청이 되므로 다시 녹화해야 합니다.
+
+녹화할 때 난 오류도 재생합니다. Notion API 오류는 같은 코드/상태의 APIResponseError로,
+그 밖의 오류는 RecordedError로 다시 던지므로 재시도 판단이 녹화할 때와 같습니다.
+
+LLM 응답 캐시에 적중한 호출은 모델을 부르지 않으므로 녹화되지 않습니다. 카세트를 녹화할
+때는 LLM_CACHE=off를 권장합니다.
+
+환경 변수:
+    CASSETTE           카세트 파일 경로. 설정하면 녹화 또는 재생합니다
+    CASSETTE_MODE      record | replay (기본값: 파일이 있으면 replay, 없으면 record)
+    CASSETTE_LATENCY   재생 지연: recorded(녹화한 시간), none(기다리지 않음) 또는 배수 (기본값: none)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from langchain_core.messages import AIMessage, AIMessageChunk
+from notion_client.errors import APIResponseError, HTTPResponseError
+
+CASSETTE_MODES = ("record", "replay")
+# 녹화한 종류 그대로 다시 만드는 오류
+REBUILT_ERRORS = {"APIResponseError": APIResponseError, "HTTPResponseError": HTTPResponseError}
+
+
+class CassetteMissError(LookupError):
+    """재생 중인 카세트에 없는 요청입니다."""
+
+
+class RecordedError(Exception):
+    """녹화할 때 실패한 요청을 재생합니다. 재시도 판단에 쓰는 status/code/headers를 유지합니다."""
+
+    def __init__(self, message: str, type_name: str = "", status: Optional[int] = None,
+                 code: Optional[str] = None, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.type_name = type_name
+        self.status = status
+        self.code = code
+        self.headers = headers or {}
+
+
+def _default(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return getattr(value, "__dict__", None) or str(value)
+
+
+def _jsonable(value: Any) -> Any:
+    return json.loads(json.dumps(value, ensure_ascii=False, default=_default))
+
+
+def request_key(kind: str, operation: str, request: Any) -> str:
+    data = json.dumps([kind, operation, request], ensure_ascii=False, sort_keys=True,
+                      default=_default)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:24]
+
+
+def encode_error(error: Exception) -> Dict[str, Any]:
+    data = {"type": type(error).__name__, "message": str(error)}
+    for name in ("status", "code"):
+        value = getattr(error, name, None)
+        if value is not None:
+            data[name] = _jsonable(value)
+    headers = getattr(error, "headers", None)
+    if headers:
+        data["headers"] = {key.lower(): str(value) for key, value in dict(headers).items()}
+    return data
+
+
+def decode_error(data: Dict[str, Any]) -> Exception:
+    error_class = REBUILT_ERRORS.get(data.get("type", ""))
+    if error_class is not None and data.get("status") is not None:
+        return error_class(code=data.get("code") or "", status=data["status"],
+                           message=data["message"],
+                           headers=httpx.Headers(data.get("headers") or {}), raw_body_text="")
+    return RecordedError(data["message"], data.get("type", ""), data.get("status"),
+                         data.get("code"), data.get("headers"))
+
+
+def encode_message(message: Any) -> Dict[str, Any]:
+    data = {"content": _jsonable(message.content)}
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        data["usage"] = _jsonable(usage)
+    metadata = getattr(message, "response_metadata", None)
+    if metadata:
+        data["metadata"] = _jsonable(metadata)
+    return data
+
+
+def decode_message(data: Dict[str, Any], chunk: bool = False) -> Any:
+    message_class = AIMessageChunk if chunk else AIMessage
+    return message_class(content=data["content"], usage_metadata=data.get("usage"),
+                         response_metadata=data.get("metadata") or {})
+
+
+class Cassette:
+    """녹화한 요청과 응답. record 모드에서는 요청마다 파일에 한 줄씩 덧붙입니다."""
+
+    def __init__(self, path: str, mode: str = "replay", latency: float = 0.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"알 수 없는 카세트 모드: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._sleep = sleep
+        self._lock = Lock()
+        self._file = None
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self.recorded = 0
+        self.replayed = 0
+        if mode == "replay":
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+
+    def remaining(self) -> int:
+        """아직 재생하지 않은 요청 수"""
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def _write(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # 새로 녹화하면 기존 카세트를 덮어씁니다
+                self._file = open(self.path, "w", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def record(self, kind: str, operation: str, key: str, elapsed: float, **data: Any):
+        self._write({"kind": kind, "operation": operation, "key": key,
+                     "elapsed": round(elapsed, 4), **data})
+
+    def take(self, kind: str, operation: str, key: str) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMissError(
+                    f"카세트({self.path})에 없는 요청입니다: {kind} {operation} ({key})")
+            self.replayed += 1
+            return entries.popleft()
+
+    def delay(self, seconds: float) -> float:
+        return seconds * self.latency
+
+    # 요청/응답 한 번으로 끝나는 호출
+
+    def call(self, kind: str, operation: str, request: Any, perform: Callable[[], Any],
+             encode: Callable[[Any], Any] = _jsonable,
+             decode: Callable[[Any], Any] = lambda value: value) -> Any:
+        key = request_key(kind, operation, request)
+        if not self.recording:
+            entry = self.take(kind, operation, key)
+            if self.latency:
+                self._sleep(self.delay(entry["elapsed"]))
+            return self._result(entry, decode)
+        start = time.perf_counter()
+        try:
+            response = perform()
+        except Exception as e:
+            self.record(kind, operation, key, time.perf_counter() - start,
+                        error=encode_error(e))
+            raise
+        self.record(kind, operation, key, time.perf_counter() - start,
+                    response=encode(response))
+        return response
+
+    async def acall(self, kind: str, operation: str, request: Any, perform: Callable[[], Any],
+                    encode: Callable[[Any], Any] = _jsonable,
+                    decode: Callable[[Any], Any] = lambda value: value) -> Any:
+        key = request_key(kind, operation, request)
+        if not self.recording:
+            entry = self.take(kind, operation, key)
+            if self.latency:
+                await asyncio.sleep(self.delay(entry["elapsed"]))
+            return self._result(entry, decode)
+        start = time.perf_counter()
+        try:
+            response = await perform()
+        except Exception as e:
+            self.record(kind, operation, key, time.perf_counter() - start,
+                        error=encode_error(e))
+            raise
+        self.record(kind, operation, key, time.perf_counter() - start,
+                    response=encode(response))
+        return response
+
+    @staticmethod
+    def _result(entry: Dict[str, Any], decode: Callable[[Any], Any]) -> Any:
+        if "error" in entry:
+            raise decode_error(entry["error"])
+        return decode(entry["response"])
+
+    # 스트리밍 호출. 청크마다 시작부터의 시각을 함께 저장합니다
+
+    def stream(self, kind: str, operation: str, request: Any,
+               perform: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        key = request_key(kind, operation, request)
+        if not self.recording:
+            entry = self.take(kind, operation, key)
+            start = time.perf_counter()
+            for offset, chunk in entry["chunks"]:
+                wait = self.delay(offset) - (time.perf_counter() - start)
+                if wait > 0:
+                    self._sleep(wait)
+                yield decode_message(chunk, chunk=True)
+            if "error" in entry:
+                raise decode_error(entry["error"])
+            return
+        chunks: List[Tuple[float, Dict[str, Any]]] = []
+        start = time.perf_counter()
+        try:
+            for chunk in perform():
+                chunks.append((round(time.perf_counter() - start, 4), encode_message(chunk)))
+                yield chunk
+        except Exception as e:
+            self.record(kind, operation, key, time.perf_counter() - start,
+                        chunks=chunks, error=encode_error(e))
+            raise
+        self.record(kind, operation, key, time.perf_counter() - start, chunks=chunks)
+
+    async def astream(self, kind: str, operation: str, request: Any,
+                      perform: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        key = request_key(kind, operation, request)
+        if not self.recording:
+            entry = self.take(kind, operation, key)
+            start = time.perf_counter()
+            for offset, chunk in entry["chunks"]:
+                wait = self.delay(offset) - (time.perf_counter() - start)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                yield decode_message(chunk, chunk=True)
+            if "error" in entry:
+                raise decode_error(entry["error"])
+            return
+        chunks: List[Tuple[float, Dict[str, Any]]] = []
+        start = time.perf_counter()
+        try:
+            async for chunk in perform():
+                chunks.append((round(time.perf_counter() - start, 4), encode_message(chunk)))
+                yield chunk
+        except Exception as e:
+            self.record(kind, operation, key, time.perf_counter() - start,
+                        chunks=chunks, error=encode_error(e))
+            raise
+        self.record(kind, operation, key, time.perf_counter() - start, chunks=chunks)
+
+
+class CassetteModel:
+    """모델 호출을 카세트로 녹화/재생합니다. 다른 속성은 감싼 모델의 것을 그대로 씁니다."""
+
+    def __init__(self, model: Any, model_name: str, cassette: Cassette):
+        self.model = model
+        self.model_name = model_name
+        self.cassette = cassette
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+    def _request(self, prompt: Any) -> Dict[str, Any]:
+        return {"model": self.model_name, "prompt": _jsonable(prompt)}
+
+    def invoke(self, prompt: Any, *args, **kwargs) -> Any:
+        return self.cassette.call("model", "invoke", self._request(prompt),
+                                  lambda: self.model.invoke(prompt, *args, **kwargs),
+                                  encode_message, decode_message)
+
+    async def ainvoke(self, prompt: Any, *args, **kwargs) -> Any:
+        return await self.cassette.acall("model", "invoke", self._request(prompt),
+                                         lambda: self.model.ainvoke(prompt, *args, **kwargs),
+                                         encode_message, decode_message)
+
+    def stream(self, prompt: Any, *args, **kwargs) -> Iterator[Any]:
+        return self.cassette.stream("model", "stream", self._request(prompt),
+                                    lambda: self.model.stream(prompt, *args, **kwargs))
+
+    def astream(self, prompt: Any, *args, **kwargs) -> AsyncIterator[Any]:
+        return self.cassette.astream("model", "stream", self._request(prompt),
+                                     lambda: self.model.astream(prompt, *args, **kwargs))
+
+
+class CassetteClient:
+    """Notion 클라이언트의 엔드포인트 호출(pages.create 등)을 녹화/재생합니다."""
+
+    def __init__(self, client: Any, cassette: Cassette, path: str = ""):
+        self._client = client
+        self._cassette = cassette
+        self._path = path
+
+    def __getattr__(self, name: str) -> "CassetteClient":
+        return CassetteClient(getattr(self._client, name) if self._client is not None else None,
+                              self._cassette, f"{self._path}.{name}" if self._path else name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._cassette.call("notion", self._path, {"args": args, "kwargs": kwargs},
+                                   lambda: self._client(*args, **kwargs))
+
+
+def _latency_from_env() -> float:
+    value = os.getenv("CASSETTE_LATENCY", "none").lower()
+    if value == "recorded":
+        return 1.0
+    if value in ("none", "off", ""):
+        return 0.0
+    return float(value)
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    path = os.getenv("CASSETTE")
+    if not path:
+        return None
+    mode = os.getenv("CASSETTE_MODE") or ("replay" if os.path.exists(path) else "record")
+    return Cassette(path, mode.lower(), _latency_from_env())
+
+
+_cassette: Optional[Cassette] = None
+_loaded = False
+_global_lock = Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """설정된 카세트. 처음 사용할 때 CASSETTE 환경 변수에서 만듭니다."""
+    global _cassette, _loaded
+    if _loaded:
+        return _cassette
+    with _global_lock:
+        if not _loaded:
+            _cassette = cassette_from_env()
+            _loaded = True
+        return _cassette
+
+
+def configure_cassette(cassette: Optional[Cassette] = None):
+    """사용할 카세트를 지정합니다. None이면 녹화/재생을 끕니다."""
+    global _cassette, _loaded
+    with _global_lock:
+        _cassette = cassette
+        _loaded = True
+
+
+@contextmanager
+def use_cassette(path: str, mode: Optional[str] = None,
+                 latency: float = 0.0) -> Iterator[Cassette]:
+    """with 블록 동안 카세트를 사용합니다. mode가 없으면 파일이 있을 때 재생합니다."""
+    global _cassette, _loaded
+    cassette = Cassette(path, mode or ("replay" if os.path.exists(path) else "record"), latency)
+    with _global_lock:
+        previous = (_cassette, _loaded)
+        _cassette, _loaded = cassette, True
+    try:
+        yield cassette
+    finally:
+        with _global_lock:
+            _cassette, _loaded = previous
+        cassette.close()
+
+
+def wrap_model(model: Any, model_name: str) -> Any:
+    cassette = get_cassette()
+    return model if cassette is None else CassetteModel(model, model_name, cassette)
+
+
+def wrap_notion(client: Any) -> Any:
+    cassette = get_cassette()
+    if cassette is None or isinstance(client, CassetteClient):
+        return client
+    return CassetteClient(client, cassette)
+
+
+def fetch(operation: str, request: Any, perform: Callable[[], Any]) -> Any:
+    """주제 가져오기를 녹화/재생합니다. 카세트가 없으면 그냥 실행합니다."""
+    cassette = get_cassette()
+    if cassette is None:
+        return perform()
+    return cassette.call("fetch", operation, request, perform)
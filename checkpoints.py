@@ -0,0 +1,75 @@
+"""
+워크플로우 체크포인트
+
+컴파일된 그래프에 SQLite 체크포인터를 붙여, 노드가 끝날 때마다 상태를 실행 ID(thread_id)
+별로 로컬 파일에 저장합니다. 프로세스가 중간에 종료되어도 같은 실행 ID로 마지막으로 끝난
+노드 다음부터 이어서 실행하므로, 이미 비용을 지불한 토론 턴을 다시 호출하지 않습니다.
+
+환경 변수:
+    CHECKPOINT_PATH    체크포인트 파일 경로 (기본값: .cache/checkpoints.sqlite3)
+"""
+
+import os
+import sqlite3
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from reducers import MessageLog
+
+DEFAULT_PATH = os.path.join(".cache", "checkpoints.sqlite3")
+
+
+def _plain(value: Any) -> Any:
+    """MessageLog를 일반 리스트로 바꿉니다. 복원된 리스트는 다음 추가 때 다시 로그가 됩니다."""
+    if isinstance(value, MessageLog):
+        return list(value)
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+
+class CheckpointSerializer(JsonPlusSerializer):
+    """append-only 메시지 로그를 저장할 수 있는 직렬화기"""
+
+    def dumps_typed(self, obj: Any):
+        return super().dumps_typed(_plain(obj))
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def run_config(run_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": run_id}}
+
+
+def get_checkpointer(path: Optional[str] = None) -> SqliteSaver:
+    path = path or os.getenv("CHECKPOINT_PATH", DEFAULT_PATH)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    return SqliteSaver(conn, serde=CheckpointSerializer())
+
+
+def run_personas(checkpointer: SqliteSaver, run_id: str) -> Optional[List[str]]:
+    """저장된 상태에서 실행에 참여한 페르소나 이름을 읽습니다. 실행이 없으면 None을 반환합니다."""
+    saved = checkpointer.get_tuple(run_config(run_id))
+    if saved is None:
+        return None
+    return list(saved.checkpoint["channel_values"].get("personas") or [])
+
+
+def recent_runs(checkpointer: SqliteSaver, limit: int = 20) -> List[str]:
+    """체크포인트가 있는 실행 ID를 최근 순으로 반환합니다."""
+    runs: List[str] = []
+    for saved in checkpointer.list(None):
+        run_id = saved.config["configurable"]["thread_id"]
+        if run_id not in runs:
+            runs.append(run_id)
+            if len(runs) >= limit:
+                break
+    return runs
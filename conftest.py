@@ -0,0 +1,86 @@
+import pytest
+
+import budget
+import cassette
+import dedup
+import feeds
+import fetcher
+import llm_cache
+import metrics
+import notion_blocks
+import notion_outbox
+import notion_schema
+import token_counter
+import tracing
+from stubs import FakeEncoding
+
+
+@pytest.fixture(autouse=True)
+def isolated_llm_cache(monkeypatch):
+    """Keep tests away from the on-disk LLM response cache"""
+    monkeypatch.setattr(llm_cache, "_enabled", False)
+    monkeypatch.setattr(llm_cache, "_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_budget(monkeypatch):
+    """Keep tests away from the on-disk spend ledger"""
+    monkeypatch.setattr(budget, "_enabled", False)
+    monkeypatch.setattr(budget, "_governor", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_metrics(monkeypatch):
+    """Collect no metrics unless a test enables them on a fresh registry"""
+    monkeypatch.setattr(metrics, "_enabled", False)
+    monkeypatch.setattr(metrics, "_registry", metrics.Registry())
+
+
+@pytest.fixture(autouse=True)
+def isolated_tracing(monkeypatch):
+    """Write no trace files unless a test enables tracing itself"""
+    monkeypatch.setattr(tracing, "_enabled", False)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cassette(monkeypatch):
+    """Never record or replay traffic unless a test installs a cassette"""
+    monkeypatch.setattr(cassette, "_cassette", None)
+    monkeypatch.setattr(cassette, "_loaded", True)
+
+
+@pytest.fixture(autouse=True)
+def isolated_dedup(monkeypatch):
+    """Never match or record articles from earlier test runs"""
+    monkeypatch.setattr(dedup, "_mode", "off")
+    monkeypatch.setattr(dedup, "_index", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_fetch_cache(monkeypatch):
+    """Keep tests away from the on-disk page title cache"""
+    monkeypatch.setattr(fetcher, "_enabled", False)
+    monkeypatch.setattr(fetcher, "_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_feeds(monkeypatch):
+    """Fall back to the default topic unless a test configures feeds itself"""
+    monkeypatch.setattr(feeds, "FEEDS", [])
+    monkeypatch.setattr(feeds, "_index", None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_notion(monkeypatch):
+    """Start every test without cached Notion schemas, rate-limit waits or an outbox"""
+    notion_schema.invalidate_schema()
+    monkeypatch.setattr(notion_blocks, "_limiter", notion_blocks.TokenBucket(rate=1e9))
+    monkeypatch.setattr(notion_outbox, "_enabled", False)
+    monkeypatch.setattr(notion_outbox, "_outbox", None)
+    monkeypatch.setattr(notion_outbox, "_worker", None)
+
+
+@pytest.fixture
+def whitespace_tokens(monkeypatch):
+    """Count tokens offline by splitting on whitespace"""
+    monkeypatch.setattr(token_counter, "get_encoding", FakeEncoding)
@@ -0,0 +1,88 @@
+"""
+토론 맥락 창
+
+현인의 다음 발언 프롬프트에 최근 K개 턴과, 그보다 오래된 턴을 한 줄씩 줄여 담은
+누적 요약(digest)을 함께 넣습니다. 전체 맥락은 토큰 예산을 넘지 않도록 잘라내므로
+토론이 길어져도 턴마다 입력 크기가 일정하게 유지됩니다.
+
+digest는 턴이 최근 창에서 밀려날 때 한 줄씩 추가되어 상태에 저장되므로,
+매 턴 전체 대화를 다시 훑지 않습니다.
+
+환경 변수:
+    CONTEXT_RECENT_TURNS   그대로 전달할 최근 턴 수 (기본값: 4)
+    CONTEXT_TOKEN_BUDGET   digest와 최근 턴을 합친 최대 토큰 수 (기본값: 1500)
+"""
+
+import os
+from typing import Dict, List, Sequence
+
+from token_counter import count_tokens, count_tokens_many
+
+RECENT_TURNS = max(1, int(os.getenv("CONTEXT_RECENT_TURNS", 4)))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+# digest 한 줄에 남길 발언 앞부분 길이(문자)
+DIGEST_LINE_CHARS = 120
+
+
+def format_turn(message: Dict[str, str]) -> str:
+    return f"{message['role']}: {message['content']}"
+
+
+def digest_line(message: Dict[str, str]) -> str:
+    content = " ".join(message["content"].split())
+    if len(content) > DIGEST_LINE_CHARS:
+        content = content[:DIGEST_LINE_CHARS].rstrip() + "…"
+    return f"- {message['role']}: {content}"
+
+
+def evicted_turns(messages: Sequence[Dict[str, str]], new: List[Dict[str, str]],
+                  recent_turns: int = RECENT_TURNS) -> List[Dict[str, str]]:
+    """new를 추가했을 때 최근 창에서 밀려나는 메시지를 오래된 순서로 반환합니다."""
+    # 창 밖의 메시지는 이미 digest에 들어 있으므로 끝부분만 봅니다 (MessageLog는 꼬리만 읽음)
+    window = list(messages[-recent_turns:]) + list(new)
+    return window[:max(0, len(window) - recent_turns)]
+
+
+def update_digest(digest: str, messages: List[Dict[str, str]],
+                  budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """digest 끝에 메시지마다 한 줄을 추가하고, 예산의 절반을 넘으면 가장 오래된 줄부터 버립니다."""
+    lines = digest.splitlines() + [digest_line(message) for message in messages]
+    return "\n".join(fit_lines(lines, budget // 2))
+
+
+def fit_lines(lines: List[str], budget: int) -> List[str]:
+    """토큰 합계가 budget 이하가 되도록 가장 오래된(앞쪽) 줄부터 버립니다."""
+    counts = count_tokens_many(lines)
+    total = sum(counts)
+    start = 0
+    while total > budget and start < len(lines):
+        total -= counts[start]
+        start += 1
+    return lines[start:]
+
+
+def build_context(digest: str, messages: Sequence[Dict[str, str]],
+                  recent_turns: int = RECENT_TURNS,
+                  budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """digest와 최근 턴을 예산 안에서 합칩니다. 최근 턴을 우선하고 digest를 먼저 줄입니다."""
+    recent = fit_lines([format_turn(m) for m in messages[-recent_turns:]], budget)
+    # 최근 턴 하나가 혼자 예산을 넘으면 뒷부분을 잘라 넣습니다
+    if not recent and messages:
+        recent = [truncate(format_turn(messages[-1]), budget)]
+
+    remaining = budget - sum(count_tokens_many(recent))
+    older = fit_lines(digest.splitlines(), remaining) if digest else []
+
+    sections = []
+    if older:
+        sections.append("이전 토론 요약:\n" + "\n".join(older))
+    if recent:
+        sections.append("최근 발언:\n" + "\n\n".join(recent))
+    return "\n\n".join(sections)
+
+
+def truncate(text: str, budget: int) -> str:
+    """토큰 수가 budget 이하가 될 때까지 앞부분을 잘라냅니다."""
+    while text and count_tokens(text) > budget:
+        text = text[len(text) // 4 or 1:]
+    return text
@@ -0,0 +1,132 @@
+"""
+호출별 비용 기록과 집계
+
+워크플로우는 모델 호출마다 (노드, 페르소나, 모델, 토큰, 비용) 레코드를 상태의 calls에
+남기고, 배치 결과 JSONL에도 함께 기록합니다. CostTable은 여러 실행의 레코드를 열 단위
+배열로 모으고(문자열 열은 정수 코드로 사전 인코딩), 모델/페르소나/노드별 합계를 레코드를
+한 번만 순회하며 한꺼번에 계산합니다. 수천 개 실행을 모아도 레코드마다 dict를 만들지
+않습니다.
+"""
+
+import json
+from array import array
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from llm import ModelCall
+
+KEY_COLUMNS = ("run", "node", "persona", "model")
+TOKEN_COLUMNS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+BREAKDOWN = ("model", "persona", "node")
+
+
+def call_record(node: str, result: ModelCall, persona: str = "") -> Dict[str, Any]:
+    """모델 호출 하나의 비용 레코드"""
+    return {
+        "node": node,
+        "persona": persona,
+        "model": result.model,
+        "input_tokens": result.input_tokens,
+        "output_tokens": result.output_tokens,
+        "cache_read_tokens": result.cache_read_tokens,
+        "cache_write_tokens": result.cache_write_tokens,
+        "cost": result.cost,
+        "cached": result.cached
+    }
+
+
+class CostTable:
+    """여러 실행의 호출 레코드를 열 단위로 보관합니다."""
+
+    def __init__(self):
+        self._labels: Dict[str, List[str]] = {column: [] for column in KEY_COLUMNS}
+        self._codes: Dict[str, Dict[str, int]] = {column: {} for column in KEY_COLUMNS}
+        self._keys = {column: array("I") for column in KEY_COLUMNS}
+        self._tokens = {column: array("q") for column in TOKEN_COLUMNS}
+        self._cost = array("d")
+        self.runs = 0
+
+    def __len__(self) -> int:
+        return len(self._cost)
+
+    def _encode(self, column: str, label: str) -> int:
+        codes = self._codes[column]
+        code = codes.get(label)
+        if code is None:
+            code = codes[label] = len(self._labels[column])
+            self._labels[column].append(label)
+        return code
+
+    def extend(self, records: Iterable[Dict[str, Any]], run: str = ""):
+        """한 실행의 호출 레코드를 추가합니다."""
+        for record in records:
+            for column in KEY_COLUMNS:
+                label = run if column == "run" else record.get(column) or ""
+                self._keys[column].append(self._encode(column, label))
+            for column in TOKEN_COLUMNS:
+                self._tokens[column].append(int(record.get(column) or 0))
+            self._cost.append(float(record.get("cost") or 0.0))
+        self.runs += 1
+
+    @classmethod
+    def from_runs(cls, runs: Iterable[Dict[str, Any]]) -> "CostTable":
+        """calls 필드가 있는 실행 결과(상태 또는 배치 결과 레코드)로 표를 만듭니다."""
+        table = cls()
+        for number, run in enumerate(runs):
+            if run.get("calls"):
+                table.extend(run["calls"], str(run.get("id") or number))
+        return table
+
+    @classmethod
+    def load(cls, paths: Sequence[str]) -> "CostTable":
+        """배치 결과 JSONL 파일들을 읽습니다. 잘린 줄은 건너뜁니다."""
+        def runs():
+            for path in paths:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue
+        return cls.from_runs(runs())
+
+    def summarize(self, *groupings: Tuple[str, ...]) -> Dict[Tuple[str, ...], List[Dict[str, Any]]]:
+        """각 그룹 기준(열 이름 튜플)별 합계를 한 번의 순회로 계산합니다. 비용이 큰 순서입니다."""
+        positions = [tuple(KEY_COLUMNS.index(column) for column in grouping)
+                     for grouping in groupings]
+        totals: List[Dict[Tuple[int, ...], List[float]]] = [{} for _ in groupings]
+        rows = zip(*(self._keys[column] for column in KEY_COLUMNS),
+                   *(self._tokens[column] for column in TOKEN_COLUMNS), self._cost)
+        for row in rows:
+            values = row[len(KEY_COLUMNS):]
+            for index, accumulator in zip(positions, totals):
+                key = tuple(row[i] for i in index)
+                total = accumulator.get(key)
+                if total is None:
+                    total = accumulator[key] = [0] * (len(values) + 1)
+                total[0] += 1
+                for i, value in enumerate(values, 1):
+                    total[i] += value
+
+        summary = {}
+        for grouping, accumulator in zip(groupings, totals):
+            result = []
+            for key, total in accumulator.items():
+                entry = {column: self._labels[column][code]
+                         for column, code in zip(grouping, key)}
+                entry["calls"] = total[0]
+                entry.update(zip(TOKEN_COLUMNS, total[1:-1]))
+                entry["cost"] = total[-1]
+                result.append(entry)
+            summary[grouping] = sorted(result, key=lambda entry: entry["cost"], reverse=True)
+        return summary
+
+    def group_by(self, *columns: str) -> List[Dict[str, Any]]:
+        return self.summarize(columns)[columns]
+
+    def breakdown(self) -> Dict[str, List[Dict[str, Any]]]:
+        """모델별, 페르소나별, 노드별 합계"""
+        summary = self.summarize(*((column,) for column in BREAKDOWN))
+        return {column: summary[(column,)] for column in BREAKDOWN}
+
+    def total_cost(self) -> float:
+        return sum(self._cost)
@@ -0,0 +1,234 @@
+"""
+중복 주제/기사 감지
+
+지난 실행의 주제와 기사 본문을 단어(1~2-gram) MinHash 서명으로 SQLite에 저장하고,
+LSH 밴드(4개 값씩 16개)로 버킷을 나누어 메모리에 올려 둡니다. 새 주제는 같은 버킷에
+들어간 후보만 서명을 비교하므로 기사가 수만 개여도 조회가 1ms 안에 끝납니다.
+유사도(추정 자카드 계수)가 임계값을 넘으면 토론을 시작하기 전에 경고를 출력하거나
+기존 기사를 그대로 돌려줍니다. 단어 단위로 비교하므로 "금리 인상"과 "금리 인하",
+"iPhone 15"와 "iPhone 16"처럼 한 단어만 다른 주제는 서로 다른 주제로 봅니다.
+
+환경 변수:
+    DEDUP              "warn"(기본값)이면 경고만 출력, "reuse"이면 기존 기사를 재사용,
+                       "off"이면 사용하지 않습니다
+    DEDUP_THRESHOLD    중복으로 볼 유사도 (0~1, 기본값: 0.8)
+    DEDUP_INDEX_PATH   색인 파일 경로 (기본값: .cache/dedup.sqlite3)
+"""
+
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import time
+from array import array
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+DEFAULT_PATH = os.path.join(".cache", "dedup.sqlite3")
+DEFAULT_THRESHOLD = 0.8
+DEDUP_MODES = ("reuse", "warn", "off")
+# 단어 1-gram부터 SHINGLE_SIZE-gram까지를 비교 단위로 씁니다
+SHINGLE_SIZE = 2
+# 서명 계산 방식이 바뀌면 올립니다. 색인을 열 때 저장된 서명을 다시 계산합니다
+SIGNATURE_VERSION = 2
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_MASK64 = (1 << 64) - 1
+# 실행마다 서명이 같도록 고정된 시드로 multiply-shift 해시 계수를 만듭니다
+_rng = random.Random(1729)
+_PERMUTATIONS = [(_rng.getrandbits(64) | 1, _rng.getrandbits(64)) for _ in range(NUM_PERM)]
+
+Signature = Tuple[int, ...]
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """문장 부호를 지우고 소문자로 바꾼 뒤 단어 1~size-gram 집합을 만듭니다."""
+    words = re.findall(r"\w+", text.lower())
+    return {" ".join(words[i:i + n]) for n in range(1, size + 1)
+            for i in range(len(words) - n + 1)}
+
+
+def minhash(text: str) -> Optional[Signature]:
+    """MinHash 서명. 비교할 내용이 없으면 None."""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+              for s in shingles(text)]
+    if not hashes:
+        return None
+    # ((a*h + b) mod 2^64)의 상위 32비트. 나머지 연산보다 빠르고 서명을 32비트로 저장할 수 있습니다
+    return tuple(min([((a * h + b) & _MASK64) >> 32 for h in hashes])
+                 for a, b in _PERMUTATIONS)
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """두 서명에서 추정한 자카드 유사도"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+class LSHIndex:
+    """서명을 밴드별 버킷에 넣어 비슷한 서명만 후보로 꺼냅니다."""
+
+    def __init__(self):
+        self._buckets: List[Dict[Signature, List[int]]] = [{} for _ in range(BANDS)]
+        self._signatures: Dict[int, Signature] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key: int, signature: Signature):
+        self._signatures[key] = signature
+        for band, buckets in enumerate(self._buckets):
+            buckets.setdefault(signature[band * ROWS:(band + 1) * ROWS], []).append(key)
+
+    def query(self, signature: Signature, threshold: float) -> List[Tuple[float, int]]:
+        """유사도가 threshold 이상인 (유사도, key)를 높은 순으로 반환합니다."""
+        candidates: Set[int] = set()
+        for band, buckets in enumerate(self._buckets):
+            candidates.update(buckets.get(signature[band * ROWS:(band + 1) * ROWS], ()))
+        matches = [(similarity(signature, self._signatures[key]), key) for key in candidates]
+        return sorted((match for match in matches if match[0] >= threshold), reverse=True)
+
+
+ARTICLE_COLUMNS = ("topic", "title", "subtitle", "description", "slug", "content", "notion_url")
+
+
+class DuplicateIndex:
+    """지난 기사의 주제/본문 서명을 저장하고 비슷한 기사를 찾습니다."""
+
+    def __init__(self, path: str = DEFAULT_PATH, threshold: float = DEFAULT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.topics = LSHIndex()
+        self.contents = LSHIndex()
+        self._lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT NOT NULL,
+                title TEXT,
+                subtitle TEXT,
+                description TEXT,
+                slug TEXT,
+                content TEXT,
+                notion_url TEXT,
+                topic_signature BLOB,
+                content_signature BLOB,
+                created_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SIGNATURE_VERSION:
+            self._resign()
+        for key, topic_sig, content_sig in self._conn.execute(
+                "SELECT id, topic_signature, content_signature FROM articles"):
+            self._index(key, _unpack(topic_sig), _unpack(content_sig))
+
+    def _resign(self):
+        """이전 방식으로 계산한 서명을 저장된 주제/본문으로 다시 계산합니다."""
+        rows = self._conn.execute("SELECT id, topic, content FROM articles").fetchall()
+        self._conn.executemany(
+            "UPDATE articles SET topic_signature = ?, content_signature = ? WHERE id = ?",
+            [(_pack(minhash(topic or "")), _pack(minhash(content or "")), key)
+             for key, topic, content in rows])
+        self._conn.execute(f"PRAGMA user_version = {SIGNATURE_VERSION}")
+        self._conn.commit()
+
+    def _index(self, key: int, topic_sig: Optional[Signature],
+               content_sig: Optional[Signature]):
+        if topic_sig is not None:
+            self.topics.add(key, topic_sig)
+        if content_sig is not None:
+            self.contents.add(key, content_sig)
+
+    def add(self, article: Dict[str, Any]) -> int:
+        topic_sig = minhash(article.get("topic") or "")
+        content_sig = minhash(article.get("content") or "")
+        with self._lock:
+            cursor = self._conn.execute(
+                f"INSERT INTO articles ({', '.join(ARTICLE_COLUMNS)}, topic_signature, "
+                f"content_signature, created_at) VALUES ({', '.join('?' * 10)})",
+                (*(article.get(column) or "" for column in ARTICLE_COLUMNS),
+                 _pack(topic_sig), _pack(content_sig), time.time()))
+            self._conn.commit()
+            self._index(cursor.lastrowid, topic_sig, content_sig)
+        return cursor.lastrowid
+
+    def get(self, key: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(ARTICLE_COLUMNS)} FROM articles WHERE id = ?",
+                (key,)).fetchone()
+        return dict(zip(ARTICLE_COLUMNS, row), id=key) if row else None
+
+    def _find(self, lsh: LSHIndex, text: str) -> Optional[Dict[str, Any]]:
+        signature = minhash(text)
+        if signature is None:
+            return None
+        with self._lock:
+            matches = lsh.query(signature, self.threshold)
+        if not matches:
+            return None
+        score, key = matches[0]
+        article = self.get(key)
+        return dict(article, similarity=score) if article else None
+
+    def find_topic(self, topic: str) -> Optional[Dict[str, Any]]:
+        """가장 비슷한 주제로 쓴 지난 기사. 임계값을 넘는 것이 없으면 None."""
+        return self._find(self.topics, topic)
+
+    def find_content(self, content: str) -> Optional[Dict[str, Any]]:
+        """본문이 가장 비슷한 지난 기사. 임계값을 넘는 것이 없으면 None."""
+        return self._find(self.contents, content)
+
+    def close(self):
+        self._conn.close()
+
+
+def _pack(signature: Optional[Signature]) -> Optional[bytes]:
+    return array("I", signature).tobytes() if signature is not None else None
+
+
+def _unpack(blob: Optional[bytes]) -> Optional[Signature]:
+    if blob is None:
+        return None
+    values = array("I")
+    values.frombytes(blob)
+    return tuple(values)
+
+
+_mode = os.getenv("DEDUP", "warn").lower()
+if _mode not in DEDUP_MODES:
+    _mode = "off" if _mode in ("0", "false", "no") else "warn"
+_index: Optional[DuplicateIndex] = None
+
+
+def dedup_mode() -> str:
+    return _mode
+
+
+def get_duplicate_index() -> Optional[DuplicateIndex]:
+    """설정된 색인을 반환합니다. 중복 감지가 꺼져 있으면 None을 반환합니다."""
+    global _index
+    if _mode == "off":
+        return None
+    if _index is None:
+        _index = DuplicateIndex(
+            os.getenv("DEDUP_INDEX_PATH", DEFAULT_PATH),
+            threshold=float(os.getenv("DEDUP_THRESHOLD", DEFAULT_THRESHOLD)))
+    return _index
+
+
+def configure_dedup(mode: str = "warn", index: Optional[DuplicateIndex] = None):
+    """중복 감지 방식을 바꾸고, 필요하면 사용할 색인을 지정합니다."""
+    global _mode, _index
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"알 수 없는 중복 감지 방식: {mode}")
+    _mode = mode
+    if index is not None:
+        _index = index
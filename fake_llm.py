@@ -0,0 +1,211 @@
+"""
+가짜 채팅 모델
+
+API 비용 없이 파이프라인 처리량을 재거나 테스트하기 위해 ChatAnthropic 대신 쓸 수 있는
+모델입니다. invoke/ainvoke/stream/astream을 지원하고, 응답 지연 분포, 출력 길이, 실패율을
+설정할 수 있습니다. 지연/출력/실패 여부는 (시드, 프롬프트)로 정해지므로 같은 설정과
+프롬프트로는 실행 순서나 동시성과 관계없이 항상 같은 결과가 나옵니다.
+
+설정 문자열은 ";"로 구분한 key=value 목록입니다. 예:
+    latency=lognormal:1.2,0.4;tokens=150-300;failure_rate=0.02;seed=7;chunk_tokens=8
+
+    latency        fixed:초 | uniform:최소,최대 | normal:평균,표준편차 | lognormal:중앙값,시그마
+    tokens         출력 토큰(단어) 수. "200" 또는 "150-300"
+    failure_rate   호출이 FakeModelError로 실패할 확률
+    chunk_tokens   스트리밍 청크 하나의 토큰 수
+
+FAKE_LLM으로 가짜 모델을 쓰면 실제 기록과 섞이지 않도록 예산 기록, LLM 응답 캐시,
+중복 감지 색인을 끕니다.
+
+환경 변수:
+    FAKE_LLM   설정하면 main/app의 기본 모델 대신 가짜 모델을 사용합니다 ("on"이면 기본 설정)
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import random
+import time
+from threading import Lock
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from budget import configure_budget
+from dedup import configure_dedup
+from llm_cache import configure_cache
+
+DEFAULT_TOKENS = (150, 300)
+DEFAULT_MAX_TOKENS = 1024
+# 출력 본문을 만드는 단어들
+VOCABULARY = ("인공지능", "기술", "사회", "변화", "윤리", "미래", "데이터", "인간", "책임",
+              "혁신", "교육", "경제", "위험", "기회", "규제", "신뢰", "창의성", "노동",
+              "지혜", "균형", "토론", "관점", "근거", "질문")
+
+
+class FakeModelError(Exception):
+    """설정된 실패율에 따라 가짜 모델이 던지는 오류"""
+
+
+class Latency:
+    """응답 지연 분포"""
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, kind: str = "fixed", *params: float):
+        if kind not in self.KINDS:
+            raise ValueError(f"알 수 없는 지연 분포: {kind}")
+        self.kind = kind
+        self.params = params or (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        """"lognormal:1.2,0.4"처럼 분포 이름과 인자로 만듭니다. 숫자만 있으면 고정 지연입니다."""
+        kind, _, args = spec.partition(":")
+        if not args:
+            return cls("fixed", float(kind))
+        return cls(kind, *(float(value) for value in args.split(",")))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params[:2])
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params[:2])
+        else:
+            median, sigma = self.params[:2]
+            value = rng.lognormvariate(math.log(median), sigma)
+        return max(0.0, value)
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+class FakeChatModel:
+    """ChatAnthropic 자리에 넣어 쓰는 결정적인 가짜 모델"""
+
+    def __init__(self, latency: Optional[Latency] = None,
+                 tokens: Tuple[int, int] = DEFAULT_TOKENS,
+                 failure_rate: float = 0.0, seed: int = 0, chunk_tokens: int = 8,
+                 max_tokens: int = DEFAULT_MAX_TOKENS,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.latency = latency or Latency()
+        self.tokens = tokens
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.max_tokens = max_tokens
+        self._sleep = sleep
+        self._lock = Lock()
+        self.calls = 0
+        self.failures = 0
+
+    @classmethod
+    def from_spec(cls, spec: str) -> "FakeChatModel":
+        options = {}
+        for item in spec.split(";"):
+            key, _, value = item.strip().partition("=")
+            if not value:
+                continue
+            if key == "latency":
+                options["latency"] = Latency.parse(value)
+            elif key == "tokens":
+                low, _, high = value.partition("-")
+                options["tokens"] = (int(low), int(high or low))
+            elif key == "failure_rate":
+                options["failure_rate"] = float(value)
+            elif key in ("seed", "chunk_tokens", "max_tokens"):
+                options[key] = int(value)
+            else:
+                raise ValueError(f"알 수 없는 가짜 모델 설정: {key}")
+        return cls(**options)
+
+    def _plan(self, prompt: Any) -> Tuple[float, bool, List[str], int]:
+        """(지연, 실패 여부, 출력 단어, 입력 토큰 수)"""
+        text = str(prompt)
+        digest = hashlib.sha256(f"{self.seed}:{text}".encode("utf-8")).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "big"))
+        delay = self.latency.sample(rng)
+        failed = rng.random() < self.failure_rate
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(*self.tokens))]
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+        # 입력 토큰은 한국어 기준 대략 글자 3개당 1개로 어림합니다
+        return delay, failed, words, len(text) // 3 + 1
+
+    @staticmethod
+    def _content(prompt: Any, words: List[str]) -> str:
+        # 메타데이터 프롬프트에는 파싱할 수 있는 형식으로 답합니다
+        if "슬러그:" in str(prompt):
+            head = " ".join(words[:4])
+            return (f"제목: {head}\n부제목: {' '.join(words[4:9])}\n"
+                    f"요약: {' '.join(words[9:30])}\n슬러그: {'-'.join(words[:3])}")
+        return " ".join(words)
+
+    @staticmethod
+    def _usage(input_tokens: int, output_tokens: int) -> dict:
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _chunks(self, content: str) -> List[str]:
+        words = content.split(" ")
+        return [" ".join(words[i:i + self.chunk_tokens]) + " "
+                for i in range(0, len(words), self.chunk_tokens)]
+
+    def invoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        delay, failed, words, input_tokens = self._plan(prompt)
+        self._sleep(delay)
+        if failed:
+            raise FakeModelError("가짜 모델 호출 실패")
+        return AIMessage(content=self._content(prompt, words),
+                         usage_metadata=self._usage(input_tokens, len(words)))
+
+    async def ainvoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        delay, failed, words, input_tokens = self._plan(prompt)
+        await asyncio.sleep(delay)
+        if failed:
+            raise FakeModelError("가짜 모델 호출 실패")
+        return AIMessage(content=self._content(prompt, words),
+                         usage_metadata=self._usage(input_tokens, len(words)))
+
+    def stream(self, prompt: Any, *args, **kwargs) -> Iterator[AIMessageChunk]:
+        """지연을 청크마다 나누어 기다리며 내보냅니다. 사용량은 마지막 청크에 담습니다."""
+        delay, failed, words, input_tokens = self._plan(prompt)
+        chunks = self._chunks(self._content(prompt, words))
+        for i, piece in enumerate(chunks):
+            self._sleep(delay / len(chunks))
+            if failed and i == len(chunks) // 2:
+                raise FakeModelError("가짜 모델 스트리밍 중 실패")
+            last = i == len(chunks) - 1
+            yield AIMessageChunk(content=piece, usage_metadata=self._usage(
+                input_tokens, len(words)) if last else None)
+
+    async def astream(self, prompt: Any, *args, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        delay, failed, words, input_tokens = self._plan(prompt)
+        chunks = self._chunks(self._content(prompt, words))
+        for i, piece in enumerate(chunks):
+            await asyncio.sleep(delay / len(chunks))
+            if failed and i == len(chunks) // 2:
+                raise FakeModelError("가짜 모델 스트리밍 중 실패")
+            last = i == len(chunks) - 1
+            yield AIMessageChunk(content=piece, usage_metadata=self._usage(
+                input_tokens, len(words)) if last else None)
+
+
+def fake_model_from_env() -> Optional[FakeChatModel]:
+    """FAKE_LLM이 설정되어 있으면 가짜 모델을, 아니면 None을 반환합니다.
+
+    가짜 응답이 실제 사용액, 응답 캐시, 지난 기사 색인에 남지 않도록 셋 다 끕니다.
+    """
+    spec = os.getenv("FAKE_LLM", "")
+    if spec.lower() in ("", "off", "0", "false", "no"):
+        return None
+    model = FakeChatModel() if spec.lower() in ("on", "1", "true", "yes") else \
+        FakeChatModel.from_spec(spec)
+    configure_budget(enabled=False)
+    configure_cache(enabled=False)
+    configure_dedup("off")
+    return model
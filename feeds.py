@@ -0,0 +1,261 @@
+"""
+피드 기반 자동 주제 선택
+
+설정된 RSS/Atom 피드를 조건부 GET(ETag/Last-Modified)으로 가져와 새 항목만 로컬
+SQLite 색인에 쌓습니다. 항목은 GUID 또는 정규화한 링크로 식별하므로 같은 기사가
+여러 피드나 여러 번의 폴링에 나와도 한 번만 저장되고, 대신 몇 개의 피드에 실렸는지가
+기록됩니다. 주제가 필요하면 아직 사용하지 않은 항목 중 최신성(반감기)과 빈도(실린
+피드 수)로 점수를 매겨 가장 높은 항목을 고르고 사용한 것으로 표시합니다.
+
+환경 변수:
+    TOPIC_FEEDS            쉼표로 구분한 RSS/Atom 피드 URL 목록 (없으면 기본 주제를 사용)
+    FEED_INDEX_PATH        색인 파일 경로 (기본값: .cache/feeds.sqlite3)
+    FEED_HALF_LIFE_HOURS   최신성 점수가 절반이 되는 시간 (기본값: 24)
+    FEED_MAX_AGE_DAYS      이보다 오래된 항목은 후보에서 제외 (기본값: 7)
+"""
+
+import os
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import cassette
+import fetcher
+import metrics
+import tracing
+from fetcher import get_session
+
+DEFAULT_PATH = os.path.join(".cache", "feeds.sqlite3")
+HALF_LIFE_HOURS = float(os.getenv("FEED_HALF_LIFE_HOURS", 24))
+MAX_AGE_DAYS = float(os.getenv("FEED_MAX_AGE_DAYS", 7))
+POLL_CONCURRENCY = 4
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+# 같은 기사를 가리키는 링크를 하나로 모으기 위해 지우는 추적용 쿼리 파라미터
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref")
+
+
+@dataclass
+class FeedEntry:
+    key: str
+    title: str
+    link: str
+    published: Optional[float]
+
+
+def normalize_url(url: str) -> str:
+    """스킴/호스트 소문자화, 기본 포트/프래그먼트/추적 파라미터/끝 슬래시 제거"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)))
+    return urlunsplit((scheme, host, parts.path.rstrip("/") or "/", query, ""))
+
+
+def parse_date(value: Optional[str]) -> Optional[float]:
+    """RSS(RFC 822)와 Atom(ISO 8601) 날짜를 타임스탬프로 바꿉니다."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _text(element: Optional[ET.Element]) -> str:
+    return (element.text or "").strip() if element is not None else ""
+
+
+def entry_key(guid: str, link: str) -> str:
+    # URL 형태의 GUID도 링크와 같은 방식으로 정규화합니다
+    value = guid or link
+    return normalize_url(value) if value.startswith(("http://", "https://")) else value
+
+
+def parse_feed(data: bytes) -> List[FeedEntry]:
+    """RSS 2.0 또는 Atom 문서에서 항목을 꺼냅니다."""
+    root = ET.fromstring(data)
+    entries = []
+    for item in root.iter("item"):
+        link = _text(item.find("link"))
+        guid = _text(item.find("guid"))
+        title = _text(item.find("title"))
+        if title and (guid or link):
+            entries.append(FeedEntry(entry_key(guid, link), title, link,
+                                     parse_date(_text(item.find("pubDate")))))
+    for item in root.iter(f"{ATOM}entry"):
+        link_element = item.find(f"{ATOM}link[@rel='alternate']")
+        if link_element is None:
+            link_element = item.find(f"{ATOM}link")
+        link = link_element.get("href", "") if link_element is not None else ""
+        guid = _text(item.find(f"{ATOM}id"))
+        title = _text(item.find(f"{ATOM}title"))
+        published = _text(item.find(f"{ATOM}published")) or _text(item.find(f"{ATOM}updated"))
+        if title and (guid or link):
+            entries.append(FeedEntry(entry_key(guid, link), title, link, parse_date(published)))
+    return entries
+
+
+def recency_score(published: float, mentions: int, now: float,
+                  half_life_hours: float = HALF_LIFE_HOURS) -> float:
+    age_hours = max(0.0, now - published) / 3600
+    return mentions * 0.5 ** (age_hours / half_life_hours)
+
+
+class FeedIndex:
+    """피드 검증자와 지금까지 본 항목을 저장하는 SQLite 색인"""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS feeds (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                checked_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                link TEXT,
+                published REAL NOT NULL,
+                used INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS sightings (
+                key TEXT NOT NULL,
+                feed TEXT NOT NULL,
+                PRIMARY KEY (key, feed)
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_candidates ON entries(used, published);
+        """)
+        self._conn.commit()
+
+    def validators(self, feed_url: str) -> Dict[str, Optional[str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM feeds WHERE url = ?", (feed_url,)).fetchone()
+        return {"etag": row[0], "last_modified": row[1]} if row else {}
+
+    def record_poll(self, feed_url: str, etag: Optional[str], last_modified: Optional[str],
+                    entries: List[FeedEntry], now: Optional[float] = None) -> int:
+        """새로 본 항목을 저장하고, 처음 본 항목 수를 반환합니다."""
+        now = time.time() if now is None else now
+        added = 0
+        with self._lock:
+            for entry in entries:
+                # 날짜가 없는 항목은 처음 본 시각을 게시 시각으로 씁니다
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO entries (key, title, link, published) "
+                    "VALUES (?, ?, ?, ?)",
+                    (entry.key, entry.title, entry.link,
+                     entry.published if entry.published is not None else now))
+                added += cursor.rowcount
+                self._conn.execute("INSERT OR IGNORE INTO sightings VALUES (?, ?)",
+                                   (entry.key, feed_url))
+            self._conn.execute("INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?)",
+                               (feed_url, etag, last_modified, now))
+            self._conn.commit()
+        return added
+
+    def candidates(self, now: float, max_age_days: float = MAX_AGE_DAYS
+                   ) -> List[Tuple[str, str, float, int]]:
+        """사용하지 않은 최근 항목의 (key, title, published, 실린 피드 수)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT e.key, e.title, e.published, COUNT(s.feed) FROM entries e "
+                "JOIN sightings s ON s.key = e.key "
+                "WHERE e.used = 0 AND e.published >= ? GROUP BY e.key",
+                (now - max_age_days * 86400,)).fetchall()
+
+    def pick(self, now: Optional[float] = None) -> Optional[str]:
+        """점수가 가장 높은 미사용 항목의 제목을 반환하고 사용한 것으로 표시합니다."""
+        now = time.time() if now is None else now
+        rows = self.candidates(now)
+        if not rows:
+            return None
+        key, title, _, _ = max(rows, key=lambda row: recency_score(row[2], row[3], now))
+        with self._lock:
+            self._conn.execute("UPDATE entries SET used = 1 WHERE key = ?", (key,))
+            self._conn.commit()
+        return title
+
+    def close(self):
+        self._conn.close()
+
+
+def poll_feed(index: FeedIndex, feed_url: str, session: Any = None) -> int:
+    """피드를 조건부 GET으로 가져와 색인에 반영하고, 새 항목 수를 반환합니다."""
+    with tracing.span("poll_feed", "http", url=feed_url) as span, \
+            metrics.timer("sages_http_request_duration_seconds", "sages_http_errors_total",
+                          kind="feed"):
+        response = (session or get_session()).get(
+            feed_url, headers=fetcher.conditional_headers(index.validators(feed_url)),
+            timeout=(fetcher.CONNECT_TIMEOUT, fetcher.READ_TIMEOUT))
+        span.set(status=response.status_code)
+        if response.status_code == 304:
+            return 0
+        response.raise_for_status()
+        span.set(bytes=len(response.content))
+    return index.record_poll(feed_url, response.headers.get("ETag"),
+                             response.headers.get("Last-Modified"),
+                             parse_feed(response.content))
+
+
+FEEDS = [url.strip() for url in os.getenv("TOPIC_FEEDS", "").split(",") if url.strip()]
+_index: Optional[FeedIndex] = None
+
+
+def get_index() -> FeedIndex:
+    global _index
+    if _index is None:
+        _index = FeedIndex(os.getenv("FEED_INDEX_PATH", DEFAULT_PATH))
+    return _index
+
+
+def auto_topic(feeds: Optional[List[str]] = None, index: Optional[FeedIndex] = None,
+               session: Any = None, now: Optional[float] = None) -> Optional[str]:
+    """피드를 갱신하고 다음 주제를 고릅니다. 피드가 없거나 후보가 없으면 None."""
+    feeds = FEEDS if feeds is None else feeds
+    if not feeds:
+        return None
+    # 카세트에는 고른 주제만 녹화하므로 재생 결과가 로컬 색인이나 시각에 따라 달라지지 않습니다
+    return cassette.fetch("auto_topic", {"feeds": feeds},
+                          lambda: _poll_and_pick(feeds, index or get_index(), session, now))
+
+
+def _poll_and_pick(feeds: List[str], index: FeedIndex, session: Any,
+                   now: Optional[float]) -> Optional[str]:
+    def poll(feed_url: str):
+        try:
+            poll_feed(index, feed_url, session)
+        except Exception as e:
+            # 피드 하나가 실패해도 이미 색인된 항목과 다른 피드로 주제를 고릅니다
+            print(f"피드를 가져오지 못했습니다 ({feed_url}): {e}")
+
+    with ThreadPoolExecutor(max_workers=min(POLL_CONCURRENCY, len(feeds))) as pool:
+        list(pool.map(poll, feeds))
+    return index.pick(now)
@@ -0,0 +1,212 @@
+"""
+웹 페이지 제목 가져오기
+
+URL 주제의 <title>만 필요하므로 연결 풀을 공유하는 세션으로 요청하고, 연결/읽기
+시간 제한을 두며, 본문을 스트리밍으로 읽다가 </title> 또는 </head>가 보이거나 크기
+상한에 닿으면 멈춥니다. ETag/Last-Modified를 SQLite 파일에 저장해 두고 다음 요청에서
+조건부 GET을 보내며, 304 응답이면 저장해 둔 제목을 그대로 씁니다. lxml이 설치되어
+있으면 더 빠른 lxml 파서를 사용합니다.
+
+환경 변수:
+    FETCH_CONNECT_TIMEOUT   연결 시간 제한(초, 기본값: 3.05)
+    FETCH_READ_TIMEOUT      읽기 시간 제한(초, 기본값: 10)
+    FETCH_MAX_BYTES         페이지당 최대 읽기 크기(바이트, 기본값: 524288)
+    FETCH_CACHE             "off"/"0"/"false"이면 조건부 GET 캐시를 사용하지 않습니다
+    FETCH_CACHE_PATH        캐시 파일 경로 (기본값: .cache/fetch_cache.sqlite3)
+"""
+
+import os
+import re
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+import cassette
+import metrics
+import tracing
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+DEFAULT_PATH = os.path.join(".cache", "fetch_cache.sqlite3")
+CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", 10))
+MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", 512 * 1024))
+CHUNK_SIZE = 8192
+POOL_SIZE = 16
+USER_AGENT = "ai-sages/1.0 (+topic fetcher)"
+
+# 여기까지 읽으면 제목은 이미 지나갔습니다
+HEAD_END = re.compile(rb"</title\s*>|</head\s*>", re.IGNORECASE)
+CHARSET = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+
+class TitleCache:
+    """URL별 제목과 검증자(ETag, Last-Modified)를 보관합니다."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                title TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )""")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, etag, last_modified FROM pages WHERE url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        return {"title": row[0], "etag": row[1], "last_modified": row[2]}
+
+    def put(self, url: str, title: Optional[str], etag: Optional[str],
+            last_modified: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                (url, title, etag, last_modified, time.time()))
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    headers = {}
+    if entry:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def read_head(response: Any, max_bytes: int = MAX_BYTES) -> bytes:
+    """</title> 또는 </head>가 나오거나 max_bytes를 넘을 때까지만 본문을 읽습니다."""
+    data = b""
+    try:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            # 청크 경계에 걸친 태그도 찾도록 직전 몇 바이트부터 검사합니다
+            start = max(0, len(data) - 16)
+            data += chunk
+            if HEAD_END.search(data, start) or len(data) >= max_bytes:
+                break
+    finally:
+        response.close()
+    return data[:max_bytes]
+
+
+def header_charset(content_type: Optional[str]) -> Optional[str]:
+    """Content-Type에 명시된 charset. 없으면 None이며, 이때는 파서가 meta 태그로 판단합니다."""
+    match = CHARSET.search(content_type or "")
+    return match.group(1) if match else None
+
+
+def parse_title(html: bytes, encoding: Optional[str] = None) -> Optional[str]:
+    soup = BeautifulSoup(html, HTML_PARSER, from_encoding=encoding)
+    if soup.title is None or soup.title.string is None:
+        return None
+    return soup.title.string.strip() or None
+
+
+_session: Optional[requests.Session] = None
+_session_lock = Lock()
+
+
+def get_session() -> requests.Session:
+    """프로세스 전체가 공유하는 연결 풀 세션"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+_cache: Optional[TitleCache] = None
+_enabled = os.getenv("FETCH_CACHE", "on").lower() not in ("off", "0", "false", "no")
+
+
+def get_cache() -> Optional[TitleCache]:
+    """설정된 캐시를 반환합니다. 캐시가 꺼져 있으면 None을 반환합니다."""
+    global _cache
+    if not _enabled:
+        return None
+    if _cache is None:
+        _cache = TitleCache(os.getenv("FETCH_CACHE_PATH", DEFAULT_PATH))
+    return _cache
+
+
+def configure_fetch_cache(enabled: bool = True, cache: Optional[TitleCache] = None):
+    """캐시를 켜거나 끄고, 필요하면 사용할 캐시 인스턴스를 지정합니다."""
+    global _cache, _enabled
+    _enabled = enabled
+    if cache is not None:
+        _cache = cache
+
+
+def fetch_title(url: str, session: Optional[requests.Session] = None,
+                timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+                max_bytes: int = MAX_BYTES) -> Optional[str]:
+    """페이지의 <title>을 반환합니다. 제목이 없으면 None, 요청이 실패하면 예외를 던집니다."""
+    return cassette.fetch("fetch_title", {"url": url},
+                          lambda: _fetch_title(url, session, timeout, max_bytes))
+
+
+def _fetch_title(url: str, session: Optional[requests.Session],
+                 timeout: Tuple[float, float], max_bytes: int) -> Optional[str]:
+    session = session or get_session()
+    cache = get_cache()
+    entry = cache.get(url) if cache is not None else None
+    with tracing.span("fetch_title", "http", url=url) as span, \
+            metrics.timer("sages_http_request_duration_seconds", "sages_http_errors_total",
+                          kind="title"):
+        response = session.get(url, headers=conditional_headers(entry),
+                               timeout=timeout, stream=True)
+        span.set(status=response.status_code)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            cache.hits += 1
+            metrics.inc("sages_cache_hits_total", cache="fetch")
+            return entry["title"]
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        head = read_head(response, max_bytes)
+        span.set(bytes=len(head))
+
+    title = parse_title(head, header_charset(response.headers.get("Content-Type")))
+    if cache is not None:
+        cache.misses += 1
+        metrics.inc("sages_cache_misses_total", cache="fetch")
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            cache.put(url, title, etag, last_modified)
+    return title
@@ -0,0 +1,183 @@
+"""
+URL 일괄 수집
+
+여러 뉴스 URL의 제목을 동시에 가져와 주제로 만듭니다. 전체 동시 요청 수와 호스트별
+동시 요청 수를 따로 제한하여 한 사이트에 요청이 몰리지 않게 하고, 호스트별 robots.txt
+판단을 TTL 동안 재사용합니다. 실패한 URL은 공통 안내 문구 대신 URL별 오류로 돌려줍니다.
+
+배치 작업은 TopicResolver를 공유하여 작업마다 자기 URL을 가져옵니다. 같은 제한을 지키고
+같은 URL은 한 번만 요청하면서, 가져오는 구간이 그 작업의 실행 추적에 기록됩니다.
+
+환경 변수:
+    INGEST_CONCURRENCY   전체 동시 요청 수 (기본값: 8)
+    INGEST_PER_HOST      호스트별 동시 요청 수 (기본값: 2)
+    ROBOTS_TTL           robots.txt 판단 유효 시간(초, 기본값: 3600)
+"""
+
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Lock, Semaphore
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import cassette
+import fetcher
+import metrics
+from fetcher import fetch_title, get_session
+
+DEFAULT_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", 8))
+DEFAULT_PER_HOST = int(os.getenv("INGEST_PER_HOST", 2))
+ROBOTS_TTL = float(os.getenv("ROBOTS_TTL", 3600))
+
+
+@dataclass
+class TopicResult:
+    url: str
+    topic: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class RobotsCache:
+    """호스트별 robots.txt 규칙을 TTL 동안 보관합니다."""
+
+    def __init__(self, session: Any = None, ttl: float = ROBOTS_TTL):
+        self.session = session
+        self.ttl = ttl
+        self._parsers: Dict[str, Tuple[float, RobotFileParser]] = {}
+        self._locks: Dict[str, Lock] = {}
+        self._lock = Lock()
+        self.fetches = 0
+
+    def _origin_lock(self, key: str) -> Lock:
+        with self._lock:
+            return self._locks.setdefault(key, Lock())
+
+    def _load(self, key: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{key}/robots.txt")
+        self.fetches += 1
+        try:
+            with metrics.timer("sages_http_request_duration_seconds", "sages_http_errors_total",
+                               kind="robots"):
+                status, text = cassette.fetch("robots", {"url": parser.url},
+                                              lambda: self._get(parser.url))
+        except Exception:
+            # robots.txt를 받을 수 없으면 제한이 없는 것으로 봅니다
+            parser.allow_all = True
+            return parser
+        # urllib.robotparser와 같은 규칙: 401/403은 전부 금지, 그 밖의 4xx/5xx는 전부 허용
+        if status in (401, 403):
+            parser.disallow_all = True
+        elif status >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(text.splitlines())
+        return parser
+
+    def _get(self, url: str) -> Tuple[int, str]:
+        response = (self.session or get_session()).get(
+            url, timeout=(fetcher.CONNECT_TIMEOUT, fetcher.READ_TIMEOUT))
+        return response.status_code, response.text
+
+    def allowed(self, url: str, user_agent: str = fetcher.USER_AGENT) -> bool:
+        key = origin(url)
+        # 같은 호스트의 URL이 동시에 들어와도 robots.txt는 한 번만 받습니다
+        with self._origin_lock(key):
+            cached = self._parsers.get(key)
+            if cached is None or time.monotonic() - cached[0] > self.ttl:
+                cached = (time.monotonic(), self._load(key))
+                self._parsers[key] = cached
+        return cached[1].can_fetch(user_agent, url)
+
+
+class HostLimiter:
+    """호스트별 동시 요청 수를 제한합니다."""
+
+    def __init__(self, per_host: int = DEFAULT_PER_HOST):
+        self.per_host = max(1, per_host)
+        self._semaphores: Dict[str, Semaphore] = {}
+        self._lock = Lock()
+
+    def __call__(self, url: str) -> Semaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            return self._semaphores.setdefault(host, Semaphore(self.per_host))
+
+
+_robots: Optional[RobotsCache] = None
+
+
+def default_robots() -> RobotsCache:
+    """프로세스 전체가 공유하는 robots.txt 캐시"""
+    global _robots
+    if _robots is None:
+        _robots = RobotsCache()
+    return _robots
+
+
+def resolve_topic(url: str, robots: RobotsCache, hosts: HostLimiter,
+                  session: Any = None) -> TopicResult:
+    if urlsplit(url).scheme not in ("http", "https"):
+        return TopicResult(url, error="지원하지 않는 URL입니다")
+    try:
+        if not robots.allowed(url):
+            return TopicResult(url, error="robots.txt에서 수집을 허용하지 않습니다")
+        with hosts(url):
+            title = fetch_title(url, session=session)
+    except Exception as e:
+        return TopicResult(url, error=f"{type(e).__name__}: {e}")
+    if not title:
+        return TopicResult(url, error="웹 페이지 제목을 찾을 수 없습니다")
+    return TopicResult(url, topic=title)
+
+
+class TopicResolver:
+    """여러 작업이 공유하는 URL 제목 조회. 처음 요청한 작업의 스레드에서 가져오고 결과를 재사용합니다."""
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY,
+                 per_host: int = DEFAULT_PER_HOST,
+                 robots: Optional[RobotsCache] = None, session: Any = None):
+        self.robots = robots or default_robots()
+        self.hosts = HostLimiter(per_host)
+        self.session = session
+        self._slots = Semaphore(max(1, concurrency))
+        self._results: Dict[str, "Future[TopicResult]"] = {}
+        self._lock = Lock()
+
+    def resolve(self, url: str) -> TopicResult:
+        with self._lock:
+            future = self._results.get(url)
+            owner = future is None
+            if owner:
+                future = self._results[url] = Future()
+        if owner:
+            with self._slots:
+                future.set_result(resolve_topic(url, self.robots, self.hosts, self.session))
+        return future.result()
+
+
+def resolve_topics(urls: List[str], concurrency: int = DEFAULT_CONCURRENCY,
+                   per_host: int = DEFAULT_PER_HOST,
+                   robots: Optional[RobotsCache] = None,
+                   session: Any = None) -> List[TopicResult]:
+    """URL 목록의 제목을 동시에 가져옵니다. 결과는 입력 순서를 따르며, 중복 URL은 한 번만 요청합니다."""
+    robots = robots or default_robots()
+    hosts = HostLimiter(per_host)
+    unique = list(dict.fromkeys(urls))
+    if not unique:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(unique)))) as pool:
+        resolved = dict(zip(unique, pool.map(
+            lambda url: resolve_topic(url, robots, hosts, session), unique)))
+    return [resolved[url] for url in urls]
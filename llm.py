@@ -0,0 +1,235 @@
+"""
+모델 호출과 토큰/비용 집계
+
+모델 응답에 포함된 사용량(usage) 정보를 우선 사용하고,
+사용량이 없는 경우에만 로컬 토크나이저로 토큰 수를 계산합니다.
+비용은 가격표(pricing.py)의 모델별 단가로 계산하며, 캐시 읽기/쓰기 토큰은 따로 계산합니다.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+from langchain_core.messages import AIMessage
+
+import metrics
+import tracing
+from cassette import wrap_model
+from llm_cache import cache_key, get_cache, sampling_params
+from pricing import get_registry
+from token_counter import count_tokens
+
+
+# 스트리밍 중 받은 텍스트 조각을 전달받는 콜백
+TokenCallback = Callable[[str], None]
+
+
+@dataclass
+class ModelCall:
+    """한 번의 모델 호출 결과와 사용량"""
+    content: str
+    input_tokens: int
+    output_tokens: int
+    cost: float
+    cached: bool = False
+    model: str = ""
+    # input_tokens 중 프롬프트 캐시에서 읽거나 캐시에 쓴 토큰 수
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+
+# 비용 계산 함수
+
+
+def calculate_cost(input_tokens: int, output_tokens: int, model: str,
+                   cache_read_tokens: int = 0, cache_write_tokens: int = 0) -> float:
+    """가격표의 단가로 비용을 계산합니다. input_tokens는 캐시를 거치지 않은 입력입니다.
+
+    가격표에 없는 모델이면 UnknownModelError(ValueError)를 던집니다.
+    """
+    return get_registry().cost(model, input_tokens, output_tokens,
+                               cache_read_tokens, cache_write_tokens)
+
+
+def usage_from_response(response: Any) -> Optional[Tuple[int, int]]:
+    """응답에 포함된 (입력 토큰, 출력 토큰)을 반환합니다. 없으면 None."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage and usage.get("input_tokens") is not None:
+        return int(usage["input_tokens"]), int(usage.get("output_tokens") or 0)
+
+    # langchain-anthropic 구버전은 response_metadata에만 원본 usage를 담습니다
+    metadata = getattr(response, "response_metadata", None) or {}
+    raw = metadata.get("usage")
+    if raw:
+        if not isinstance(raw, dict):
+            raw = getattr(raw, "__dict__", {})
+        if raw.get("input_tokens") is not None:
+            input_tokens = int(raw["input_tokens"])
+            input_tokens += int(raw.get("cache_read_input_tokens") or 0)
+            input_tokens += int(raw.get("cache_creation_input_tokens") or 0)
+            return input_tokens, int(raw.get("output_tokens") or 0)
+    return None
+
+
+def cache_usage(response: Any) -> Tuple[int, int]:
+    """입력 토큰 중 (캐시 읽기, 캐시 쓰기) 토큰 수. 정보가 없으면 (0, 0)."""
+    usage = getattr(response, "usage_metadata", None)
+    details = (usage or {}).get("input_token_details") or {}
+    if details:
+        return int(details.get("cache_read") or 0), int(details.get("cache_creation") or 0)
+    raw = (getattr(response, "response_metadata", None) or {}).get("usage") or {}
+    if not isinstance(raw, dict):
+        raw = getattr(raw, "__dict__", {})
+    return (int(raw.get("cache_read_input_tokens") or 0),
+            int(raw.get("cache_creation_input_tokens") or 0))
+
+
+def message_text(content: Any) -> str:
+    """메시지 content(문자열 또는 content block 리스트)에서 텍스트만 꺼냅니다."""
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in content or [])
+
+
+def account(prompt: str, response: Any, model_name: str) -> ModelCall:
+    """응답의 사용량으로 토큰과 비용을 집계합니다."""
+    content = message_text(response.content)
+    usage = usage_from_response(response)
+    cache_read, cache_write = (0, 0)
+    if usage is None:
+        usage = (count_tokens(prompt), count_tokens(content))
+    else:
+        cache_read, cache_write = cache_usage(response)
+    input_tokens, output_tokens = usage
+    return ModelCall(
+        content=content,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cost=calculate_cost(max(0, input_tokens - cache_read - cache_write), output_tokens,
+                            model_name, cache_read, cache_write),
+        model=model_name,
+        cache_read_tokens=cache_read,
+        cache_write_tokens=cache_write
+    )
+
+
+def cached_call(model: Any, model_name: str, prompt: str) -> Tuple[Optional[str], Optional[ModelCall]]:
+    """(캐시 키, 캐시된 결과)를 반환합니다. 캐시 적중 시 추가 비용은 0입니다."""
+    cache = get_cache()
+    if cache is None:
+        return None, None
+    key = cache_key(model_name, prompt, sampling_params(model))
+    content = cache.get(key)
+    metrics.inc("sages_cache_misses_total" if content is None else "sages_cache_hits_total",
+                cache="llm")
+    if content is None:
+        return key, None
+    return key, ModelCall(content=content, input_tokens=0, output_tokens=0,
+                          cost=0.0, cached=True, model=model_name)
+
+
+def store_call(key: Optional[str], model_name: str, result: ModelCall):
+    cache = get_cache()
+    if key is not None and cache is not None:
+        cache.put(key, model_name, result.content)
+
+
+def stream_response(model: Any, prompt: str, on_token: TokenCallback) -> Any:
+    """토큰을 받는 즉시 on_token으로 넘기고, 모든 청크를 합친 응답을 반환합니다."""
+    response = None
+    for chunk in model.stream(prompt):
+        text = message_text(chunk.content)
+        if text:
+            on_token(text)
+        # 청크를 더하면 content와 usage_metadata가 함께 합쳐집니다
+        response = chunk if response is None else response + chunk
+    return response if response is not None else AIMessage(content="")
+
+
+async def astream_response(model: Any, prompt: str, on_token: TokenCallback) -> Any:
+    response = None
+    async for chunk in model.astream(prompt):
+        text = message_text(chunk.content)
+        if text:
+            on_token(text)
+        response = chunk if response is None else response + chunk
+    return response if response is not None else AIMessage(content="")
+
+
+def call_model(model: Any, model_name: str, prompt: str,
+               on_token: Optional[TokenCallback] = None,
+               budget: Optional[Any] = None) -> ModelCall:
+    """모델을 호출하고 사용량을 집계합니다. on_token이 있으면 스트리밍으로 호출합니다.
+
+    budget(RunBudget)이 있으면 호출 전에 비용 상한을 예약하고, 예산을 넘을 호출은
+    보내지 않고 BudgetExceeded를 던집니다.
+    """
+    key, hit = cached_call(model, model_name, prompt)
+    if hit is not None:
+        metrics.record_call(model_name, hit)
+        tracing.instant("llm cache hit", "llm", model=model_name, content_chars=len(hit.content))
+        if on_token is not None:
+            on_token(hit.content)
+        return hit
+    model = wrap_model(model, model_name)
+    estimate = budget.reserve_call(model, model_name, prompt) if budget is not None else 0.0
+    try:
+        with tracing.span(model_name, "llm", prompt_chars=len(prompt),
+                          streaming=on_token is not None) as span:
+            with metrics.timer("sages_model_call_duration_seconds", "sages_model_errors_total",
+                               model=model_name):
+                if on_token is None:
+                    response = model.invoke(prompt)
+                else:
+                    response = stream_response(model, prompt, on_token)
+            result = account(prompt, response, model_name)
+            span.set(input_tokens=result.input_tokens, output_tokens=result.output_tokens,
+                     cache_read_tokens=result.cache_read_tokens,
+                     content_chars=len(result.content), cost=result.cost)
+    except Exception:
+        if budget is not None:
+            budget.settle(estimate, 0.0)
+        raise
+    if budget is not None:
+        budget.settle(estimate, result.cost)
+    metrics.record_call(model_name, result)
+    store_call(key, model_name, result)
+    return result
+
+
+async def acall_model(model: Any, model_name: str, prompt: str,
+                      on_token: Optional[TokenCallback] = None,
+                      budget: Optional[Any] = None) -> ModelCall:
+    """모델을 비동기(ainvoke/astream)로 호출하고 사용량을 집계합니다."""
+    key, hit = cached_call(model, model_name, prompt)
+    if hit is not None:
+        metrics.record_call(model_name, hit)
+        tracing.instant("llm cache hit", "llm", model=model_name, content_chars=len(hit.content))
+        if on_token is not None:
+            on_token(hit.content)
+        return hit
+    model = wrap_model(model, model_name)
+    estimate = budget.reserve_call(model, model_name, prompt) if budget is not None else 0.0
+    try:
+        with tracing.span(model_name, "llm", prompt_chars=len(prompt),
+                          streaming=on_token is not None) as span:
+            with metrics.timer("sages_model_call_duration_seconds", "sages_model_errors_total",
+                               model=model_name):
+                if on_token is None:
+                    response = await model.ainvoke(prompt)
+                else:
+                    response = await astream_response(model, prompt, on_token)
+            result = account(prompt, response, model_name)
+            span.set(input_tokens=result.input_tokens, output_tokens=result.output_tokens,
+                     cache_read_tokens=result.cache_read_tokens,
+                     content_chars=len(result.content), cost=result.cost)
+    except Exception:
+        if budget is not None:
+            budget.settle(estimate, 0.0)
+        raise
+    if budget is not None:
+        budget.settle(estimate, result.cost)
+    metrics.record_call(model_name, result)
+    store_call(key, model_name, result)
+    return result
@@ -0,0 +1,157 @@
+"""
+LLM 응답 캐시
+
+모델 이름, 프롬프트, 샘플링 파라미터의 해시를 키로 응답을 SQLite 파일에 저장합니다.
+전체 크기가 상한을 넘으면 가장 오래 사용하지 않은 항목부터 지우고(LRU),
+TTL이 지난 항목은 캐시 미스로 처리합니다.
+
+환경 변수:
+    LLM_CACHE          "off"/"0"/"false"이면 캐시를 사용하지 않습니다
+    LLM_CACHE_PATH     캐시 파일 경로 (기본값: .cache/llm_cache.sqlite3)
+    LLM_CACHE_TTL      항목 유효 시간(초, 기본값: 7일)
+    LLM_CACHE_MAX_MB   캐시 최대 크기(MB, 기본값: 200)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, Optional
+
+DEFAULT_PATH = os.path.join(".cache", "llm_cache.sqlite3")
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_MB = 200
+
+# 응답에 영향을 주는 모델 파라미터
+SAMPLING_PARAMS = ("temperature", "top_p", "top_k", "max_tokens", "stop")
+
+
+def sampling_params(model: Any) -> Dict[str, Any]:
+    params = {}
+    for name in SAMPLING_PARAMS:
+        value = getattr(model, name, None)
+        if value is not None:
+            params[name] = value
+    return params
+
+
+def cache_key(model_name: str, prompt: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps([model_name, prompt, params],
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite 기반 LRU + TTL 응답 캐시"""
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model_name: str, content: str):
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, content, size, now, now))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": entries, "bytes": total}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+_cache: Optional[ResponseCache] = None
+_enabled = os.getenv("LLM_CACHE", "on").lower() not in ("off", "0", "false", "no")
+
+
+def cache_enabled() -> bool:
+    return _enabled
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """설정된 캐시를 반환합니다. 캐시가 꺼져 있으면 None을 반환합니다."""
+    global _cache
+    if not _enabled:
+        return None
+    if _cache is None:
+        _cache = ResponseCache(
+            path=os.getenv("LLM_CACHE_PATH", DEFAULT_PATH),
+            ttl=float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL)),
+            max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024))
+    return _cache
+
+
+def configure_cache(enabled: bool = True, cache: Optional[ResponseCache] = None):
+    """캐시를 켜거나 끄고, 필요하면 사용할 캐시 인스턴스를 지정합니다."""
+    global _cache, _enabled
+    _enabled = enabled
+    if cache is not None:
+        _cache = cache
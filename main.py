@@ -1,15 +1,42 @@
 import os
-import time
+import asyncio
+import inspect
+import argparse
 import json
-from pydantic import BaseModel, Field
-from typing import List, Dict, Union
+import operator
+from pydantic import BaseModel, Field, SkipValidation
+from functools import partial
+from typing import Annotated, Any, AsyncIterator, Callable, List, Dict, Optional, Sequence, Tuple, Union
 from langchain_anthropic import ChatAnthropic
 from langgraph.graph import StateGraph, END
-import requests
-from bs4 import BeautifulSoup
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from dotenv import load_dotenv
-import tiktoken
 from notion_client import Client
+from batch import BatchJob, load_jobs, rewrite_urls, run_batch
+from reducers import append_messages
+from llm_cache import configure_cache, get_cache
+from mapreduce import (ARTICLE_MODES, amap_reduce_notes, estimate_note_calls, map_reduce_notes,
+                       notes_article_prompt)
+from context_window import CONTEXT_TOKEN_BUDGET, build_context, evicted_turns, update_digest
+from panel import DEBATE_MODES, afan_out, fan_out
+from fake_llm import fake_model_from_env
+from costs import CostTable, call_record
+from metrics import serve_from_env, timed_node
+from tracing import run_trace, traced_node
+from budget import (BudgetExceeded, RunBudget, estimate_tokens_cost, get_governor,
+                    max_output_tokens)
+from dedup import configure_dedup, dedup_mode, get_duplicate_index
+from feeds import auto_topic
+from fetcher import fetch_title
+from ingest import TopicResolver
+from notion_blocks import NotionWriter, PartialPageError
+from notion_outbox import PUBLISHED_STATUSES, get_worker, pending_id, pending_url
+from notion_schema import NotionSchema, get_schema, invalidate_schema, is_schema_error
+from checkpoints import get_checkpointer, new_run_id, run_config, run_personas
+from llm import ModelCall, TokenCallback, acall_model, call_model
+# 예전처럼 main에서 가져다 쓰는 코드를 위해 다시 내보냅니다
+from llm import calculate_cost  # noqa: F401
+from token_counter import count_tokens  # noqa: F401
 
 # .env 파일에서 환경 변수 로드
 load_dotenv()
@@ -31,19 +58,31 @@ else:
 
 
 # 상태 정의
+# messages와 토큰/비용은 리듀서로 누적됩니다. messages는 append-only 로그이며
+# 매 노드마다 길이에 비례하는 재검증을 피하도록 검증을 생략합니다.
 class ConversationState(BaseModel):
     topic: str
-    messages: List[Dict[str, str]] = Field(default_factory=list)
+    messages: Annotated[List[Dict[str, str]], SkipValidation,
+                        append_messages] = Field(default_factory=list)
     summary: str = ""
     content: str = ""
-    input_tokens: int = 0
-    output_tokens: int = 0
-    cost: float = 0.0
+    input_tokens: Annotated[int, operator.add] = 0
+    output_tokens: Annotated[int, operator.add] = 0
+    cost: Annotated[float, operator.add] = 0.0
     title: str = ""
     subtitle: str = ""
     description: str = ""
     slug: str = ""
     notion_url: str = ""  # 새로운 필드 추가
+    personas: List[str] = Field(default_factory=list)  # 실행을 재개할 때 같은 현인을 다시 구성
+    model_name: Optional[str] = None  # None이면 기본 모델 사용
+    article_mode: str = "single"  # "map_reduce"이면 구간별 노트를 거쳐 기사를 작성
+    digest: str = ""  # 최근 창에서 밀려난 턴의 누적 요약
+    turn_input_tokens: Annotated[List[int], operator.add] = Field(default_factory=list)
+    debate_mode: str = "round_robin"  # "panel"이면 라운드마다 모든 현인이 동시에 답변
+    duplicate_of: str = ""  # 비슷한 주제의 지난 기사를 재사용했으면 그 기사의 주제
+    budget_exceeded: str = ""  # 예산 때문에 실행을 멈췄으면 그 이유
+    calls: Annotated[List[Dict[str, Any]], operator.add] = Field(default_factory=list)  # 호출별 비용 기록
 
 # AI 현인 페르소나 정의
 
@@ -53,32 +92,14 @@ class AISage(BaseModel):
     instruction: str
     color: str
 
-# 토큰 계산 함수
-
-
-def count_tokens(text: str) -> int:
-    encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
-
-# 비용 계산 함수
-
-
-def calculate_cost(input_tokens: int, output_tokens: int, model: str) -> float:
-    if model == "claude-3-opus-20240229":
-        input_cost_per_1k = 0.015
-        output_cost_per_1k = 0.075
-    elif model == "claude-3-5-sonnet-20240620":
-        input_cost_per_1k = 0.003
-        output_cost_per_1k = 0.015
-    else:
-        raise ValueError("Unsupported model")
-
-    input_cost = (input_tokens / 1000) * input_cost_per_1k
-    output_cost = (output_tokens / 1000) * output_cost_per_1k
-    return input_cost + output_cost
+# 도구 정의
 
 
-# 도구 정의
+# 주제를 정하지 못했을 때 쓰는 대체 주제. 실행마다 같은 문자열이므로 중복 감지에서 제외합니다
+NO_TITLE_TOPIC = "웹 페이지 제목을 찾을 수 없습니다"
+FETCH_FAILED_TOPIC = "URL에서 주제를 가져오는데 실패했습니다"
+DEFAULT_TOPIC = "최신 AI 기술 동향"
+FALLBACK_TOPICS = (NO_TITLE_TOPIC, FETCH_FAILED_TOPIC, DEFAULT_TOPIC)
 
 
 def get_topic(input: Union[str, None] = None) -> str:
@@ -87,16 +108,14 @@ def get_topic(input: Union[str, None] = None) -> str:
         if input.startswith("http"):
             try:
                 # URL이 주어진 경우, 웹 페이지의 제목을 가져옵니다
-                response = requests.get(input)
-                soup = BeautifulSoup(response.text, 'html.parser')
-                return soup.title.string or "웹 페이지 제목을 찾을 수 없습니다"
-            except:
-                return "URL에서 주제를 가져오는데 실패했습니다"
+                return fetch_title(input) or NO_TITLE_TOPIC
+            except Exception:
+                return FETCH_FAILED_TOPIC
         else:
             return input
     else:
-        # 실제 구현에서는 여기에 뉴스 크롤링 로직을 추가합니다.
-        return "최신 AI 기술 동향"
+        # 설정된 뉴스 피드에서 아직 다루지 않은 최신 주제를 고릅니다
+        return auto_topic() or DEFAULT_TOPIC
 
 
 def generate_summary(conversation: List[Dict[str, str]]) -> str:
@@ -115,9 +134,13 @@ def create_content(summary: str, conversation: List[Dict[str, str]]) -> str:
     return content
 
 
+# 토론을 마치는 메시지 수
+DEBATE_MESSAGES = int(os.getenv("DEBATE_MESSAGES", 5))
+
+
 def evaluate_conversation(state: ConversationState) -> bool:
     """대화의 충분성을 평가합니다."""
-    return len(state.messages) >= 5 or state.cost >= 50.0
+    return len(state.messages) >= DEBATE_MESSAGES or state.cost >= 50.0
 
 
 # LLM 모델 설정
@@ -125,7 +148,18 @@ def evaluate_conversation(state: ConversationState) -> bool:
 # model = ChatAnthropic(model="claude-3-5-sonnet-20240620")
 # LLM 모델 설정
 model_name = "claude-3-5-sonnet-20240620"
-model = ChatAnthropic(model=model_name)
+# FAKE_LLM이 설정되어 있으면 API를 호출하지 않는 가짜 모델을 사용합니다
+model = fake_model_from_env() or ChatAnthropic(model=model_name)
+_models: Dict[str, ChatAnthropic] = {}
+
+
+def get_model(name: Optional[str] = None) -> Tuple[Any, str]:
+    """이름에 해당하는 (모델, 모델 이름)을 반환합니다. 이름이 없으면 기본 모델을 사용합니다."""
+    if not name or name == model_name:
+        return model, model_name
+    if name not in _models:
+        _models[name] = ChatAnthropic(model=name)
+    return _models[name], name
 
 
 # JSON 파일에서 페르소나 로드
@@ -145,82 +179,257 @@ def select_personas(personas: List[AISage]) -> List[AISage]:
     return [personas[int(s.strip()) - 1] for s in selections]
 
 
+# 스트리밍 콜백: (역할, 텍스트 조각)
+StreamCallback = Callable[[str, str], None]
+ARTICLE_ROLE = "기사"
+
+
+def role_stream(on_token: Optional[StreamCallback], role: str) -> Optional[TokenCallback]:
+    """(역할, 텍스트) 콜백을 해당 역할의 텍스트 콜백으로 바꿉니다."""
+    if on_token is None:
+        return None
+    return lambda text: on_token(role, text)
+
+
 # 노드 함수 정의
-# 노드 함수 수정
-def initiate_conversation(state: ConversationState):
+# 각 노드는 프롬프트 생성과 상태 변경분 생성을 분리하여 동기/비동기 버전이 공유합니다.
+# 노드는 전체 상태 대신 변경분만 반환하고, LangGraph 리듀서가 이를 누적합니다.
+def usage_update(node: str, *results: ModelCall, personas: Sequence[str] = ()) -> Dict[str, Any]:
+    """모델 호출들의 토큰/비용 증가분과 노드/페르소나/모델이 붙은 호출별 기록"""
+    return {
+        "input_tokens": sum(result.input_tokens for result in results),
+        "output_tokens": sum(result.output_tokens for result in results),
+        "cost": sum(result.cost for result in results),
+        "calls": [call_record(node, result, persona) for result, persona in
+                  zip(results, [*personas, *[""] * (len(results) - len(personas))])]
+    }
+
+
+def run_budget(state: ConversationState) -> Optional[RunBudget]:
+    """이 실행이 지금까지 쓴 비용을 반영한 예산. 예산 확인이 꺼져 있으면 None."""
+    governor = get_governor()
+    return governor.run(state.cost) if governor is not None else None
+
+
+def initiate_prompt(topic: str) -> str:
+    return f"'{topic}'에 대해 토론을 시작해주세요."
+
+
+def initiated_update(topic: str, result: ModelCall) -> Dict[str, Any]:
+    return {
+        "topic": topic,
+        "messages": [{"role": "assistant", "content": result.content}],
+        **usage_update("initiate", result)
+    }
+
+
+# 지난 기사를 재사용할 때 가져오는 필드
+REUSED_FIELDS = ("title", "subtitle", "description", "slug", "content", "notion_url")
+
+
+def duplicate_update(topic: str) -> Optional[Dict[str, Any]]:
+    """비슷한 주제로 쓴 지난 기사가 있으면 토론 없이 그 기사로 끝내는 변경분을 반환합니다."""
+    index = get_duplicate_index()
+    if index is None or topic in FALLBACK_TOPICS:
+        return None
+    match = index.find_topic(topic)
+    if match is None:
+        return None
+    print(f"⚠ 비슷한 주제의 지난 기사가 있습니다 (유사도 {match['similarity']:.2f}): "
+          f"{match['topic']}")
+    if dedup_mode() != "reuse":
+        return None
+    page_url = reusable_page_url(match["notion_url"])
+    if page_url is None:
+        print("ℹ 지난 기사의 Notion 페이지가 없어 새로 토론합니다.")
+        return None
+    return {"topic": topic, "duplicate_of": match["topic"],
+            **{field: match[field] for field in REUSED_FIELDS}, "notion_url": page_url}
+
+
+def page_reference(notion_url: str) -> str:
+    """색인에 기록할 페이지 URL 또는 아웃박스 대기 표시. 저장 실패/미설정 문구는 기록하지 않습니다."""
+    if notion_url.startswith("https://") or pending_id(notion_url) is not None:
+        return notion_url
+    return ""
+
+
+def reusable_page_url(notion_url: str) -> Optional[str]:
+    """지난 기사의 페이지 URL. 게시 대기 중이면 아웃박스 상태를 확인하고, 페이지가 없으면 None."""
+    if notion_url.startswith("https://"):
+        return notion_url
+    item_id = pending_id(notion_url)
+    worker = get_worker(publish_article) if item_id is not None else None
+    item = worker.outbox.get(item_id) if worker is not None else None
+    if item is None or item["status"] == "failed":
+        return None
+    return item["url"] if item["status"] in PUBLISHED_STATUSES else notion_url
+
+
+def initiate_conversation(state: ConversationState, on_token: Optional[StreamCallback] = None):
     topic = get_topic(state.topic)
-    prompt = f"'{topic}'에 대해 토론을 시작해주세요."
-    input_tokens = count_tokens(prompt)
-    response = model.invoke(prompt)
-    output_tokens = count_tokens(response.content)
-    cost = calculate_cost(input_tokens, output_tokens, model_name)
-    return ConversationState(
-        topic=topic,
-        messages=[{"role": "assistant", "content": response.content}],
-        input_tokens=input_tokens,
-        output_tokens=output_tokens,
-        cost=cost
-    )
+    duplicate = duplicate_update(topic)
+    if duplicate is not None:
+        return duplicate
+    result = call_model(*get_model(state.model_name), initiate_prompt(topic),
+                        role_stream(on_token, "assistant"), budget=run_budget(state))
+    return initiated_update(topic, result)
+
+
+async def ainitiate_conversation(state: ConversationState, on_token: Optional[StreamCallback] = None):
+    topic = await asyncio.to_thread(get_topic, state.topic)
+    duplicate = duplicate_update(topic)
+    if duplicate is not None:
+        return duplicate
+    result = await acall_model(*get_model(state.model_name), initiate_prompt(topic),
+                               role_stream(on_token, "assistant"), budget=run_budget(state))
+    return initiated_update(topic, result)
+
+
+def next_sage(state: ConversationState, sages: List[AISage]) -> AISage:
+    return sages[len(state.messages) % len(sages)]
+
+
+def debate_prompt(sage: AISage, context: str) -> str:
+    return f"{sage.instruction} 아래 토론 맥락을 고려하여 대화를 계속하세요:\n\n{context}"
+
+
+def continue_prompt(state: ConversationState, sage: AISage) -> str:
+    # 최근 턴과 이전 턴 요약을 토큰 예산 안에서 전달하여 턴당 입력 크기를 일정하게 유지합니다
+    return debate_prompt(sage, build_context(state.digest, state.messages))
+
+
+def debate_update(state: ConversationState, sages: List[AISage],
+                  results: List[ModelCall]) -> Dict[str, Any]:
+    """현인 순서대로 답변을 메시지로 만들고, 최근 창에서 밀려난 턴을 digest에 더합니다."""
+    new = [{"role": sage.name, "content": result.content}
+           for sage, result in zip(sages, results)]
+    update = {
+        "messages": new,
+        "turn_input_tokens": [result.input_tokens for result in results],
+        **usage_update("panel" if state.debate_mode == "panel" else "continue", *results,
+                       personas=[sage.name for sage in sages])
+    }
+    evicted = evicted_turns(state.messages, new)
+    if evicted:
+        update["digest"] = update_digest(state.digest, evicted)
+    return update
+
+
+def continued_update(state: ConversationState, sage: AISage, result: ModelCall) -> Dict[str, Any]:
+    return debate_update(state, [sage], [result])
+
+
+def continue_conversation(state: ConversationState, sages: List[AISage],
+                          on_token: Optional[StreamCallback] = None):
+    sage = next_sage(state, sages)
+    result = call_model(*get_model(state.model_name), continue_prompt(state, sage),
+                        role_stream(on_token, sage.name), budget=run_budget(state))
+    update = continued_update(state, sage, result)
+
+    # 스트리밍하지 않은 경우 완성된 새 메시지를 출력합니다
+    if on_token is None:
+        print_chat_message(update["messages"][0], sage.color)
+
+    return update
+
+
+async def acontinue_conversation(state: ConversationState, sages: List[AISage],
+                                 on_token: Optional[StreamCallback] = None):
+    # 비동기 엔진은 여러 토론을 동시에 진행하므로 on_token이 없으면 출력하지 않습니다 (astream으로 관찰)
+    sage = next_sage(state, sages)
+    result = await acall_model(*get_model(state.model_name), continue_prompt(state, sage),
+                               role_stream(on_token, sage.name), budget=run_budget(state))
+    return continued_update(state, sage, result)
+
+
+def panel_round(state: ConversationState, sages: List[AISage],
+                on_token: Optional[StreamCallback] = None):
+    """모든 현인에게 같은 맥락으로 동시에 질문하고 답변을 현인 순서대로 합칩니다."""
+    selected = get_model(state.model_name)
+    context = build_context(state.digest, state.messages)
+    # 라운드의 모든 호출이 같은 실행 예산에서 예약하므로 동시에 보내도 한도를 넘지 않습니다
+    budget = run_budget(state)
+    results = fan_out([partial(call_model, *selected, debate_prompt(sage, context), budget=budget)
+                       for sage in sages])
+    update = debate_update(state, sages, results)
+
+    # 동시에 받은 토큰이 섞이지 않도록 완성된 답변을 현인 순서대로 출력합니다
+    for sage, message in zip(sages, update["messages"]):
+        if on_token is None:
+            print_chat_message(message, sage.color)
+        else:
+            on_token(sage.name, message["content"])
 
+    return update
 
-def continue_conversation(state: ConversationState, sages: List[AISage]):
-    sage = sages[len(state.messages) % len(sages)]
-    last_message = state.messages[-1]["content"]
-    prompt = f"{sage.instruction} 이전 메시지를 고려하여 대화를 계속하세요: {last_message}"
-    input_tokens = count_tokens(prompt)
-    response = model.invoke(prompt)
-    output_tokens = count_tokens(response.content)
-    new_cost = state.cost + \
-        calculate_cost(input_tokens, output_tokens, model_name)
-    new_message = {"role": sage.name, "content": response.content}
-
-    # 새 메시지를 출력합니다
-    print_chat_message(new_message, sage.color)
-
-    return ConversationState(
-        topic=state.topic,
-        messages=state.messages + [new_message],
-        summary=state.summary,
-        content=state.content,
-        input_tokens=state.input_tokens + input_tokens,
-        output_tokens=state.output_tokens + output_tokens,
-        cost=new_cost
-    )
+
+async def apanel_round(state: ConversationState, sages: List[AISage],
+                       on_token: Optional[StreamCallback] = None):
+    selected = get_model(state.model_name)
+    context = build_context(state.digest, state.messages)
+    budget = run_budget(state)
+    results = await afan_out([partial(acall_model, *selected, debate_prompt(sage, context),
+                                      budget=budget)
+                              for sage in sages])
+    update = debate_update(state, sages, results)
+    if on_token is not None:
+        for message in update["messages"]:
+            on_token(message["role"], message["content"])
+    return update
 
 
 # 노드 함수 수정 및 추가
 def summarize_conversation(state: ConversationState):
-    summary = generate_summary(state.messages)
-    return ConversationState(**{**state.dict(), "summary": summary})
+    return {"summary": generate_summary(state.messages)}
 
 
-def generate_final_content(state: ConversationState):
+def article_prompt(state: ConversationState) -> str:
     full_conversation = "\n".join(
         [f"{msg['role']}: {msg['content']}" for msg in state.messages])
-    prompt = f"""다음 대화를 정리하여 뉴욕타임즈 스타일의 기사를 작성해 보세요. 대화 내용은 다음과 같습니다:
+    return f"""다음 대화를 정리하여 뉴욕타임즈 스타일의 기사를 작성해 보세요. 대화 내용은 다음과 같습니다:
 
 {full_conversation}
 
 이 대화를 바탕으로 뉴욕타임즈 스타일의 기사 본문을 작성해주세요."""
 
-    input_tokens = count_tokens(prompt)
-    response = model.invoke(prompt)
-    output_tokens = count_tokens(response.content)
-    new_cost = calculate_cost(input_tokens, output_tokens, model_name)
-
-    return ConversationState(
-        topic=state.topic,
-        messages=state.messages,
-        summary=state.summary,
-        content=response.content.strip(),
-        input_tokens=state.input_tokens + input_tokens,
-        output_tokens=state.output_tokens + output_tokens,
-        cost=state.cost + new_cost
-    )
 
+def generated_update(result: ModelCall, note_calls: List[ModelCall]) -> Dict[str, Any]:
+    # 맵-리듀스 모드의 노트 호출도 토큰/비용에 포함합니다
+    return {"content": result.content.strip(), **usage_update("generate", result, *note_calls)}
 
-def generate_metadata(state: ConversationState):
-    prompt = f"""다음 기사 내용을 바탕으로 제목, 부제목, 설명, 그리고 슬러그를 생성해주세요:
+
+def generate_final_content(state: ConversationState, on_token: Optional[StreamCallback] = None):
+    selected = get_model(state.model_name)
+    budget = run_budget(state)
+    note_calls: List[ModelCall] = []
+    if state.article_mode == "map_reduce":
+        notes, note_calls = map_reduce_notes(
+            partial(call_model, *selected, budget=budget), state.topic, state.messages)
+        prompt = notes_article_prompt(state.topic, notes)
+    else:
+        prompt = article_prompt(state)
+    result = call_model(*selected, prompt, role_stream(on_token, ARTICLE_ROLE), budget=budget)
+    return generated_update(result, note_calls)
+
+
+async def agenerate_final_content(state: ConversationState, on_token: Optional[StreamCallback] = None):
+    selected = get_model(state.model_name)
+    budget = run_budget(state)
+    note_calls: List[ModelCall] = []
+    if state.article_mode == "map_reduce":
+        notes, note_calls = await amap_reduce_notes(
+            partial(acall_model, *selected, budget=budget), state.topic, state.messages)
+        prompt = notes_article_prompt(state.topic, notes)
+    else:
+        prompt = article_prompt(state)
+    result = await acall_model(*selected, prompt, role_stream(on_token, ARTICLE_ROLE),
+                               budget=budget)
+    return generated_update(result, note_calls)
+
+
+def metadata_prompt(state: ConversationState) -> str:
+    return f"""다음 기사 내용을 바탕으로 제목, 부제목, 설명, 그리고 슬러그를 생성해주세요:
 
 {state.content[:500]}...  # 내용이 너무 길 경우 앞부분만 사용
 
@@ -230,170 +439,224 @@ def generate_metadata(state: ConversationState):
 요약: [여기에 요약 입력]
 슬러그: [여기에 슬러그 입력]"""
 
+
+def metadata_update(state: ConversationState, result: ModelCall) -> Dict[str, Any]:
+    # 응답에서 각 항목 추출
+    lines = result.content.strip().split("\n")
+    metadata = {}
+    for line in lines:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            metadata[key.strip().lower()] = value.strip()
+
+    # 기본값 설정
+    default_title = state.topic or "무제"
+    default_subtitle = "AI가 생성한 기사"
+    default_description = state.content[:100] + \
+        "..." if state.content else "내용 없음"
+    default_slug = "-".join(default_title.lower().split()[:5])
+
+    return {
+        "title": metadata.get('제목', default_title),
+        "subtitle": metadata.get('부제목', default_subtitle),
+        "description": metadata.get('요약', default_description),
+        "slug": metadata.get('슬러그', default_slug),
+        **usage_update("generate_metadata", result)
+    }
+
+
+def metadata_fallback_update(state: ConversationState, error: Exception) -> Dict[str, Any]:
+    print(f"메타데이터 생성 중 오류 발생: {str(error)}")
+    return {
+        "title": state.topic or "무제",
+        "subtitle": "AI가 생성한 기사",
+        "description": state.content[:100] +
+        "..." if state.content else "내용 없음",
+        "slug": "-".join((state.topic or "무제").lower().split()[:5])
+    }
+
+
+def generate_metadata(state: ConversationState):
     try:
-        input_tokens = count_tokens(prompt)
-        response = model.invoke(prompt)
-        output_tokens = count_tokens(response.content)
-        new_cost = calculate_cost(input_tokens, output_tokens, model_name)
-
-        # 응답에서 각 항목 추출
-        lines = response.content.strip().split("\n")
-        metadata = {}
-        for line in lines:
-            if ":" in line:
-                key, value = line.split(":", 1)
-                metadata[key.strip().lower()] = value.strip()
-
-        # 기본값 설정
-        default_title = state.topic or "무제"
-        default_subtitle = "AI가 생성한 기사"
-        default_description = state.content[:100] + \
-            "..." if state.content else "내용 없음"
-        default_slug = "-".join(default_title.lower().split()[:5])
-
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens + input_tokens,
-            output_tokens=state.output_tokens + output_tokens,
-            cost=state.cost + new_cost,
-            title=metadata.get('제목', default_title),
-            subtitle=metadata.get('부제목', default_subtitle),
-            description=metadata.get('요약', default_description),
-            slug=metadata.get('슬러그', default_slug)
-        )
+        result = call_model(*get_model(state.model_name), metadata_prompt(state),
+                            budget=run_budget(state))
+        return metadata_update(state, result)
     except Exception as e:
-        print(f"메타데이터 생성 중 오류 발생: {str(e)}")
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens,
-            output_tokens=state.output_tokens,
-            cost=state.cost,
-            title=state.topic or "무제",
-            subtitle="AI가 생성한 기사",
-            description=state.content[:100] +
-            "..." if state.content else "내용 없음",
-            slug="-".join((state.topic or "무제").lower().split()[:5])
-        )
+        return metadata_fallback_update(state, e)
 
 
-def save_to_notion(state: ConversationState):
+async def agenerate_metadata(state: ConversationState):
+    try:
+        result = await acall_model(*get_model(state.model_name), metadata_prompt(state),
+                                   budget=run_budget(state))
+        return metadata_update(state, result)
+    except Exception as e:
+        return metadata_fallback_update(state, e)
+
+
+def notion_page_properties(schema: NotionSchema, state: ConversationState) -> Dict[str, Any]:
+    """캐시된 스키마로 페이지 속성을 만듭니다."""
+    if not schema.title_field:
+        raise ValueError("Title field not found in the database")
+
+    # 제목 필드 설정
+    page_properties = {
+        schema.title_field: {"title": [{"text": {"content": state.title}}]}}
+
+    # 다른 필드들 설정 (데이터베이스에 있는 경우에만)
+    values = {'Subtitle': state.subtitle, 'Description': state.description, 'Slug': state.slug}
+    for field in schema.text_fields:
+        page_properties[field] = {
+            "rich_text": [{"text": {"content": values[field]}}]}
+    return page_properties
+
+
+def create_notion_page(state: ConversationState) -> Dict[str, Any]:
+    # 속성 구조는 데이터베이스마다 한 번만 조회하고, 속성 오류가 나면 새로 조회해 한 번 재시도합니다
+    for attempt in range(2):
+        schema = get_schema(notion, NOTION_DATABASE_ID)
+        try:
+            # 본문은 블록으로 나누어 첫 100개로 페이지를 만들고 나머지를 이어 붙입니다
+            return NotionWriter(notion).create_page(
+                NOTION_DATABASE_ID, notion_page_properties(schema, state), state.content)
+        except Exception as e:
+            if attempt or not is_schema_error(e):
+                raise
+            invalidate_schema(NOTION_DATABASE_ID)
+
+
+def notion_page_url(page: Dict[str, Any]) -> str:
+    return f"https://www.notion.so/{page['id'].replace('-', '')}"
+
+
+# 아웃박스에 기록하는 기사 필드
+ARTICLE_FIELDS = {"topic", "title", "subtitle", "description", "slug", "content"}
+
+
+def publish_article(payload: Dict[str, Any]) -> str:
+    """아웃박스 작업자가 호출합니다. 기사를 게시하고 페이지 URL을 반환합니다."""
+    try:
+        return notion_page_url(create_notion_page(ConversationState(**payload)))
+    except PartialPageError as e:
+        # 만든 페이지의 URL을 알려 아웃박스가 페이지를 다시 만들지 않고 기록하게 합니다
+        e.url = notion_page_url(e.page)
+        raise
+
+
+def publish_to_notion(state: ConversationState):
     """노션에 생성된 콘텐츠를 저장합니다."""
     # Notion이 설정되지 않은 경우
     if not notion or not NOTION_DATABASE_ID:
         print("ℹ Notion 설정이 없어 저장을 건너뜁니다.")
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens,
-            output_tokens=state.output_tokens,
-            cost=state.cost,
-            title=state.title,
-            subtitle=state.subtitle,
-            description=state.description,
-            slug=state.slug,
-            notion_url="Notion 미설정"
-        )
+        return {"notion_url": "Notion 미설정"}
+
+    # 아웃박스에 기록하고 바로 끝냅니다. 게시는 백그라운드 작업자가 재시도하며 처리합니다.
+    worker = get_worker(publish_article)
+    if worker is not None:
+        item_id = worker.submit(state.model_dump(include=ARTICLE_FIELDS))
+        return {"notion_url": pending_url(item_id)}
 
     try:
-        # Notion 데이터베이스의 속성 구조 확인
-        database = notion.databases.retrieve(NOTION_DATABASE_ID)
-        properties = database.get('properties', {})
-
-        # 페이지 속성 준비
-        page_properties = {}
-
-        # 제목 필드 찾기 및 설정
-        title_field = next((k for k, v in properties.items()
-                           if v['type'] == 'title'), None)
-        if not title_field:
-            raise ValueError("Title field not found in the database")
-
-        page_properties[title_field] = {
-            "title": [{"text": {"content": state.title}}]}
-
-        # 다른 필드들 설정
-        for field, value in [('Subtitle', state.subtitle), ('Description', state.description), ('Slug', state.slug)]:
-            if field in properties:
-                page_properties[field] = {
-                    "rich_text": [{"text": {"content": value}}]}
-
-        # 페이지 생성
-        new_page = notion.pages.create(
-            parent={"database_id": NOTION_DATABASE_ID},
-            properties=page_properties,
-            children=[
-                {
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": state.content}}]
-                    }
-                }
-            ]
-        )
-        notion_url = f"https://www.notion.so/{new_page['id'].replace('-', '')}"
-
-        # 상태 업데이트
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens,
-            output_tokens=state.output_tokens,
-            cost=state.cost,
-            title=state.title,
-            subtitle=state.subtitle,
-            description=state.description,
-            slug=state.slug,
-            notion_url=notion_url  # 새로운 필드 추가
-        )
+        new_page = create_notion_page(state)
+        notion_url = notion_page_url(new_page)
+
+        # 상태 변경분
+        return {"notion_url": notion_url}
+    except PartialPageError as e:
+        print(f"⚠ Notion 페이지는 만들었지만 본문 일부가 빠졌습니다: {e}")
+        return {"notion_url": notion_page_url(e.page)}
     except Exception as e:
         print(f"Notion에 저장 중 오류 발생: {str(e)}")
-        # 오류 발생 시에도 상태 반환
-        return ConversationState(
-            topic=state.topic,
-            messages=state.messages,
-            summary=state.summary,
-            content=state.content,
-            input_tokens=state.input_tokens,
-            output_tokens=state.output_tokens,
-            cost=state.cost,
-            title=state.title,
-            subtitle=state.subtitle,
-            description=state.description,
-            slug=state.slug,
-            notion_url="Notion 저장 실패"  # 오류 메시지
-        )
+        # 오류 발생 시에도 변경분 반환
+        return {"notion_url": "Notion 저장 실패"}
+
+
+def save_to_notion(state: ConversationState):
+    """노션에 생성된 콘텐츠를 저장하고, 중복 감지 색인에 기사를 기록합니다."""
+    index = get_duplicate_index()
+    match = index.find_content(state.content) if index is not None else None
+    if match is not None:
+        print(f"⚠ 본문이 지난 기사와 거의 같습니다 (유사도 {match['similarity']:.2f}): "
+              f"{match['title']}")
+    update = publish_to_notion(state)
+    if index is not None:
+        index.add({**state.model_dump(include=ARTICLE_FIELDS),
+                   "notion_url": page_reference(update["notion_url"])})
+    return update
+
+
+async def asave_to_notion(state: ConversationState):
+    return await asyncio.to_thread(save_to_notion, state)
+
+
+# 실행이 끝난 뒤 아웃박스 게시 결과를 기다리는 최대 시간(초)
+PUBLISH_WAIT_SECONDS = 30.0
+
+
+def resolve_notion_url(notion_url: str, timeout: float = PUBLISH_WAIT_SECONDS) -> str:
+    """아웃박스 대기 표시를 게시된 페이지 URL로 바꿉니다. 아직 게시되지 않았으면 상태를 덧붙입니다."""
+    item_id = pending_id(notion_url)
+    worker = get_worker(publish_article) if item_id is not None else None
+    if worker is None:
+        return notion_url
+    item = worker.wait(item_id, timeout)
+    if item and item["status"] == "done":
+        return item["url"]
+    if item and item["status"] == "partial":
+        return f"{item['url']} (본문 일부 누락: {item['last_error']})"
+    if item and item["status"] == "failed":
+        return f"{notion_url} (게시 실패: {item['last_error']})"
+    error = f", 마지막 오류: {item['last_error']}" if item and item["last_error"] else ""
+    return f"{notion_url} (게시 대기 중, 백그라운드에서 재시도합니다{error})"
 
 # 워크플로우 수정
 
 
-def create_workflow(sages: List[AISage]):
+def create_workflow(sages: List[AISage], use_async: bool = False,
+                    on_token: Optional[StreamCallback] = None,
+                    checkpointer: Optional[BaseCheckpointSaver] = None):
+    """대화 워크플로우를 생성합니다.
+
+    use_async=True이면 ainvoke 기반 노드를 사용하고, on_token이 있으면
+    토론 발언과 기사를 토큰 단위로 스트리밍합니다. checkpointer가 있으면
+    노드가 끝날 때마다 상태를 저장하여 같은 실행 ID로 이어서 실행할 수 있습니다.
+    """
     workflow = StateGraph(ConversationState)
-    workflow.add_node("initiate", initiate_conversation)
-    workflow.add_node(
-        "continue", lambda state: continue_conversation(state, sages))
-    workflow.add_node("summarize", summarize_conversation)
-    workflow.add_node("generate", generate_final_content)
-    workflow.add_node("generate_metadata", generate_metadata)
-    workflow.add_node("save_to_notion", save_to_notion)
+    if use_async:
+        nodes = {
+            "initiate": budget_guarded(partial(ainitiate_conversation, on_token=on_token)),
+            "continue": budget_guarded(partial(
+                acontinue_conversation, sages=sages, on_token=on_token)),
+            "panel": budget_guarded(partial(apanel_round, sages=sages, on_token=on_token)),
+            "summarize": summarize_conversation,
+            "generate": budget_guarded(partial(agenerate_final_content, on_token=on_token)),
+            "generate_metadata": agenerate_metadata,
+            "save_to_notion": asave_to_notion,
+        }
+    else:
+        nodes = {
+            "initiate": budget_guarded(partial(initiate_conversation, on_token=on_token)),
+            "continue": budget_guarded(partial(
+                continue_conversation, sages=sages, on_token=on_token)),
+            "panel": budget_guarded(partial(panel_round, sages=sages, on_token=on_token)),
+            "summarize": summarize_conversation,
+            "generate": budget_guarded(partial(generate_final_content, on_token=on_token)),
+            "generate_metadata": generate_metadata,
+            "save_to_notion": save_to_notion,
+        }
+    # 지표/추적이 켜져 있으면 노드마다 실행 시간과 오류를 기록합니다
+    for name, node in nodes.items():
+        workflow.add_node(name, traced_node(name, timed_node(name, node)))
 
     workflow.set_entry_point("initiate")
+    route = partial(should_continue, sages=sages)
 
     workflow.add_conditional_edges(
         "initiate",
-        should_continue,
+        route,
         {
             "continue": "continue",
+            "panel": "panel",
             "summarize": "summarize",
             "generate": "generate",
             "end": END
@@ -402,9 +665,21 @@ def create_workflow(sages: List[AISage]):
 
     workflow.add_conditional_edges(
         "continue",
-        should_continue,
+        route,
         {
             "continue": "continue",
+            "panel": "panel",
+            "summarize": "summarize",
+            "generate": "generate",
+            "end": END
+        }
+    )
+
+    workflow.add_conditional_edges(
+        "panel",
+        route,
+        {
+            "panel": "panel",
             "summarize": "summarize",
             "generate": "generate",
             "end": END
@@ -413,26 +688,106 @@ def create_workflow(sages: List[AISage]):
 
     workflow.add_conditional_edges(
         "summarize",
-        should_continue,
+        route,
         {
             "generate": "generate",
             "end": END
         }
     )
 
-    workflow.add_edge("generate", "generate_metadata")
+    workflow.add_conditional_edges(
+        "generate",
+        after_generate,
+        {
+            "generate_metadata": "generate_metadata",
+            "end": END
+        }
+    )
     workflow.add_edge("generate_metadata", "save_to_notion")
     workflow.add_edge("save_to_notion", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+
+# 비동기 실행 진입점
+
+
+async def arun_workflow(sages: List[AISage], topic: str) -> Dict[str, Any]:
+    """하나의 이벤트 루프에서 여러 기사를 동시에 생성할 수 있는 비동기 실행 함수"""
+    graph = create_workflow(sages, use_async=True)
+    return await graph.ainvoke({"topic": topic})
+
+
+async def astream_workflow(sages: List[AISage], topic: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """노드가 끝날 때마다 (노드 이름, 상태 변경분)을 내보냅니다."""
+    graph = create_workflow(sages, use_async=True)
+    async for chunk in graph.astream({"topic": topic}, stream_mode="updates"):
+        for node, update in chunk.items():
+            yield node, update
 
 
 # 상태 전이 함수
 
 
-def should_continue(state: ConversationState):
-    if not evaluate_conversation(state):
-        return "continue"
+def budget_stop(error: BudgetExceeded) -> Dict[str, Any]:
+    print(f"⚠ {error}")
+    return {"budget_exceeded": str(error)}
+
+
+def budget_guarded(node: Callable) -> Callable:
+    """예산 초과로 호출이 거부되면 실행을 실패시키는 대신 멈춘 이유를 상태에 남깁니다."""
+    if inspect.iscoroutinefunction(node):
+        async def aguarded(state: ConversationState):
+            try:
+                return await node(state)
+            except BudgetExceeded as e:
+                return budget_stop(e)
+        return aguarded
+
+    def guarded(state: ConversationState):
+        try:
+            return node(state)
+        except BudgetExceeded as e:
+            return budget_stop(e)
+    return guarded
+
+
+# 기사 프롬프트에서 대화 외에 더해지는 지시문의 대략적인 토큰 수
+ARTICLE_PROMPT_OVERHEAD = 200
+
+
+def estimate_article_cost(state: ConversationState, model: Any, name: str) -> float:
+    """기사 작성(map_reduce이면 노트 요약 호출 포함)의 비용 상한"""
+    # 지금까지의 발언은 모두 모델 출력이므로 기사 프롬프트 크기는 출력 토큰 합으로 어림합니다
+    conversation_tokens = state.output_tokens
+    note_cost = 0.0
+    if state.article_mode == "map_reduce":
+        note_inputs, conversation_tokens = estimate_note_calls(
+            state.output_tokens, max_output_tokens(model))
+        note_cost = sum(estimate_tokens_cost(model, name, tokens) for tokens in note_inputs)
+    return note_cost + estimate_tokens_cost(model, name,
+                                            conversation_tokens + ARTICLE_PROMPT_OVERHEAD)
+
+
+def debate_affordable(state: ConversationState, sages: Optional[List[AISage]] = None) -> bool:
+    """다음 토론 라운드를 하고도 기사를 쓸 예산이 남는지 호출 전에 추정합니다."""
+    budget = run_budget(state)
+    if budget is None:
+        return True
+    model, name = get_model(state.model_name)
+    turn_tokens = state.turn_input_tokens[-1] if state.turn_input_tokens else CONTEXT_TOKEN_BUDGET
+    speakers = len(sages) if sages and state.debate_mode == "panel" else 1
+    return budget.can_afford(
+        speakers * estimate_tokens_cost(model, name, turn_tokens),
+        estimate_article_cost(state, model, name))
+
+
+def should_continue(state: ConversationState, sages: Optional[List[AISage]] = None):
+    if state.duplicate_of or state.budget_exceeded:
+        return "end"
+    # 다음 라운드를 감당할 수 없으면 토론을 끝내고 남은 예산으로 기사를 씁니다
+    if not evaluate_conversation(state) and debate_affordable(state, sages):
+        return "panel" if state.debate_mode == "panel" else "continue"
     elif not state.summary:
         return "summarize"
     elif not state.content:
@@ -441,6 +796,10 @@ def should_continue(state: ConversationState):
         return "end"
 
 
+def after_generate(state: ConversationState):
+    return "end" if state.budget_exceeded else "generate_metadata"
+
+
 # 채팅 메시지 출력 함수
 
 
@@ -451,12 +810,176 @@ def print_chat_message(message: Dict[str, str], color: str):
     # 메시지 출력
     print(f"\033[{color}m{role}: {content}\033[0m")
     print("-" * 50)  # 구분선
-    time.sleep(1)  # 1초 대기
+
+
+class TerminalStreamer:
+    """스트리밍된 토큰을 받는 즉시 터미널에 출력합니다."""
+
+    def __init__(self, sages: List[AISage]):
+        self.colors = {sage.name: sage.color for sage in sages}
+        self.role: Optional[str] = None
+
+    def __call__(self, role: str, text: str):
+        if role != self.role:
+            self.finish()
+            self.role = role
+            print(f"\033[{self.colors.get(role, '0')}m{role}: ", end="")
+        print(text, end="", flush=True)
+
+    def finish(self):
+        """진행 중인 메시지를 마무리합니다."""
+        if self.role is not None:
+            print("\033[0m")
+            print("-" * 50)  # 구분선
+            self.role = None
+
+
+def print_cache_stats():
+    cache = get_cache()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"LLM 캐시: 적중 {stats['hits']}회, 미스 {stats['misses']}회")
+
+
+# 배치 실행
+
+
+def find_personas(personas: List[AISage], names: List[str]) -> List[AISage]:
+    """이름 순서대로 페르소나를 찾습니다. 없는 이름이 있으면 ValueError를 발생시킵니다."""
+    by_name = {persona.name: persona for persona in personas}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"알 수 없는 페르소나: {', '.join(unknown)}")
+    return [by_name[name] for name in names]
+
+
+async def arun_job(job: BatchJob, personas: List[AISage],
+                  article_mode: str = "single",
+                  debate_mode: str = "round_robin",
+                  topics: Optional[TopicResolver] = None) -> Dict[str, Any]:
+    """배치 작업 하나를 비동기 워크플로우로 실행하고 결과 레코드를 반환합니다."""
+    sages = find_personas(personas, job.personas) or personas[:1]
+
+    graph = create_workflow(sages, use_async=True)
+    with run_trace(job.id):
+        topic = job.url or job.topic or ""
+        if job.url and topics is not None:
+            # 공유 조회기로 제목을 가져오고, 가져오지 못한 URL은 기사를 만들지 않고 실패로 기록합니다
+            resolved = await asyncio.to_thread(topics.resolve, job.url)
+            if not resolved.ok:
+                raise ValueError(f"{job.url}: {resolved.error}")
+            topic = resolved.topic
+        result = await graph.ainvoke({
+            "topic": topic,
+            "model_name": job.model,
+            "article_mode": job.article_mode or article_mode,
+            "debate_mode": job.debate_mode or debate_mode
+        })
+    return {key: result.get(key) for key in (
+        "topic", "title", "slug", "content",
+        "input_tokens", "output_tokens", "cost", "notion_url", "duplicate_of", "budget_exceeded",
+        "calls")}
+
+
+def run_batch_mode(jobs_path: str, output_path: str, concurrency: int,
+                   article_mode: str = "single", debate_mode: str = "round_robin"):
+    personas = load_personas('personas.json')
+    jobs = load_jobs(jobs_path)
+    print(f"배치 작업 {len(jobs)}개 (동시 실행 {concurrency}개) -> {output_path}")
+
+    # 작업마다 실행 추적 안에서 URL 제목을 가져오되, 호스트별 제한과 같은 URL의 결과는 공유합니다
+    topics = TopicResolver()
+    ok, failed = asyncio.run(run_batch(
+        jobs, output_path,
+        lambda job: arun_job(job, personas, article_mode, debate_mode, topics),
+        concurrency))
+    print(f"완료: 성공 {ok}개, 실패 {failed}개")
+    print_cache_stats()
+
+    # 결과의 notion_url은 대기 표시이므로, 게시가 끝나면 결과 파일의 URL을 바꿔 씁니다.
+    # 이전 실행에서 남은 대기 표시도 이때 함께 바꿉니다.
+    worker = get_worker(publish_article) if notion and NOTION_DATABASE_ID else None
+    if worker is not None:
+        remaining = worker.drain(PUBLISH_WAIT_SECONDS)
+        updated = rewrite_urls(output_path, published_url)
+        if updated:
+            print(f"결과 {updated}개의 Notion URL을 기록했습니다.")
+        if remaining:
+            print(f"Notion 게시 대기 {remaining}개는 다음 실행 때 이어서 게시됩니다.")
+
+
+def published_url(notion_url: str) -> Optional[str]:
+    """아웃박스 대기 표시가 게시되었으면 페이지 URL을, 아니면 None을 반환합니다."""
+    item_id = pending_id(notion_url)
+    worker = get_worker(publish_article) if item_id is not None else None
+    item = worker.outbox.get(item_id) if worker is not None else None
+    return item["url"] if item and item["status"] in PUBLISHED_STATUSES else None
+
+
+COST_REPORT_LABELS = {"model": "모델", "persona": "페르소나", "node": "노드"}
+
+
+def print_cost_report(paths: List[str]):
+    table = CostTable.load(paths)
+    print(f"실행 {table.runs}개, 호출 {len(table)}회, 총 비용 ${table.total_cost():.4f}")
+    for column, rows in table.breakdown().items():
+        print(f"\n{COST_REPORT_LABELS[column]}별 비용:")
+        for row in rows:
+            print(f"  {row[column] or '-'}: ${row['cost']:.4f} ({row['calls']}회, "
+                  f"입력 {row['input_tokens']} / 출력 {row['output_tokens']} 토큰)")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AI 현인 콘텐츠 생성기")
+    parser.add_argument("--batch", metavar="JOBS_JSONL",
+                        help="작업 JSONL 파일을 비대화형으로 실행합니다")
+    parser.add_argument("--output", default="results.jsonl",
+                        help="배치 결과 JSONL 파일 (기본값: results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="동시에 생성할 기사 수 (기본값: 4)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="LLM 응답 캐시를 사용하지 않습니다")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="지난 기사와 비슷한 주제인지 확인하지 않습니다")
+    parser.add_argument("--article-mode", choices=ARTICLE_MODES, default="single",
+                        help="기사 생성 방식: 대화 전체를 한 번에(single) 또는 "
+                             "구간별 노트로 요약한 뒤(map_reduce) (기본값: single)")
+    parser.add_argument("--debate-mode", choices=DEBATE_MODES, default="round_robin",
+                        help="토론 방식: 한 명씩 차례로(round_robin) 또는 "
+                             "라운드마다 모든 현인이 동시에(panel) (기본값: round_robin)")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="중단된 실행을 마지막으로 끝난 단계 다음부터 이어서 실행합니다")
+    parser.add_argument("--cost-report", metavar="RESULTS_JSONL", nargs="+",
+                        help="배치 결과 파일들의 비용을 모델/페르소나/노드별로 집계합니다")
+    return parser.parse_args(argv)
+
 
 # 메인 함수 수정
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.cost_report:
+        print_cost_report(args.cost_report)
+        return
+    if args.no_cache:
+        configure_cache(enabled=False)
+    if args.no_dedup:
+        configure_dedup("off")
+    server = serve_from_env()
+    if server is not None:
+        print(f"지표: http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    if notion and NOTION_DATABASE_ID:
+        # 이전 실행에서 게시하지 못한 기사를 백그라운드에서 이어서 게시합니다
+        get_worker(publish_article)
+    if args.batch:
+        run_batch_mode(args.batch, args.output, args.concurrency,
+                       args.article_mode, args.debate_mode)
+        return
+    if args.resume:
+        resume_run(args.resume)
+        return
+
     print("AI 현인 콘텐츠 생성기 테스트")
 
     # JSON 파일에서 페르소나 로드
@@ -477,13 +1000,64 @@ def main():
     else:
         topic = None
 
-    # get_topic 함수를 사용하여 항상 유효한 문자열 주제를 얻습니다
-    final_topic = get_topic(topic)
-    print(f"\n선택된 주제: {final_topic}\n")
+    checkpointer = get_checkpointer()
+    run_id = new_run_id()
+    # 주제 URL/피드 가져오기도 실행 추적에 기록되도록 추적 안에서 주제를 정합니다
+    with run_trace(run_id) as trace:
+        # get_topic 함수를 사용하여 항상 유효한 문자열 주제를 얻습니다
+        final_topic = get_topic(topic)
+        print(f"\n선택된 주제: {final_topic}\n")
+
+        print("대화 시작...")
+        print(f"실행 ID: {run_id} (중단되면 --resume {run_id} 로 이어서 실행할 수 있습니다)\n")
+        streamer = TerminalStreamer(selected_personas)
+        graph = create_workflow(selected_personas, on_token=streamer,
+                                checkpointer=checkpointer)
+        result = graph.invoke({
+            "topic": final_topic,
+            "personas": [persona.name for persona in selected_personas],
+            "article_mode": args.article_mode,
+            "debate_mode": args.debate_mode
+        }, run_config(run_id))
+    streamer.finish()
+    print_result(result)
+    print_trace_path(trace)
+
+
+def resume_run(run_id: str):
+    """체크포인트에 저장된 실행을 이어서 실행합니다. 끝난 단계의 모델 호출은 반복하지 않습니다."""
+    checkpointer = get_checkpointer()
+    names = run_personas(checkpointer, run_id)
+    if names is None:
+        print(f"실행 ID '{run_id}'의 체크포인트를 찾을 수 없습니다.")
+        return
+    sages = find_personas(load_personas('personas.json'), names)
+
+    streamer = TerminalStreamer(sages)
+    graph = create_workflow(sages, on_token=streamer, checkpointer=checkpointer)
+    config = run_config(run_id)
+    snapshot = graph.get_state(config)
+    if snapshot.next:
+        print(f"실행 {run_id}을(를) '{', '.join(snapshot.next)}' 단계부터 이어서 실행합니다.")
+        with run_trace(run_id) as trace:
+            result = graph.invoke(None, config)
+        streamer.finish()
+        print_trace_path(trace)
+    else:
+        print(f"실행 {run_id}은(는) 이미 완료되었습니다.")
+        result = snapshot.values
+    print_result(result)
+
+
+def print_trace_path(trace: Any):
+    if trace is not None and trace.path:
+        print(f"실행 추적: {trace.path} (chrome://tracing 또는 ui.perfetto.dev에서 열 수 있습니다)")
+
 
-    print("대화 시작...")
-    graph = create_workflow(selected_personas)
-    result = graph.invoke({"topic": final_topic})
+def print_result(result: Any):
+    # 컴파일된 그래프는 상태를 dict로 반환합니다
+    if isinstance(result, dict):
+        result = ConversationState(**result)
 
     print("\n생성된 뉴욕타임즈 스타일 기사:")
     if isinstance(result, ConversationState):
@@ -491,12 +1065,20 @@ def main():
         print(f"부제목: {result.subtitle}")
         print(f"설명: {result.description}")
         print(f"슬러그: {result.slug}")
+        if result.budget_exceeded:
+            print(f"⚠ 예산 때문에 실행을 멈췄습니다: {result.budget_exceeded}")
+        if result.duplicate_of:
+            print(f"(비슷한 주제 '{result.duplicate_of}'의 지난 기사를 재사용했습니다)")
         print("\n본문:")
         print(result.content)
         print(f"\n총 입력 토큰: {result.input_tokens}")
         print(f"총 출력 토큰: {result.output_tokens}")
         print(f"총 비용: ${result.cost:.4f}")
-        print(f"\n노션 페이지 URL: {result.notion_url}")
+        if result.turn_input_tokens:
+            print(f"턴별 입력 토큰: {result.turn_input_tokens} "
+                  f"(최대 {max(result.turn_input_tokens)})")
+        print_cache_stats()
+        print(f"\n노션 페이지 URL: {resolve_notion_url(result.notion_url)}")
     else:
         print("예상치 못한 결과 형식입니다.")
         print(result)  # 디버깅을 위해 전체 결과 출력
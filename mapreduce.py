@@ -0,0 +1,151 @@
+"""
+맵-리듀스 기사 생성
+
+긴 토론을 한 번에 프롬프트로 넣는 대신, 토큰 예산 안에 들어가는 턴 묶음을 병렬로
+섹션 노트로 요약(map)하고, 노트가 여전히 예산을 넘으면 노트끼리 다시 묶어 줄입니다(reduce).
+최종 기사는 노트만으로 작성하므로 입력 토큰이 대화 길이에 비례해 늘어나지 않습니다.
+모든 하위 호출의 ModelCall을 함께 반환하여 토큰/비용 집계에 포함할 수 있게 합니다.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from llm import ModelCall
+from token_counter import count_tokens_many
+
+ARTICLE_MODES = ("single", "map_reduce")
+# 섹션 노트 하나가 요약하는 턴 묶음(또는 다시 묶는 노트들)의 최대 토큰 수
+CHUNK_TOKEN_BUDGET = 3000
+MAP_CONCURRENCY = 4
+# 섹션/병합 프롬프트에서 턴이나 노트 외에 더해지는 지시문의 대략적인 토큰 수
+NOTE_PROMPT_OVERHEAD = 100
+
+
+def format_turn(message: Dict[str, str]) -> str:
+    return f"{message['role']}: {message['content']}"
+
+
+def pack(texts: List[str], budget: int) -> List[List[str]]:
+    """순서를 유지하며 합계가 budget 이하가 되도록 묶습니다. 혼자 넘치는 항목은 단독으로 묶입니다."""
+    groups: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for text, tokens in zip(texts, count_tokens_many(texts)):
+        if current and used + tokens > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def section_prompt(topic: str, turns: List[str]) -> str:
+    joined = "\n".join(turns)
+    return f"""다음은 '{topic}'에 대한 토론의 일부입니다:
+
+{joined}
+
+기사 작성에 쓸 수 있도록 이 부분의 핵심 주장, 근거, 인상적인 발언을 발언자 이름과 함께 간결한 노트로 정리해주세요."""
+
+
+def merge_prompt(topic: str, notes: List[str]) -> str:
+    joined = "\n\n".join(notes)
+    return f"""다음은 '{topic}'에 대한 토론을 구간별로 정리한 노트입니다:
+
+{joined}
+
+중복을 없애고 흐름이 이어지도록 하나의 간결한 노트로 합쳐주세요. 발언자 이름은 유지해주세요."""
+
+
+def reduce_rounds(notes: List[str], budget: int) -> List[List[str]]:
+    """다음 reduce 단계에서 합칠 노트 묶음을 반환합니다. 더 줄일 필요가 없으면 빈 리스트입니다."""
+    if len(notes) <= 1 or sum(count_tokens_many(notes)) <= budget:
+        return []
+    groups = pack(notes, budget)
+    # 노트 하나가 예산을 넘어 더 이상 묶을 수 없으면 그대로 사용합니다
+    if len(groups) == len(notes):
+        return []
+    return groups
+
+
+def _split(tokens: int, budget: int) -> List[int]:
+    count = max(1, -(-tokens // budget))
+    return [-(-tokens // count)] * count
+
+
+def estimate_note_calls(conversation_tokens: int, note_tokens: int,
+                        budget: int = CHUNK_TOKEN_BUDGET) -> Tuple[List[int], int]:
+    """대화 토큰 수로 map/reduce 호출마다의 입력 토큰 수와 마지막 노트들의 토큰 수를 어림합니다.
+
+    노트 하나는 최대 note_tokens라고 보고 map_reduce_notes와 같은 규칙으로 reduce 단계를 셉니다.
+    """
+    inputs: List[int] = []
+    groups = _split(conversation_tokens, budget)
+    while True:
+        inputs.extend(size + NOTE_PROMPT_OVERHEAD for size in groups)
+        notes = len(groups) * note_tokens
+        if len(groups) <= 1 or notes <= budget:
+            return inputs, notes
+        merged = _split(notes, budget)
+        # 노트를 더 묶을 수 없으면 그대로 사용합니다
+        if len(merged) >= len(groups):
+            return inputs, notes
+        groups = merged
+
+
+def map_reduce_notes(call: Callable[[str], ModelCall], topic: str,
+                     messages: List[Dict[str, str]],
+                     budget: int = CHUNK_TOKEN_BUDGET,
+                     concurrency: int = MAP_CONCURRENCY) -> Tuple[List[str], List[ModelCall]]:
+    """대화를 섹션 노트로 줄입니다. (노트, 모든 하위 호출 결과)를 반환합니다."""
+    calls: List[ModelCall] = []
+    notes: List[str] = []
+    prompts = [section_prompt(topic, group)
+               for group in pack([format_turn(m) for m in messages], budget)]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        while prompts:
+            # 각 스레드가 호출한 쪽의 contextvars(실행 추적 등)를 이어받습니다
+            contexts = [copy_context() for _ in prompts]
+            results = list(pool.map(lambda context, prompt: context.run(call, prompt),
+                                    contexts, prompts))
+            calls.extend(results)
+            notes = [result.content for result in results]
+            prompts = [merge_prompt(topic, group)
+                       for group in reduce_rounds(notes, budget)]
+    return notes, calls
+
+
+async def amap_reduce_notes(call: Callable[[str], Awaitable[ModelCall]], topic: str,
+                            messages: List[Dict[str, str]],
+                            budget: int = CHUNK_TOKEN_BUDGET,
+                            concurrency: int = MAP_CONCURRENCY) -> Tuple[List[str], List[ModelCall]]:
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def limited(prompt: str) -> ModelCall:
+        async with semaphore:
+            return await call(prompt)
+
+    calls: List[ModelCall] = []
+    notes: List[str] = []
+    prompts = [section_prompt(topic, group)
+               for group in pack([format_turn(m) for m in messages], budget)]
+    while prompts:
+        results = await asyncio.gather(*(limited(prompt) for prompt in prompts))
+        calls.extend(results)
+        notes = [result.content for result in results]
+        prompts = [merge_prompt(topic, group)
+                   for group in reduce_rounds(notes, budget)]
+    return notes, calls
+
+
+def notes_article_prompt(topic: str, notes: List[str]) -> str:
+    joined = "\n\n".join(notes)
+    return f"""다음은 '{topic}'에 대한 토론을 정리한 노트입니다:
+
+{joined}
+
+이 노트를 바탕으로 뉴욕타임즈 스타일의 기사 본문을 작성해주세요."""
@@ -0,0 +1,300 @@
+"""
+실행 지표
+
+워크플로우 노드, 모델 호출, Notion 요청, HTTP 요청의 지연 시간 히스토그램과 토큰/비용/
+캐시 적중/오류 카운터를 프로세스 메모리에 모으고, Prometheus 텍스트 형식(/metrics)과
+JSON 스냅샷(/metrics.json, snapshot())으로 내보냅니다. HTTP 서버는 표준 라이브러리
+ThreadingHTTPServer를 데몬 스레드로 실행합니다. 지표가 꺼져 있으면 기록 함수는 전역
+플래그만 확인하고 돌아가며, 노드는 감싸지 않고 그대로 등록됩니다.
+
+환경 변수:
+    METRICS        "on"/"1"/"true"이면 지표를 모읍니다 (기본값: off, METRICS_PORT가 있으면 on)
+    METRICS_PORT   지정하면 이 포트에서 /metrics와 /metrics.json을 제공합니다
+    METRICS_HOST   서버 주소 (기본값: 127.0.0.1)
+"""
+
+import bisect
+import inspect
+import json
+import os
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 초 단위 지연 시간 구간. 모델 호출과 노드는 수십 초까지 걸립니다
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# 이름: (종류, 설명)
+METRICS = {
+    "sages_node_duration_seconds": ("histogram", "워크플로우 노드 실행 시간"),
+    "sages_node_errors_total": ("counter", "예외로 끝난 노드 실행 수"),
+    "sages_model_call_duration_seconds": ("histogram", "모델 호출 시간 (캐시 적중 제외)"),
+    "sages_model_calls_total": ("counter", "모델 호출 수 (캐시 적중 포함)"),
+    "sages_model_errors_total": ("counter", "실패한 모델 호출 수"),
+    "sages_model_tokens_total": ("counter", "모델 호출 토큰 수"),
+    "sages_model_cost_dollars_total": ("counter", "모델 호출 비용(달러)"),
+    "sages_cache_hits_total": ("counter", "캐시 적중 수"),
+    "sages_cache_misses_total": ("counter", "캐시 미스 수"),
+    "sages_notion_request_duration_seconds": ("histogram", "Notion API 요청 시간"),
+    "sages_notion_errors_total": ("counter", "실패한 Notion API 요청 수"),
+    "sages_http_request_duration_seconds": ("histogram", "외부 HTTP 요청 시간"),
+    "sages_http_errors_total": ("counter", "실패한 외부 HTTP 요청 수"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Prometheus 형식의 (le, 누적 개수) 목록. 마지막은 +Inf입니다."""
+        result, total = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((_number(bound), total))
+        result.append(("+Inf", self.count))
+        return result
+
+
+class Registry:
+    """카운터와 히스토그램을 (이름, 레이블)별로 보관합니다."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, amount: float, labels: Labels):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "histograms": [{"name": name, "labels": dict(labels),
+                                "count": histogram.count, "sum": histogram.sum,
+                                "buckets": dict(histogram.cumulative())}
+                               for (name, labels), histogram in sorted(self.histograms.items())],
+            }
+
+    def render(self) -> str:
+        """Prometheus 텍스트 노출 형식(0.0.4)"""
+        with self._lock:
+            series: Dict[str, List[str]] = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                series.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(value)}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                lines = series.setdefault(name, [])
+                for bound, count in histogram.cumulative():
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        output = []
+        for name in sorted(series):
+            kind, description = METRICS.get(name, ("untyped", ""))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(series[name])
+        return "\n".join(output) + "\n"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _env_enabled() -> bool:
+    value = os.getenv("METRICS")
+    if value is None:
+        return bool(os.getenv("METRICS_PORT"))
+    return value.lower() in ("on", "1", "true", "yes")
+
+
+_enabled = _env_enabled()
+_registry = Registry()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def get_registry() -> Registry:
+    return _registry
+
+
+def configure_metrics(enabled: bool = True, registry: Optional[Registry] = None):
+    """지표 수집을 켜거나 끄고, 필요하면 사용할 저장소를 지정합니다."""
+    global _enabled, _registry
+    _enabled = enabled
+    if registry is not None:
+        _registry = registry
+
+
+def inc(name: str, amount: float = 1, **labels: str):
+    if _enabled and amount:
+        _registry.inc(name, amount, tuple(sorted(labels.items())))
+
+
+def observe(name: str, value: float, **labels: str):
+    if _enabled:
+        _registry.observe(name, value, tuple(sorted(labels.items())))
+
+
+class _Timer:
+    """with 블록의 시간을 히스토그램에 기록하고, 예외가 나면 오류 카운터를 올립니다."""
+
+    __slots__ = ("name", "errors", "labels", "start")
+
+    def __init__(self, name: str, errors: Optional[str], labels: Dict[str, str]):
+        self.name = name
+        self.errors = errors
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None and self.errors:
+            inc(self.errors, **self.labels)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def timer(name: str, errors: Optional[str] = None, **labels: str):
+    """지표가 꺼져 있으면 아무것도 하지 않는 공유 객체를 반환합니다."""
+    return _Timer(name, errors, labels) if _enabled else _NOOP
+
+
+def record_call(model: str, result: Any):
+    """모델 호출 결과(ModelCall)의 호출 수/토큰/비용을 기록합니다."""
+    if not _enabled:
+        return
+    inc("sages_model_calls_total", model=model, cached=str(result.cached).lower())
+    for kind, tokens in (("input", result.input_tokens), ("output", result.output_tokens),
+                         ("cache_read", result.cache_read_tokens),
+                         ("cache_write", result.cache_write_tokens)):
+        inc("sages_model_tokens_total", tokens, model=model, kind=kind)
+    inc("sages_model_cost_dollars_total", result.cost, model=model)
+
+
+def timed_node(name: str, node: Callable) -> Callable:
+    """노드 실행 시간과 오류를 기록하도록 감쌉니다. 지표가 꺼져 있으면 노드를 그대로 반환합니다."""
+    if not _enabled:
+        return node
+    if inspect.iscoroutinefunction(node):
+        @wraps(node)
+        async def atimed(state):
+            with timer("sages_node_duration_seconds", "sages_node_errors_total", node=name):
+                return await node(state)
+        return atimed
+
+    @wraps(node)
+    def timed(state):
+        with timer("sages_node_duration_seconds", "sages_node_errors_total", node=name):
+            return node(state)
+    return timed
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = _registry.render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body = json.dumps(_registry.snapshot(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 스크레이프 요청마다 콘솔에 출력하지 않습니다
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = Lock()
+
+
+def start_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """지표 HTTP 서버를 한 번만 시작합니다. port가 0이면 빈 포트를 사용합니다."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            _server.daemon_threads = True
+            Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+
+def stop_server():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+
+
+def serve_from_env() -> Optional[ThreadingHTTPServer]:
+    """METRICS_PORT가 있으면 서버를 시작합니다."""
+    port = os.getenv("METRICS_PORT")
+    if not port or not _enabled:
+        return None
+    return start_server(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
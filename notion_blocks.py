@@ -0,0 +1,189 @@
+"""
+Notion 블록 작성기
+
+기사 본문을 문단/제목 블록으로 나누어 Notion API 제한(텍스트 하나당 2000자, 요청 하나당
+자식 블록 100개)을 지키며 저장합니다. 첫 100개 블록으로 페이지를 만들고 나머지는
+blocks.children.append로 이어 붙입니다. 모든 요청은 클라이언트 쪽 토큰 버킷으로 속도를
+제한하고, 429(rate_limited) 응답은 Retry-After 또는 지수 백오프 후 재시도합니다.
+
+환경 변수:
+    NOTION_RATE_LIMIT   초당 평균 요청 수 (기본값: 3, Notion 권장 한도)
+"""
+
+import os
+import re
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+import tracing
+from cassette import wrap_notion
+
+MAX_TEXT_CHARS = 2000
+MAX_RICH_TEXT_ITEMS = 100
+MAX_CHILDREN = 100
+DEFAULT_RATE = 3.0
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+HEADING_PATTERN = re.compile(r"^(#{1,3})\s+(.*)$")
+# 문장 끝(마침표/물음표/느낌표 뒤 공백)
+SENTENCE_END = re.compile(r"(?<=[.!?。])\s")
+
+
+class TokenBucket:
+    """rate개/초로 토큰이 차는 버킷. acquire는 토큰이 생길 때까지 기다립니다."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            # 기다린 뒤 쓸 토큰을 미리 차감하여 다음 호출자가 그 이후를 기다리게 합니다
+            self._tokens -= 1
+        if wait > 0:
+            self._sleep(wait)
+
+
+def split_text(text: str, limit: int = MAX_TEXT_CHARS) -> List[str]:
+    """limit자 이하 조각으로 나눕니다. 줄바꿈, 문장 끝, 공백 순으로 자연스러운 경계를 찾습니다."""
+    pieces = []
+    while len(text) > limit:
+        window = text[:limit]
+        cut = window.rfind("\n")
+        if cut <= 0:
+            ends = [m.end() for m in SENTENCE_END.finditer(window)]
+            cut = ends[-1] if ends else window.rfind(" ")
+        if cut <= 0:
+            cut = limit
+        pieces.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def rich_text(text: str) -> List[Dict[str, Any]]:
+    return [{"type": "text", "text": {"content": piece}} for piece in split_text(text)]
+
+
+def content_blocks(content: str) -> List[Dict[str, Any]]:
+    """본문을 빈 줄 단위 문단과 마크다운 제목(#, ##, ###) 블록으로 나눕니다."""
+    blocks = []
+    for paragraph in re.split(r"\n\s*\n", content.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        heading = HEADING_PATTERN.match(paragraph)
+        if heading and "\n" not in paragraph:
+            block_type = f"heading_{len(heading.group(1))}"
+            text = heading.group(2).strip()
+        else:
+            block_type, text = "paragraph", paragraph
+        items = rich_text(text)
+        # rich_text 배열도 항목 수 제한이 있으므로 넘치면 같은 종류의 블록을 이어서 만듭니다
+        for start in range(0, len(items), MAX_RICH_TEXT_ITEMS):
+            blocks.append({
+                "object": "block",
+                "type": block_type,
+                block_type: {"rich_text": items[start:start + MAX_RICH_TEXT_ITEMS]}
+            })
+    return blocks
+
+
+class PartialPageError(Exception):
+    """페이지는 만들었지만 나머지 본문을 이어 붙이지 못했습니다. 만든 페이지는 page에 있습니다.
+
+    호출한 쪽이 페이지 URL을 알면 url에 채워 아웃박스가 그 페이지를 기록하게 합니다.
+    """
+
+    def __init__(self, page: Dict[str, Any], error: Exception):
+        super().__init__(f"페이지 {page.get('id')}에 본문을 이어 붙이지 못했습니다: {error}")
+        self.page = page
+        self.url: Optional[str] = page.get("url")
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status", None) == 429 or \
+        getattr(error, "code", None) == "rate_limited"
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class NotionWriter:
+    """속도 제한과 429 재시도를 적용해 긴 본문을 여러 요청으로 나누어 저장합니다."""
+
+    def __init__(self, client: Any, limiter: Optional[TokenBucket] = None,
+                 max_retries: int = MAX_RETRIES,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.client = wrap_notion(client)
+        self.limiter = limiter if limiter is not None else default_limiter()
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.requests = 0
+
+    def request(self, method: Callable[..., Any], operation: str = "request", **kwargs) -> Any:
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            self.requests += 1
+            try:
+                with tracing.span(operation, "notion", attempt=attempt), \
+                        metrics.timer("sages_notion_request_duration_seconds",
+                                      "sages_notion_errors_total", operation=operation):
+                    return method(**kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limited(e):
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+                with tracing.span("retry wait", "notion", operation=operation, delay=delay):
+                    self.sleep(delay)
+
+    def create_page(self, database_id: str, properties: Dict[str, Any],
+                    content: str) -> Dict[str, Any]:
+        blocks = content_blocks(content)
+        page = self.request(self.client.pages.create, "pages.create",
+                            parent={"database_id": database_id},
+                            properties=properties,
+                            children=blocks[:MAX_CHILDREN])
+        # 이어 붙이기 실패는 페이지를 다시 만들어도 해결되지 않으므로 구분해서 알립니다
+        try:
+            for start in range(MAX_CHILDREN, len(blocks), MAX_CHILDREN):
+                self.request(self.client.blocks.children.append, "blocks.children.append",
+                             block_id=page["id"],
+                             children=blocks[start:start + MAX_CHILDREN])
+        except Exception as e:
+            raise PartialPageError(page, e) from e
+        return page
+
+
+_limiter: Optional[TokenBucket] = None
+
+
+def default_limiter() -> TokenBucket:
+    """프로세스의 모든 Notion 요청이 공유하는 속도 제한기"""
+    global _limiter
+    if _limiter is None:
+        _limiter = TokenBucket(rate=float(os.getenv("NOTION_RATE_LIMIT", DEFAULT_RATE)))
+    return _limiter
@@ -0,0 +1,342 @@
+"""
+Notion 게시 아웃박스
+
+워크플로우의 마지막 노드는 Notion에 직접 쓰는 대신 게시할 기사를 로컬 SQLite
+아웃박스에 기록하고 곧바로 끝나며, 상태에는 "notion-outbox:<id>" 형태의 대기 표시를
+남깁니다. 백그라운드 작업자가 아웃박스를 비우면서 실패한 게시는 지수 백오프로 다시
+시도하고, 성공하면 페이지 URL을 기록합니다. 페이지는 만들었지만 본문 일부를 붙이지 못한
+항목은 다시 만들지 않고 그 페이지 URL과 오류를 partial 상태로 기록합니다. 다시 시도해도
+성공할 수 없는 오류(429/409가 아닌 4xx, 잘못된 기사)나 MAX_ATTEMPTS번 실패한 항목은
+failed 상태로 옮깁니다. 게시하는 동안에는 다른 작업자가 같은 항목을 가져가지 않도록 임대 시간을
+주기적으로 연장합니다. 아웃박스는 파일에 남아 있으므로 프로세스가
+재시작되어도 게시되지 않은 기사는 다음 실행에서 이어서 게시됩니다.
+
+환경 변수:
+    NOTION_OUTBOX        "off"/"0"/"false"이면 아웃박스 없이 바로 게시합니다
+    NOTION_OUTBOX_PATH   아웃박스 파일 경로 (기본값: .cache/notion_outbox.sqlite3)
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import tracing
+from notion_blocks import PartialPageError
+
+DEFAULT_PATH = os.path.join(".cache", "notion_outbox.sqlite3")
+PENDING_PREFIX = "notion-outbox:"
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 3600.0
+# 이만큼 실패하면 더 이상 시도하지 않습니다 (마지막 대기는 약 17분)
+MAX_ATTEMPTS = 10
+# 게시 중인 항목을 다른 작업자가 가져가지 않도록 잡아두는 시간(초). 게시하는 동안
+# 이 시간의 1/3마다 연장하며, 게시 도중 프로세스가 죽으면 이 시간이 지난 뒤 다시 시도됩니다.
+LEASE_SECONDS = 300.0
+POLL_INTERVAL = 1.0
+# process_due 한 번에 처리하는 최대 항목 수
+CLAIM_LIMIT = 10
+# 페이지 URL이 있는 상태. partial은 본문 일부가 빠진 페이지입니다
+PUBLISHED_STATUSES = ("done", "partial")
+
+Publisher = Callable[[Dict[str, Any]], str]
+
+
+def pending_url(item_id: int) -> str:
+    return f"{PENDING_PREFIX}{item_id}"
+
+
+def pending_id(value: str) -> Optional[int]:
+    """대기 표시에서 아웃박스 id를 꺼냅니다. 대기 표시가 아니면 None."""
+    if value and value.startswith(PENDING_PREFIX):
+        try:
+            return int(value[len(PENDING_PREFIX):])
+        except ValueError:
+            return None
+    return None
+
+
+def backoff_delay(attempts: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, attempts - 1))
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """다시 시도해도 성공하지 않을 오류인지 확인합니다.
+
+    일부만 게시된 페이지는 다시 시도하면 페이지가 하나 더 생기므로 다시 시도하지 않습니다.
+    """
+    if isinstance(error, (PartialPageError, ValueError)):
+        return True
+    status = getattr(error, "status", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (409, 429)
+
+
+class Outbox:
+    """SQLite 기반 게시 대기열"""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                url TEXT,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at)")
+
+    def enqueue(self, payload: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (payload, next_attempt_at, created_at) VALUES (?, ?, ?)",
+                (json.dumps(payload, ensure_ascii=False), now, now))
+            return cursor.lastrowid
+
+    def claim(self, limit: int = 10) -> List[Tuple[int, Dict[str, Any], int]]:
+        """게시할 차례가 된 항목을 잡아두고 (id, payload, 시도 횟수)를 반환합니다."""
+        now = time.time()
+        with self._lock:
+            # 여러 프로세스가 같은 파일을 공유해도 한 항목을 한 번만 가져가도록 쓰기 잠금을 잡습니다
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, payload, attempts FROM outbox "
+                    "WHERE status = 'pending' AND next_attempt_at <= ? "
+                    "ORDER BY id LIMIT ?", (now, limit)).fetchall()
+                for item_id, _, _ in rows:
+                    self._conn.execute(
+                        "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ? "
+                        "WHERE id = ?", (now + LEASE_SECONDS, item_id))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(item_id, json.loads(payload), attempts + 1)
+                for item_id, payload, attempts in rows]
+
+    def mark_done(self, item_id: int, url: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'done', url = ?, last_error = NULL WHERE id = ?",
+                (url, item_id))
+
+    def mark_partial(self, item_id: int, url: str, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'partial', url = ?, last_error = ? WHERE id = ?",
+                (url, error, item_id))
+
+    def mark_retry(self, item_id: int, error: str, delay: float):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, item_id))
+
+    def mark_failed(self, item_id: int, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'failed', last_error = ? WHERE id = ?",
+                (error, item_id))
+
+    def renew(self, item_id: int):
+        """게시 중인 항목의 임대 시간을 연장합니다."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ? AND status = 'pending'",
+                (time.time() + LEASE_SECONDS, item_id))
+
+    def get(self, item_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, url, last_error FROM outbox WHERE id = ?",
+                (item_id,)).fetchone()
+        if row is None:
+            return None
+        return {"id": item_id, "status": row[0], "attempts": row[1],
+                "url": row[2], "last_error": row[3]}
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class OutboxWorker:
+    """아웃박스를 비우는 백그라운드 스레드"""
+
+    def __init__(self, outbox: Outbox, publish: Publisher,
+                 poll_interval: float = POLL_INTERVAL):
+        self.outbox = outbox
+        self.publish = publish
+        self.poll_interval = poll_interval
+        self._wake = Event()
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+        # 항목을 넣은 실행의 추적. 게시 구간을 그 추적에 기록합니다
+        self._traces: Dict[int, tracing.Trace] = {}
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self._run, name="notion-outbox", daemon=True)
+            self._thread.start()
+
+    def submit(self, payload: Dict[str, Any]) -> int:
+        """항목을 넣고 작업자를 깨웁니다. 게시 구간은 지금 실행의 추적에 기록됩니다."""
+        item_id = self.outbox.enqueue(payload)
+        trace = tracing.current()
+        if trace is not None:
+            self._traces[item_id] = trace
+        self.notify()
+        return item_id
+
+    def notify(self):
+        """새 항목이 들어왔음을 알려 다음 폴링을 기다리지 않게 합니다."""
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def process_due(self, limit: int = CLAIM_LIMIT) -> int:
+        """지금 게시할 수 있는 항목을 처리하고, 처리한 항목 수를 반환합니다.
+
+        항목은 하나씩 가져오므로, 앞 항목을 게시하는 동안 뒤 항목의 임대 시간이 지나지 않습니다.
+        """
+        processed = 0
+        while processed < limit:
+            items = self.outbox.claim(limit=1)
+            if not items:
+                break
+            item_id, payload, attempts = items[0]
+            processed += 1
+            try:
+                with self._leased(item_id), \
+                        tracing.continue_trace(self._traces.get(item_id)), \
+                        tracing.span("publish", "notion", item_id=item_id, attempt=attempts):
+                    url = self.publish(payload)
+            except PartialPageError as e:
+                self._traces.pop(item_id, None)
+                if e.url:
+                    print(f"Notion 페이지는 만들었지만 본문 일부를 붙이지 못했습니다 "
+                          f"(#{item_id}): {e}")
+                    self.outbox.mark_partial(item_id, e.url, str(e))
+                else:
+                    print(f"Notion 게시 실패 (#{item_id}), 더 이상 시도하지 않습니다: {e}")
+                    self.outbox.mark_failed(item_id, str(e))
+            except Exception as e:
+                if attempts >= MAX_ATTEMPTS or is_permanent_error(e):
+                    print(f"Notion 게시 실패 (#{item_id}, {attempts}회째), "
+                          f"더 이상 시도하지 않습니다: {e}")
+                    self.outbox.mark_failed(item_id, str(e))
+                    self._traces.pop(item_id, None)
+                    continue
+                delay = backoff_delay(attempts)
+                print(f"Notion 게시 실패 (#{item_id}, {attempts}회째), "
+                      f"{delay:.0f}초 후 다시 시도합니다: {e}")
+                self.outbox.mark_retry(item_id, str(e), delay)
+            else:
+                self.outbox.mark_done(item_id, url)
+                self._traces.pop(item_id, None)
+        return processed
+
+    @contextmanager
+    def _leased(self, item_id: int) -> Iterator[None]:
+        """with 블록 동안 항목의 임대 시간을 주기적으로 연장합니다."""
+        done = Event()
+
+        def renew():
+            while not done.wait(LEASE_SECONDS / 3):
+                self.outbox.renew(item_id)
+
+        thread = Thread(target=renew, name=f"notion-outbox-lease-{item_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def wait(self, item_id: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """항목이 게시(또는 포기)되거나 timeout이 지날 때까지 기다린 뒤 상태를 반환합니다."""
+        deadline = time.monotonic() + timeout
+        self.notify()
+        while True:
+            item = self.outbox.get(item_id)
+            if item is None or item["status"] != "pending" or time.monotonic() >= deadline:
+                return item
+            time.sleep(min(0.1, max(0.0, deadline - time.monotonic())))
+
+    def drain(self, timeout: float) -> int:
+        """대기 중인 항목이 없어지거나 timeout이 지날 때까지 기다리고, 남은 항목 수를 반환합니다."""
+        deadline = time.monotonic() + timeout
+        self.notify()
+        while True:
+            remaining = self.outbox.pending_count()
+            if not remaining or time.monotonic() >= deadline:
+                return remaining
+            time.sleep(min(0.1, max(0.0, deadline - time.monotonic())))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                processed = self.process_due()
+            except Exception as e:
+                print(f"Notion 아웃박스 처리 중 오류 발생: {e}")
+                processed = 0
+            if not processed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+_enabled = os.getenv("NOTION_OUTBOX", "on").lower() not in ("off", "0", "false", "no")
+_outbox: Optional[Outbox] = None
+_worker: Optional[OutboxWorker] = None
+_init_lock = Lock()
+
+
+def outbox_enabled() -> bool:
+    return _enabled
+
+
+def get_worker(publish: Publisher) -> Optional[OutboxWorker]:
+    """아웃박스 작업자를 (처음 한 번) 시작하여 반환합니다. 아웃박스가 꺼져 있으면 None."""
+    global _outbox, _worker
+    if not _enabled:
+        return None
+    with _init_lock:
+        if _worker is None:
+            if _outbox is None:
+                _outbox = Outbox(os.getenv("NOTION_OUTBOX_PATH", DEFAULT_PATH))
+            _worker = OutboxWorker(_outbox, publish)
+            # 이전 실행에서 남은 항목도 이 작업자가 이어서 게시합니다
+            _worker.start()
+    return _worker
+
+
+def configure_outbox(enabled: bool = True, outbox: Optional[Outbox] = None):
+    """아웃박스를 켜거나 끄고, 필요하면 사용할 아웃박스를 지정합니다."""
+    global _enabled, _outbox, _worker
+    _enabled = enabled
+    if outbox is not None:
+        _outbox = outbox
+        _worker = None
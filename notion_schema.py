@@ -0,0 +1,95 @@
+"""
+Notion 데이터베이스 스키마 캐시
+
+페이지를 만들 때마다 데이터베이스를 조회하는 대신, 데이터베이스 id별로 제목 속성과
+선택 텍스트 속성(Subtitle/Description/Slug)의 존재 여부를 한 번 계산해 TTL 동안
+재사용합니다. 페이지 생성이 속성 검증 오류로 실패하면 해당 id의 스키마를 무효화합니다.
+
+환경 변수:
+    NOTION_SCHEMA_TTL   스키마 유효 시간(초, 기본값: 3600)
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from notion_client.errors import APIErrorCode, APIResponseError
+
+import metrics
+import tracing
+from cassette import wrap_notion
+
+DEFAULT_TTL = 3600
+# 데이터베이스에 있으면 채우는 텍스트 속성
+TEXT_FIELDS = ("Subtitle", "Description", "Slug")
+
+
+@dataclass(frozen=True)
+class NotionSchema:
+    title_field: Optional[str]
+    text_fields: Tuple[str, ...]
+
+
+def schema_from_database(database: Dict[str, Any]) -> NotionSchema:
+    properties = database.get('properties', {})
+    title_field = next((k for k, v in properties.items()
+                        if v['type'] == 'title'), None)
+    return NotionSchema(
+        title_field=title_field,
+        text_fields=tuple(field for field in TEXT_FIELDS if field in properties))
+
+
+class SchemaCache:
+    """데이터베이스 id별 스키마를 TTL 동안 보관합니다."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._schemas: Dict[str, Tuple[float, NotionSchema]] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, client: Any, database_id: str) -> NotionSchema:
+        # 조회 중에도 잠금을 유지하여 동시에 저장하는 작업들이 한 번만 조회하게 합니다
+        with self._lock:
+            cached = self._schemas.get(database_id)
+            if cached is not None and time.monotonic() - cached[0] <= self.ttl:
+                self.hits += 1
+                metrics.inc("sages_cache_hits_total", cache="notion_schema")
+                return cached[1]
+            self.misses += 1
+            metrics.inc("sages_cache_misses_total", cache="notion_schema")
+            with tracing.span("databases.retrieve", "notion"), \
+                    metrics.timer("sages_notion_request_duration_seconds",
+                                  "sages_notion_errors_total", operation="databases.retrieve"):
+                database = wrap_notion(client).databases.retrieve(database_id)
+            schema = schema_from_database(database)
+            self._schemas[database_id] = (time.monotonic(), schema)
+            return schema
+
+    def invalidate(self, database_id: Optional[str] = None):
+        """해당 id의 스키마를 지웁니다. id가 없으면 모두 지웁니다."""
+        with self._lock:
+            if database_id is None:
+                self._schemas.clear()
+            else:
+                self._schemas.pop(database_id, None)
+
+
+_cache = SchemaCache(ttl=float(os.getenv("NOTION_SCHEMA_TTL", DEFAULT_TTL)))
+
+
+def get_schema(client: Any, database_id: str) -> NotionSchema:
+    return _cache.get(client, database_id)
+
+
+def invalidate_schema(database_id: Optional[str] = None):
+    _cache.invalidate(database_id)
+
+
+def is_schema_error(error: Exception) -> bool:
+    """속성 이름/형식이 데이터베이스와 맞지 않아 생긴 오류인지 확인합니다."""
+    return (APIResponseError.is_api_response_error(error)
+            and error.code == APIErrorCode.ValidationError)
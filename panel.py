@@ -0,0 +1,30 @@
+"""
+패널 토론
+
+라운드마다 현인이 한 명씩 차례로 말하는 대신(round_robin), 선택된 모든 현인에게 같은
+맥락으로 동시에 질문하고 답변을 현인 순서대로 합칩니다(panel). 한 라운드의 소요 시간이
+현인 수만큼의 모델 지연 대신 가장 느린 호출 하나에 가까워집니다.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Awaitable, Callable, List, TypeVar
+
+DEBATE_MODES = ("round_robin", "panel")
+
+T = TypeVar("T")
+
+
+def fan_out(calls: List[Callable[[], T]]) -> List[T]:
+    """호출들을 스레드로 동시에 실행하고 결과를 입력 순서대로 반환합니다."""
+    if len(calls) <= 1:
+        return [call() for call in calls]
+    # 각 스레드가 호출한 쪽의 contextvars(실행 추적 등)를 이어받도록 복사본에서 실행합니다
+    contexts = [copy_context() for _ in calls]
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(lambda context, call: context.run(call), contexts, calls))
+
+
+async def afan_out(calls: List[Callable[[], Awaitable[T]]]) -> List[T]:
+    return list(await asyncio.gather(*(call() for call in calls)))
@@ -0,0 +1,105 @@
+"""
+모델 가격표
+
+모델별 입력/출력/캐시 읽기/캐시 쓰기 단가(100만 토큰당 달러)를 JSON 파일에서 읽습니다.
+모델 이름과 정확히 같은 항목이 없으면 가장 긴 접두사 항목을 사용하므로(예:
+"claude-3-5-sonnet"이 "claude-3-5-sonnet-20241022"와 "claude-3-5-sonnet-latest"를
+포함) 같은 계열의 새 스냅샷은 가격표를 고치지 않아도 됩니다. 새 모델 계열은 코드 대신
+가격표에 항목을 추가합니다.
+
+환경 변수:
+    PRICING_PATH   가격표 파일 경로 (기본값: 이 모듈 옆의 pricing.json)
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Optional
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pricing.json")
+PER_TOKENS = 1_000_000
+# 가격표에 캐시 단가가 없으면 입력 단가에 곱하는 배수
+CACHE_READ_RATIO = 0.1
+CACHE_WRITE_RATIO = 1.25
+
+
+class UnknownModelError(ValueError):
+    """가격표에 없는 모델입니다."""
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    input: float
+    output: float
+    cache_read: float
+    cache_write: float
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ModelPrice":
+        rate = float(data["input"])
+        return cls(input=rate, output=float(data["output"]),
+                   cache_read=float(data.get("cache_read", rate * CACHE_READ_RATIO)),
+                   cache_write=float(data.get("cache_write", rate * CACHE_WRITE_RATIO)))
+
+    def cost(self, input_tokens: int, output_tokens: int,
+             cache_read_tokens: int = 0, cache_write_tokens: int = 0) -> float:
+        """input_tokens는 캐시를 거치지 않은 입력 토큰 수입니다."""
+        return (input_tokens * self.input + output_tokens * self.output
+                + cache_read_tokens * self.cache_read
+                + cache_write_tokens * self.cache_write) / PER_TOKENS
+
+
+class PricingRegistry:
+    """모델 이름으로 단가를 찾습니다."""
+
+    def __init__(self, prices: Dict[str, ModelPrice], source: str = ""):
+        self.prices = dict(prices)
+        self.source = source
+        self._resolved: Dict[str, ModelPrice] = {}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> "PricingRegistry":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls({name: ModelPrice.from_dict(price)
+                    for name, price in data["models"].items()}, source=path)
+
+    def price(self, model: str) -> ModelPrice:
+        resolved = self._resolved.get(model)
+        if resolved is not None:
+            return resolved
+        matches = [name for name in self.prices
+                   if model == name or model.startswith(name + "-")]
+        if not matches:
+            raise UnknownModelError(
+                f"가격표({self.source or '메모리'})에 없는 모델입니다: {model}")
+        resolved = self.prices[max(matches, key=len)]
+        self._resolved[model] = resolved
+        return resolved
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int,
+             cache_read_tokens: int = 0, cache_write_tokens: int = 0) -> float:
+        return self.price(model).cost(input_tokens, output_tokens,
+                                      cache_read_tokens, cache_write_tokens)
+
+
+_registry: Optional[PricingRegistry] = None
+_lock = Lock()
+
+
+def get_registry() -> PricingRegistry:
+    """설정된 가격표. 처음 사용할 때 PRICING_PATH(또는 기본 파일)에서 읽습니다."""
+    global _registry
+    with _lock:
+        if _registry is None:
+            _registry = PricingRegistry.load(os.getenv("PRICING_PATH") or DEFAULT_PATH)
+        return _registry
+
+
+def configure_pricing(registry: Optional[PricingRegistry] = None, path: Optional[str] = None):
+    """사용할 가격표를 지정하거나 path에서 다시 읽습니다."""
+    global _registry
+    with _lock:
+        _registry = registry if registry is not None else (
+            PricingRegistry.load(path) if path else None)
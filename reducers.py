@@ -0,0 +1,98 @@
+"""
+LangGraph 상태 리듀서
+
+노드는 전체 상태를 다시 만들지 않고 변경분(새 메시지, 토큰 증가분)만 반환하며,
+LangGraph가 아래 리듀서로 이를 누적합니다. 메시지는 불변(persistent) append-only
+로그에 연결되므로 한 턴을 추가하는 비용이 대화 길이와 무관합니다.
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+class MessageLog(Sequence):
+    """이전 로그를 공유하며 새 메시지 묶음만 덧붙이는 불변 시퀀스
+
+    LangGraph는 채널 값을 얕게 복사해 여러 곳에서 리듀서를 적용하므로,
+    제자리 수정 대신 새 노드를 만드는 방식으로 O(1) 추가를 구현합니다.
+    len()과 끝에서부터의 인덱싱/슬라이싱(log[-1], log[-k:])은 필요한 묶음만
+    거슬러 올라가고, 전체 순회가 필요할 때만 한 번 펼쳐서 캐시합니다.
+    """
+
+    __slots__ = ("_parent", "_items", "_len", "_flat")
+
+    def __init__(self, items: Sequence[Dict[str, str]] = (),
+                 parent: Optional["MessageLog"] = None):
+        self._parent = parent
+        self._items: Tuple[Dict[str, str], ...] = tuple(items)
+        self._len = (len(parent) if parent is not None else 0) + len(self._items)
+        self._flat: Optional[List[Dict[str, str]]] = None
+
+    def extend(self, items: Sequence[Dict[str, str]]) -> "MessageLog":
+        """items를 덧붙인 새 로그를 반환합니다 (기존 로그는 그대로)."""
+        if not items:
+            return self
+        return MessageLog(items, self)
+
+    def tail(self, count: int) -> List[Dict[str, str]]:
+        """마지막 count개 메시지를 앞에서부터 순서대로 반환합니다."""
+        chunks = []
+        remaining = count
+        node: Optional[MessageLog] = self
+        while node is not None and remaining > 0:
+            if node._flat is not None:
+                chunks.append(node._flat[-remaining:])
+                break
+            chunks.append(node._items[-remaining:] if remaining < len(node._items)
+                          else node._items)
+            remaining -= len(chunks[-1])
+            node = node._parent
+        result: List[Dict[str, str]] = []
+        for chunk in reversed(chunks):
+            result.extend(chunk)
+        return result
+
+    def _materialize(self) -> List[Dict[str, str]]:
+        if self._flat is None:
+            chunks = []
+            node: Optional[MessageLog] = self
+            while node is not None:
+                if node._flat is not None:
+                    chunks.append(node._flat)
+                    break
+                chunks.append(node._items)
+                node = node._parent
+            flat: List[Dict[str, str]] = []
+            for chunk in reversed(chunks):
+                flat.extend(chunk)
+            self._flat = flat
+        return self._flat
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and -self._len <= index < 0:
+            return self.tail(-index)[0]
+        if (isinstance(index, slice) and index.step is None and index.stop is None
+                and index.start is not None and index.start < 0):
+            return self.tail(-index.start)
+        return self._materialize()[index]
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return iter(self._materialize())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, tuple, MessageLog)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"MessageLog({self._materialize()!r})"
+
+
+def append_messages(log: Optional[Sequence[Dict[str, str]]],
+                    new: Optional[Sequence[Dict[str, str]]]) -> MessageLog:
+    """새 메시지를 로그 끝에 추가합니다. 비용은 새 메시지 수에만 비례합니다."""
+    if not isinstance(log, MessageLog):
+        log = MessageLog(log or ())
+    return log.extend(new or ())
@@ -0,0 +1,104 @@
+"""
+Test doubles shared by the test modules: tokenizer, chat model and Notion client stubs
+"""
+
+import asyncio
+import time
+
+import httpx
+from langchain_core.messages import AIMessage
+from notion_client.errors import APIResponseError
+
+from notion_blocks import MAX_CHILDREN, MAX_TEXT_CHARS
+
+
+class FakeEncoding:
+    """Whitespace tokenizer that records how it was called"""
+
+    def __init__(self):
+        self.single_calls = 0
+        self.batch_calls = 0
+
+    def encode_ordinary(self, text):
+        self.single_calls += 1
+        return text.split()
+
+    def encode_ordinary_batch(self, texts, num_threads=1):
+        self.batch_calls += 1
+        return [text.split() for text in texts]
+
+
+class AsyncStubModel:
+    """Chat model stub whose ainvoke waits a fixed latency"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=f"reply {self.calls}", usage_metadata={
+            "input_tokens": 10, "output_tokens": 5, "total_tokens": 15})
+
+
+class SleepyModel:
+    """Chat model stub whose invoke blocks for a fixed latency"""
+
+    def __init__(self, latency=0.1):
+        self.latency = latency
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        # instruction("당신은 <이름>입니다...")의 두 번째 단어로 어느 현인의 답변인지 구분합니다
+        return AIMessage(content=f"answer to {prompt.split()[1]}", usage_metadata={
+            "input_tokens": 10, "output_tokens": 5, "total_tokens": 15})
+
+
+class FakeNotion:
+    """In-memory Notion client that enforces the API limits the writer relies on"""
+
+    def __init__(self, rate_limited=0):
+        self.pages = self
+        self.blocks = self
+        self.children = self
+        self.rate_limited = rate_limited
+        self.stored = {}
+        self.requests = []
+
+    def _check(self, children):
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise APIResponseError(code="rate_limited", status=429, message="slow down",
+                                   headers=httpx.Headers({"retry-after": "2"}),
+                                   raw_body_text="")
+        assert len(children) <= MAX_CHILDREN
+        for block in children:
+            for item in block[block["type"]]["rich_text"]:
+                assert len(item["text"]["content"]) <= MAX_TEXT_CHARS
+
+    def create(self, parent, properties, children):
+        self.requests.append("create")
+        self._check(children)
+        page_id = f"page-{len(self.stored)}"
+        self.stored[page_id] = list(children)
+        return {"id": page_id}
+
+    def append(self, block_id, children):
+        self.requests.append("append")
+        self._check(children)
+        self.stored[block_id].extend(children)
+        return {"results": children}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
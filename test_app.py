@@ -0,0 +1,41 @@
+"""
+Tests for the Streamlit front end's workflow driver
+"""
+
+from unittest.mock import MagicMock
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import app
+import token_counter
+from stubs import FakeEncoding
+
+
+class CountingModel(FakeListChatModel):
+    """Fake chat model that counts invocations"""
+    calls: int = 0
+
+    def invoke(self, *args, **kwargs):
+        self.calls += 1
+        return super().invoke(*args, **kwargs)
+
+
+class TestRunWorkflow:
+    """Tests for run_workflow"""
+
+    def test_runs_graph_exactly_once(self, monkeypatch):
+        """Test that one button press pays for exactly one debate and article"""
+        monkeypatch.setattr(token_counter, "get_encoding", FakeEncoding)
+        model = CountingModel(responses=[f"reply {i}" for i in range(50)])
+        monkeypatch.setattr(app, "model", model)
+        monkeypatch.setattr(app, "st", MagicMock())
+        sages = app.load_personas('personas.json')[:2]
+
+        graph = app.create_workflow(sages)
+        state = app.run_workflow(graph, app.ConversationState(topic="Test"))
+
+        # initiate + 4 turns + article + metadata
+        assert model.calls == 7
+        assert len(state["messages"]) == 5
+        assert state["content"] == "reply 5"
+        assert state["notion_url"] == "Notion 미설정"
@@ -0,0 +1,142 @@
+"""
+Unit tests for the batch generation runner
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from batch import BatchJob, completed_job_ids, load_jobs, rewrite_urls, run_batch
+
+
+def write_jobs(path, jobs):
+    path.write_text("\n".join(json.dumps(job, ensure_ascii=False)
+                              for job in jobs) + "\n", encoding="utf-8")
+
+
+class TestLoadJobs:
+    """Tests for job file parsing"""
+
+    def test_jobs_without_id_get_stable_key(self, tmp_path):
+        """Test that jobs without an id get a content-derived id"""
+        jobs_file = tmp_path / "jobs.jsonl"
+        write_jobs(jobs_file, [{"topic": "AI"}, {"id": "custom", "url": "http://x"}])
+
+        first = load_jobs(str(jobs_file))
+        second = load_jobs(str(jobs_file))
+
+        assert first[0].id and first[0].id == second[0].id
+        assert first[1].id == "custom"
+
+    def test_invalid_line_reports_location(self, tmp_path):
+        """Test that malformed job lines raise with the line number"""
+        jobs_file = tmp_path / "jobs.jsonl"
+        jobs_file.write_text('{"topic": "AI"}\n{"personas": "not-a-list"}\n')
+
+        with pytest.raises(ValueError, match="jobs.jsonl:2"):
+            load_jobs(str(jobs_file))
+
+
+class TestRunBatch:
+    """Tests for concurrent batch execution"""
+
+    def test_streams_results_and_resumes(self, tmp_path):
+        """Test that finished jobs are skipped on the next run"""
+        output = tmp_path / "results.jsonl"
+        jobs = [BatchJob(id=f"job-{i}", topic=f"Topic {i}") for i in range(3)]
+        calls = []
+
+        async def run_job(job):
+            calls.append(job.id)
+            if job.id == "job-1" and calls.count("job-1") == 1:
+                raise RuntimeError("boom")
+            return {"title": job.topic}
+
+        assert asyncio.run(run_batch(jobs, str(output), run_job)) == (2, 1)
+        assert completed_job_ids(str(output)) == {"job-0", "job-2"}
+
+        # 두 번째 실행은 실패한 작업만 다시 시도합니다
+        assert asyncio.run(run_batch(jobs, str(output), run_job)) == (1, 0)
+        assert sorted(calls) == ["job-0", "job-1", "job-1", "job-2"]
+
+    def test_concurrency_limit(self, tmp_path):
+        """Test that no more than `concurrency` jobs run at once"""
+        jobs = [BatchJob(id=str(i), topic="t") for i in range(8)]
+        active = {"now": 0, "peak": 0}
+
+        async def run_job(job):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            return {}
+
+        asyncio.run(run_batch(jobs, str(tmp_path / "out.jsonl"),
+                              run_job, concurrency=3))
+
+        assert active["peak"] == 3
+
+    def test_resumes_after_truncated_line(self, tmp_path):
+        """Test that a result cut off mid-write does not swallow the next one"""
+        output = tmp_path / "results.jsonl"
+        output.write_text('{"id": "a", "status": "ok"}\n{"id": "b", "sta', encoding="utf-8")
+        jobs = [BatchJob(id=job_id, topic="t") for job_id in ("a", "b")]
+
+        async def run_job(job):
+            return {}
+
+        assert asyncio.run(run_batch(jobs, str(output), run_job)) == (1, 0)
+        assert completed_job_ids(str(output)) == {"a", "b"}
+        assert output.read_text(encoding="utf-8").splitlines()[1] == '{"id": "b", "sta'
+
+
+class TestRewriteUrls:
+    """Tests for replacing outbox markers with published page URLs"""
+
+    def test_published_markers_are_replaced(self, tmp_path):
+        output = tmp_path / "results.jsonl"
+        output.write_text("\n".join([
+            json.dumps({"id": "a", "status": "ok", "notion_url": "notion-outbox:1"}),
+            json.dumps({"id": "b", "status": "ok", "notion_url": "notion-outbox:2"}),
+            json.dumps({"id": "c", "status": "error", "error": "boom"}),
+            '{"id": "d", "sta',
+        ]) + "\n", encoding="utf-8")
+        published = {"notion-outbox:1": "https://www.notion.so/page1"}
+
+        assert rewrite_urls(str(output), published.get) == 1
+
+        lines = output.read_text(encoding="utf-8").splitlines()
+        assert json.loads(lines[0])["notion_url"] == "https://www.notion.so/page1"
+        assert json.loads(lines[1])["notion_url"] == "notion-outbox:2"
+        assert lines[3] == '{"id": "d", "sta'
+        assert completed_job_ids(str(output)) == {"a", "b"}
+
+    def test_batch_mode_writes_resolved_urls(self, tmp_path, monkeypatch):
+        import main
+        import notion_outbox
+
+        outbox = notion_outbox.Outbox(str(tmp_path / "outbox.sqlite3"))
+        worker = notion_outbox.OutboxWorker(outbox, lambda payload: "https://www.notion.so/p")
+        monkeypatch.setattr(main, "notion", object())
+        monkeypatch.setattr(main, "NOTION_DATABASE_ID", "db")
+        monkeypatch.setattr(main, "get_worker", lambda publish: worker)
+
+        async def fake_run_batch(jobs, output_path, run_job, concurrency):
+            item_id = outbox.enqueue({})
+            with open(output_path, "a", encoding="utf-8") as out:
+                out.write(json.dumps({"id": "a", "status": "ok",
+                                      "notion_url": notion_outbox.pending_url(item_id)}) + "\n")
+            worker.process_due()
+            return 1, 0
+
+        monkeypatch.setattr(main, "run_batch", fake_run_batch)
+        jobs = tmp_path / "jobs.jsonl"
+        write_jobs(jobs, [{"id": "a", "topic": "AI"}])
+        output = tmp_path / "results.jsonl"
+
+        main.run_batch_mode(str(jobs), str(output), 1)
+
+        record = json.loads(output.read_text(encoding="utf-8"))
+        assert record["notion_url"] == "https://www.notion.so/p"
+        outbox.close()
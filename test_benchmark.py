@@ -0,0 +1,83 @@
+"""
+Unit tests for the end-to-end benchmark harness
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import benchmark
+import main
+from benchmark import Scenario
+from fake_llm import FakeChatModel
+
+pytestmark = pytest.mark.usefixtures("whitespace_tokens")
+
+
+def test_percentile_interpolates():
+    assert benchmark.percentile([], 50) is None
+    assert benchmark.percentile([3.0], 95) == 3.0
+    assert benchmark.percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert benchmark.percentile(list(range(101)), 95) == 95
+
+
+def test_scenario_sages_clones_with_distinct_names():
+    sages = benchmark.scenario_sages(3)
+    assert len({sage.name for sage in sages}) == 3
+
+
+def test_arun_scenario_measures_articles(monkeypatch):
+    monkeypatch.setattr(main, "notion", None)
+    model = FakeChatModel(tokens=(5, 10))
+    scenario = Scenario(personas=2, debate_messages=3, concurrency=2, articles=3)
+
+    result = asyncio.run(benchmark.arun_scenario(scenario, model))
+
+    assert result["completed"] == 3 and result["failures"] == 0
+    assert result["key"] == "p2-m3-c2-round_robin-single"
+    assert result["articles_per_minute"] > 0
+    assert result["latency_p50"] <= result["latency_p95"]
+    assert result["token_encode_calls"] > 0
+    assert result["output_tokens"] > 0 and model.calls > 0
+    # 실행이 끝나면 전역 설정을 되돌립니다
+    assert main.model is not model
+    assert main.DEBATE_MESSAGES == 5
+
+
+def test_arun_scenario_counts_failures(monkeypatch):
+    monkeypatch.setattr(main, "notion", None)
+    result = asyncio.run(benchmark.arun_scenario(
+        Scenario(articles=2), FakeChatModel(failure_rate=1.0)))
+    assert result["completed"] == 0 and result["failures"] == 2
+    assert result["latency_p95"] is None
+
+
+def entry(key, per_minute, p95):
+    return {"key": key, "articles_per_minute": per_minute, "latency_p95": p95}
+
+
+def test_compare_flags_regressions():
+    baseline = {"scenarios": [entry("a", 100.0, 1.0), entry("b", 100.0, 1.0)]}
+    current = [entry("a", 95.0, 1.05), entry("b", 80.0, 1.5), entry("new", 1.0, 9.0)]
+    regressions = benchmark.compare(current, baseline, tolerance=0.1)
+    assert len(regressions) == 2
+    assert all(line.startswith("b:") for line in regressions)
+
+
+def test_main_writes_report_and_compares(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, "run_isolated", lambda scenario, spec: {
+        **entry(scenario.key(), 60.0, 1.0), "latency_p50": 0.5, "peak_rss_mb": 10.0,
+        "token_cpu_seconds": 0.01, "failures": 0})
+    output = tmp_path / "bench.json"
+    assert benchmark.main(["--personas", "1,2", "--concurrency", "1",
+                           "--output", str(output)]) == 0
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert [s["key"] for s in report["scenarios"]] == [
+        "p1-m5-c1-round_robin-single", "p2-m5-c1-round_robin-single"]
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"scenarios": [
+        entry("p1-m5-c1-round_robin-single", 120.0, 1.0)]}), encoding="utf-8")
+    assert benchmark.main(["--personas", "1", "--concurrency", "1", "--output",
+                           str(output), "--compare", str(baseline)]) == 1
@@ -0,0 +1,125 @@
+"""
+Unit tests for pre-flight cost estimation and the budget governor
+"""
+
+import asyncio
+
+import pytest
+
+import budget
+import main
+from budget import BudgetExceeded, BudgetGovernor, estimate_tokens_cost
+from stubs import AsyncStubModel
+
+MODEL = "claude-3-5-sonnet-20240620"
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class BoundedModel:
+    max_tokens = 1000
+
+
+class TestEstimate:
+    """Tests for the per-call cost upper bound"""
+
+    def test_uses_model_max_tokens(self):
+        # 1000 input tokens at $0.003/1k + 1000 output tokens at $0.015/1k
+        assert estimate_tokens_cost(BoundedModel(), MODEL, 1000) == pytest.approx(0.018)
+        assert estimate_tokens_cost(object(), MODEL, 0) == pytest.approx(
+            budget.DEFAULT_MAX_OUTPUT * 0.015 / 1000)
+
+    def test_map_reduce_article_includes_note_calls(self):
+        """Test that the map_reduce article estimate adds the section-note calls"""
+        state = main.ConversationState(topic="Test", output_tokens=7000)
+        single = main.estimate_article_cost(state, BoundedModel(), MODEL)
+        mapped = main.estimate_article_cost(
+            state.model_copy(update={"article_mode": "map_reduce"}), BoundedModel(), MODEL)
+
+        # 3 section notes plus an article over 3000 note tokens
+        note_calls = sum(estimate_tokens_cost(BoundedModel(), MODEL, 2334 + 100) for _ in range(3))
+        assert mapped == pytest.approx(note_calls + estimate_tokens_cost(BoundedModel(), MODEL, 3200))
+        assert single == pytest.approx(estimate_tokens_cost(BoundedModel(), MODEL, 7200))
+
+
+class TestBudgetGovernor:
+    """Tests for reservations shared across runs"""
+
+    def test_reservations_count_against_shared_budget(self):
+        governor = BudgetGovernor(per_run=None, per_day=1.0)
+        first, second = governor.run(), governor.run()
+
+        governor.reserve(first, 0.6)
+        with pytest.raises(BudgetExceeded, match="일일"):
+            governor.reserve(second, 0.6)
+
+        # settling at the actual cost releases the unused part of the reservation
+        governor.settle(first, 0.6, 0.1)
+        governor.reserve(second, 0.6)
+        assert governor.spent_today() == pytest.approx(0.1)
+
+    def test_per_run_limit(self):
+        governor = BudgetGovernor(per_run=1.0)
+        run = governor.run(spent=0.9)
+
+        assert not run.can_afford(0.2)
+        with pytest.raises(BudgetExceeded, match="실행"):
+            governor.reserve(run, 0.2)
+        governor.reserve(governor.run(), 0.2)
+
+    def test_daily_spend_persists_and_rolls_over(self, tmp_path):
+        clock = FakeClock()
+        path = str(tmp_path / "budget.sqlite3")
+        governor = BudgetGovernor(per_run=None, per_day=1.0, total=1.5,
+                                  path=path, clock=clock)
+        run = governor.run()
+        governor.reserve(run, 0.9)
+        governor.settle(run, 0.9, 0.9)
+        governor.close()
+
+        reopened = BudgetGovernor(per_run=None, per_day=1.0, total=1.5,
+                                  path=path, clock=clock)
+        assert reopened.spent_today() == pytest.approx(0.9)
+        with pytest.raises(BudgetExceeded, match="일일"):
+            reopened.reserve(reopened.run(), 0.2)
+
+        clock.now += 86400
+        reopened.reserve(reopened.run(), 0.2)
+        with pytest.raises(BudgetExceeded, match="전체"):
+            reopened.reserve(reopened.run(), 0.5)
+        reopened.close()
+
+
+@pytest.mark.usefixtures("whitespace_tokens")
+class TestWorkflowBudget:
+    """Tests for budget-aware routing in the workflow"""
+
+    def run(self, monkeypatch, per_run):
+        budget.configure_budget(True, BudgetGovernor(per_run=per_run))
+        stub = AsyncStubModel(latency=0)
+        monkeypatch.setattr(main, "model", stub)
+        result = asyncio.run(main.arun_workflow(
+            main.load_personas('personas.json')[:2], "Test"))
+        return stub, result
+
+    def test_debate_cut_short_to_leave_room_for_article(self, monkeypatch):
+        # each call may cost up to ~$0.062, so $0.1 affords no extra debate turn plus the article
+        stub, result = self.run(monkeypatch, per_run=0.1)
+
+        assert len(result["messages"]) == 1
+        assert result["content"]
+        assert not result.get("budget_exceeded")
+        assert stub.calls == 3
+
+    def test_aborts_cleanly_when_first_call_is_unaffordable(self, monkeypatch):
+        stub, result = self.run(monkeypatch, per_run=0.05)
+
+        assert stub.calls == 0
+        assert "실행 예산" in result["budget_exceeded"]
+        assert not result.get("content")
@@ -0,0 +1,175 @@
+"""
+Unit tests for recording and replaying model, Notion and topic traffic
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from notion_client import APIResponseError
+
+import cassette
+import fetcher
+import main
+import notion_schema
+from cassette import Cassette, CassetteMissError, RecordedError, use_cassette
+from fake_llm import FakeChatModel
+from llm import call_model
+from notion_blocks import NotionWriter, TokenBucket
+from stubs import FakeClock, FakeNotion
+
+pytestmark = pytest.mark.usefixtures("whitespace_tokens")
+
+
+class OfflineModel:
+    """Fails the test if a replay reaches the model"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"model.{name} called during replay")
+
+
+def run_article(topic):
+    sages = main.load_personas('personas.json')
+    return asyncio.run(main.arun_workflow(sages, topic))
+
+
+def test_replayed_run_matches_recording_exactly(tmp_path, monkeypatch):
+    path = str(tmp_path / "run.jsonl")
+    monkeypatch.setattr(main, "model", FakeChatModel(tokens=(20, 40), seed=3))
+    with use_cassette(path, "record") as recording:
+        recorded = run_article("기술과 사회")
+    assert recording.recorded == len(recorded["calls"])
+
+    monkeypatch.setattr(main, "model", OfflineModel())
+    with use_cassette(path) as replay:
+        replayed = run_article("기술과 사회")
+
+    assert replay.mode == "replay" and replay.remaining() == 0
+    for field in ("content", "title", "input_tokens", "output_tokens", "cost", "calls"):
+        assert replayed[field] == recorded[field]
+
+
+def test_streaming_replay_yields_same_chunks(tmp_path):
+    path = str(tmp_path / "stream.jsonl")
+    recorded_tokens, replayed_tokens = [], []
+    model = FakeChatModel(tokens=(30, 30), chunk_tokens=7, sleep=lambda _: None)
+    with use_cassette(path, "record"):
+        recorded = call_model(model, "claude-3-5-sonnet-20240620", "질문",
+                              on_token=recorded_tokens.append)
+    with use_cassette(path, "replay"):
+        replayed = call_model(OfflineModel(), "claude-3-5-sonnet-20240620", "질문",
+                              on_token=replayed_tokens.append)
+
+    assert replayed_tokens == recorded_tokens and len(recorded_tokens) == 5
+    assert replayed == recorded
+
+
+def test_unknown_request_raises_miss(tmp_path):
+    path = str(tmp_path / "miss.jsonl")
+    with use_cassette(path, "record"):
+        call_model(FakeChatModel(sleep=lambda _: None), "claude-3-5-sonnet-20240620", "하나")
+    with use_cassette(path, "replay"):
+        with pytest.raises(CassetteMissError):
+            call_model(OfflineModel(), "claude-3-5-sonnet-20240620", "둘")
+
+
+def test_latency_emulation(tmp_path):
+    path = tmp_path / "latency.jsonl"
+    path.write_text(json.dumps({"kind": "fetch", "operation": "fetch_title",
+                                "key": cassette.request_key("fetch", "fetch_title", {"url": "u"}),
+                                "elapsed": 1.5, "response": "제목"}) + "\n", encoding="utf-8")
+    for latency, expected in ((1.0, [1.5]), (0.5, [0.75]), (0.0, [])):
+        sleeps = []
+        replay = Cassette(str(path), "replay", latency=latency, sleep=sleeps.append)
+        assert replay.call("fetch", "fetch_title", {"url": "u"}, perform=None) == "제목"
+        assert sleeps == expected
+
+
+def test_notion_rate_limit_is_replayed(tmp_path):
+    path = str(tmp_path / "notion.jsonl")
+    content = "\n\n".join(f"문단 {i}" for i in range(150))
+    notion, clock = FakeNotion(rate_limited=1), FakeClock()
+    with use_cassette(path, "record"):
+        recorded = NotionWriter(notion, TokenBucket(rate=1e9), sleep=clock.sleep).create_page(
+            "db", {}, content)
+    assert notion.requests == ["create", "create", "append"]
+
+    replay_clock = FakeClock()
+    with use_cassette(path, "replay"):
+        replayed = NotionWriter(None, TokenBucket(rate=1e9),
+                                sleep=replay_clock.sleep).create_page("db", {}, content)
+    assert replayed == recorded
+    assert replay_clock.sleeps == clock.sleeps == [2.0]
+
+
+class SchemaChangedNotion:
+    """Rejects the first page because a property was removed from the database"""
+
+    def __init__(self):
+        self.schemas = [{"properties": {"Name": {"type": "title"}, "Slug": {"type": "rich_text"}}},
+                        {"properties": {"Name": {"type": "title"}}}]
+        self.created = []
+        self.databases = self.pages = self
+
+    def retrieve(self, database_id):
+        return self.schemas.pop(0)
+
+    def create(self, **kwargs):
+        self.created.append(set(kwargs["properties"]))
+        if len(self.created) == 1:
+            raise APIResponseError(code="validation_error", status=400,
+                                   message="Slug is not a property that exists.",
+                                   headers=httpx.Headers(), raw_body_text="")
+        return {"id": "page-1"}
+
+
+def test_notion_schema_retry_is_replayed(tmp_path, monkeypatch):
+    path = str(tmp_path / "schema.jsonl")
+    state = main.ConversationState(topic="주제", content="본문", title="제목", slug="slug")
+    notion = SchemaChangedNotion()
+    monkeypatch.setattr(main, "NOTION_DATABASE_ID", "db")
+    monkeypatch.setattr(main, "notion", notion)
+    with use_cassette(path, "record"):
+        recorded = main.create_notion_page(state)
+    assert notion.created == [{"Name", "Slug"}, {"Name"}]
+
+    # 재생한 validation_error도 스키마를 다시 조회하고 재시도하게 합니다
+    notion_schema.invalidate_schema()
+    monkeypatch.setattr(main, "notion", None)
+    with use_cassette(path, "replay") as replay:
+        assert main.create_notion_page(state) == recorded
+    assert replay.remaining() == 0
+
+
+def test_topic_fetch_and_errors_are_replayed(tmp_path, monkeypatch):
+    path = str(tmp_path / "fetch.jsonl")
+
+    def fetch(url, *args):
+        if "broken" in url:
+            raise ConnectionError("연결 실패")
+        return "녹화된 제목"
+
+    monkeypatch.setattr(fetcher, "_fetch_title", fetch)
+    with use_cassette(path, "record"):
+        assert main.get_topic("https://example.com/a") == "녹화된 제목"
+        with pytest.raises(ConnectionError):
+            fetcher.fetch_title("https://example.com/broken")
+
+    monkeypatch.setattr(fetcher, "_fetch_title", OfflineModel())
+    with use_cassette(path, "replay"):
+        assert main.get_topic("https://example.com/a") == "녹화된 제목"
+        with pytest.raises(RecordedError, match="연결 실패"):
+            fetcher.fetch_title("https://example.com/broken")
+
+
+def test_cassette_from_env(tmp_path, monkeypatch):
+    path = tmp_path / "env.jsonl"
+    monkeypatch.setenv("CASSETTE", str(path))
+    monkeypatch.setenv("CASSETTE_LATENCY", "recorded")
+    assert cassette.cassette_from_env().mode == "record"
+    path.write_text("", encoding="utf-8")
+    replay = cassette.cassette_from_env()
+    assert replay.mode == "replay" and replay.latency == 1.0
+    monkeypatch.delenv("CASSETTE")
+    assert cassette.cassette_from_env() is None
@@ -0,0 +1,89 @@
+"""
+Unit tests for durable workflow checkpoints and resume
+"""
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+import checkpoints
+import main
+
+
+class FlakyModel:
+    """Chat model stub that fails on the article prompt until `fail` is cleared"""
+
+    def __init__(self):
+        self.fail = True
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail and "뉴욕타임즈" in prompt:
+            raise RuntimeError("process died")
+        return AIMessage(content=f"reply {len(self.prompts)}", usage_metadata={
+            "input_tokens": 10, "output_tokens": 5, "total_tokens": 15})
+
+    def stream(self, prompt):
+        message = self.invoke(prompt)
+        yield AIMessageChunk(content=message.content,
+                             usage_metadata=message.usage_metadata)
+
+
+@pytest.fixture
+def interrupted_run(tmp_path, monkeypatch, whitespace_tokens):
+    """A run that died in generate_final_content after the debate finished"""
+    monkeypatch.setenv("CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(main, "print_chat_message", lambda message, color: None)
+    model = FlakyModel()
+    monkeypatch.setattr(main, "model", model)
+    sages = main.load_personas('personas.json')[:2]
+    checkpointer = checkpoints.get_checkpointer()
+    run_id = checkpoints.new_run_id()
+
+    graph = main.create_workflow(sages, checkpointer=checkpointer)
+    with pytest.raises(RuntimeError):
+        graph.invoke({"topic": "Test", "personas": [s.name for s in sages]},
+                     checkpoints.run_config(run_id))
+
+    model.fail = False
+    return model, sages, checkpointer, run_id
+
+
+class TestResume:
+    """Tests for continuing an interrupted run"""
+
+    def test_resume_skips_finished_nodes(self, interrupted_run):
+        """Test that resuming does not re-invoke the model for the debate"""
+        model, sages, checkpointer, run_id = interrupted_run
+        debate_calls = len(model.prompts) - 1
+        graph = main.create_workflow(sages, checkpointer=checkpointer)
+        config = checkpoints.run_config(run_id)
+
+        assert graph.get_state(config).next == ("generate",)
+        result = graph.invoke(None, config)
+
+        # article + metadata only
+        assert len(model.prompts) == debate_calls + 1 + 2
+        assert len(result["messages"]) == 5
+        assert result["input_tokens"] == 10 * (debate_calls + 2)
+        assert result["content"]
+
+    def test_saved_run_records_personas(self, interrupted_run):
+        """Test that the run's personas and id can be read back"""
+        _, sages, checkpointer, run_id = interrupted_run
+
+        assert checkpoints.run_personas(checkpointer, run_id) == [s.name for s in sages]
+        assert checkpoints.run_personas(checkpointer, "missing") is None
+        assert checkpoints.recent_runs(checkpointer) == [run_id]
+
+    def test_resume_option(self, interrupted_run, capsys):
+        """Test that `--resume <run_id>` finishes the run from the CLI"""
+        model, _, _, run_id = interrupted_run
+        calls = len(model.prompts)
+
+        main.main(["--resume", run_id])
+        assert len(model.prompts) == calls + 2
+
+        main.main(["--resume", run_id])
+        assert len(model.prompts) == calls + 2
+        assert "이미 완료" in capsys.readouterr().out
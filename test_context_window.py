@@ -0,0 +1,95 @@
+"""
+Unit tests for the token-budgeted debate context window
+"""
+
+import pytest
+
+import context_window
+import main
+from llm import ModelCall
+from reducers import append_messages
+from token_counter import count_tokens
+
+pytestmark = pytest.mark.usefixtures("whitespace_tokens")
+
+
+def turn(i, words=30):
+    return {"role": f"sage{i % 3}", "content": f"turn{i} " + " ".join(["word"] * words)}
+
+
+class TestBuildContext:
+    """Tests for assembling recent turns and the digest"""
+
+    def test_recent_turns_verbatim(self):
+        """Test that only the last K turns are sent in full"""
+        messages = [turn(i) for i in range(10)]
+        context = context_window.build_context("", messages, recent_turns=3, budget=1000)
+
+        assert "turn9 " in context and "turn7 " in context
+        assert "turn6 " not in context
+
+    def test_context_fits_budget(self):
+        """Test that the digest is trimmed oldest-first to fit the budget"""
+        messages = [turn(i) for i in range(10)]
+        digest = "\n".join(f"- old{i}: " + "x " * 20 for i in range(50))
+        context = context_window.build_context(digest, messages, recent_turns=2, budget=200)
+        body = context.replace("이전 토론 요약:", "").replace("최근 발언:", "")
+
+        assert count_tokens(body) <= 200
+        assert "old49" in context
+        assert "old0:" not in context
+
+    def test_oversized_turn_is_truncated(self):
+        """Test that a single turn over the budget is cut to fit"""
+        context = context_window.build_context("", [turn(0, words=500)], budget=50)
+        assert count_tokens(context) <= 50 + 2
+
+
+class TestDigest:
+    """Tests for the running digest of older turns"""
+
+    def test_evicted_turns(self):
+        """Test which messages leave the window when turns are added"""
+        messages = [turn(i) for i in range(3)]
+        new = [turn(3), turn(4)]
+        assert context_window.evicted_turns(messages, new[:1], recent_turns=4) == []
+        assert context_window.evicted_turns(messages, new, recent_turns=3) == messages[:2]
+        # a round larger than the window pushes out some of its own turns
+        assert context_window.evicted_turns(messages, new, recent_turns=1) == messages[2:] + new[:1]
+
+    def test_digest_is_bounded(self):
+        """Test that the digest keeps one short line per turn within half the budget"""
+        digest = ""
+        for i in range(100):
+            digest = context_window.update_digest(digest, [turn(i, words=200)], budget=400)
+
+        lines = digest.splitlines()
+        assert lines[-1].startswith("- sage0: turn99")
+        assert all(len(line) <= context_window.DIGEST_LINE_CHARS + 20 for line in lines)
+        assert count_tokens(digest) <= 200
+
+
+class TestContinuePrompt:
+    """Tests for per-turn input size as the debate grows"""
+
+    def test_turn_input_stays_constant(self):
+        """Test that per-turn input tokens stop growing once the window is full"""
+        sages = main.load_personas('personas.json')[:2]
+        state = main.ConversationState(topic="Test", messages=[turn(0)])
+        sizes = []
+        for _ in range(80):
+            sage = main.next_sage(state, sages)
+            prompt = main.continue_prompt(state, sage)
+            result = ModelCall(content=" ".join(["reply"] * 30),
+                               input_tokens=count_tokens(prompt), output_tokens=30, cost=0.0)
+            update = main.continued_update(state, sage, result)
+            state = state.model_copy(update={
+                "messages": append_messages(state.messages, update["messages"]),
+                "digest": update.get("digest", state.digest),
+                "turn_input_tokens": state.turn_input_tokens + update["turn_input_tokens"]})
+            sizes.append(count_tokens(prompt) - count_tokens(sage.instruction))
+
+        assert state.turn_input_tokens[-1] == count_tokens(prompt)
+        assert max(sizes) <= context_window.CONTEXT_TOKEN_BUDGET + 20
+        # once the digest reaches its cap, later turns stay flat
+        assert max(sizes[60:]) - min(sizes[60:]) < 30
@@ -0,0 +1,80 @@
+"""
+Unit tests for per-call cost records and their aggregation
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import main
+from costs import CostTable
+from stubs import AsyncStubModel
+
+
+def record(node, model, cost, persona="", input_tokens=10, output_tokens=5):
+    return {"node": node, "persona": persona, "model": model, "cost": cost,
+            "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+
+RUNS = [
+    {"id": "a", "calls": [record("initiate", "opus", 0.5),
+                          record("continue", "opus", 0.25, "소크라테스"),
+                          record("generate", "sonnet", 0.125)]},
+    {"id": "b", "calls": [record("continue", "sonnet", 0.5, "소크라테스"),
+                          record("continue", "sonnet", 0.25, "공자")]},
+    {"id": "c", "status": "error", "error": "boom"},
+]
+
+
+class TestCostTable:
+    """Tests for the columnar cost aggregation"""
+
+    def test_breakdown(self):
+        table = CostTable.from_runs(RUNS)
+
+        assert (table.runs, len(table)) == (2, 5)
+        assert table.total_cost() == pytest.approx(1.625)
+        breakdown = table.breakdown()
+        assert [(row["model"], row["cost"], row["calls"]) for row in breakdown["model"]] == [
+            ("sonnet", 0.875, 3), ("opus", 0.75, 2)]
+        assert [(row["persona"], row["cost"]) for row in breakdown["persona"]] == [
+            ("소크라테스", 0.75), ("", 0.625), ("공자", 0.25)]
+        assert breakdown["node"][0] == {
+            "node": "continue", "calls": 3, "input_tokens": 30, "output_tokens": 15,
+            "cache_read_tokens": 0, "cache_write_tokens": 0, "cost": 1.0}
+
+    def test_group_by_several_columns(self):
+        rows = CostTable.from_runs(RUNS).group_by("model", "node")
+
+        assert {(row["model"], row["node"]): row["cost"] for row in rows} == {
+            ("opus", "initiate"): 0.5, ("opus", "continue"): 0.25,
+            ("sonnet", "generate"): 0.125, ("sonnet", "continue"): 0.75}
+
+    def test_load_skips_truncated_lines(self, tmp_path):
+        path = tmp_path / "results.jsonl"
+        lines = [json.dumps(run, ensure_ascii=False) for run in RUNS]
+        path.write_text("\n".join(lines) + '\n{"id": "d", "calls": [', encoding="utf-8")
+
+        table = CostTable.load([str(path)])
+
+        assert len(table) == 5
+        assert {row["run"] for row in table.group_by("run")} == {"a", "b"}
+
+
+@pytest.mark.usefixtures("whitespace_tokens")
+def test_workflow_tags_calls(monkeypatch):
+    """Test that every model call is recorded with its node, persona and model"""
+    monkeypatch.setattr(main, "model", AsyncStubModel(latency=0))
+    sages = main.load_personas('personas.json')[:2]
+
+    result = asyncio.run(main.arun_workflow(sages, "Test"))
+
+    calls = result["calls"]
+    assert [call["node"] for call in calls] == [
+        "initiate", "continue", "continue", "continue", "continue", "generate",
+        "generate_metadata"]
+    assert [call["persona"] for call in calls if call["node"] == "continue"] == [
+        sages[1].name, sages[0].name, sages[1].name, sages[0].name]
+    assert {call["model"] for call in calls} == {main.model_name}
+    assert sum(call["cost"] for call in calls) == pytest.approx(result["cost"])
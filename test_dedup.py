@@ -0,0 +1,182 @@
+"""
+Unit tests for near-duplicate topic and article detection
+"""
+
+import asyncio
+import random
+import time
+
+import pytest
+
+import dedup
+import main
+import notion_outbox
+from dedup import NUM_PERM, DuplicateIndex, LSHIndex, minhash, similarity
+from stubs import AsyncStubModel
+
+
+@pytest.fixture
+def index(tmp_path):
+    duplicate_index = DuplicateIndex(str(tmp_path / "dedup.sqlite3"))
+    yield duplicate_index
+    duplicate_index.close()
+
+
+class TestMinHash:
+    """Tests for signature similarity"""
+
+    def test_reworded_title_is_similar(self):
+        a = minhash("반도체 수출 3개월 연속 증가")
+
+        assert similarity(a, minhash("반도체 수출: 3개월 연속 증가!")) == 1.0
+        assert similarity(a, minhash("반도체 수출 3개월 연속 증가 전망")) >= dedup.DEFAULT_THRESHOLD
+        assert similarity(a, minhash("핵융합 실험로, 최장 운전 기록 경신")) < 0.2
+        assert minhash("  ,. ") is None
+
+    @pytest.mark.parametrize("a, b", [
+        ("미국 금리 인상", "미국 금리 인하"),
+        ("iPhone 15", "iPhone 16"),
+        ("2024년 AI 기술 동향", "2025년 AI 기술 동향"),
+        ("삼성전자 3분기 실적", "삼성전자 2분기 실적"),
+    ])
+    def test_one_word_difference_is_not_duplicate(self, a, b):
+        assert similarity(minhash(a), minhash(b)) < dedup.DEFAULT_THRESHOLD
+
+
+class TestDuplicateIndex:
+    """Tests for storing and finding past articles"""
+
+    def test_finds_similar_topic_after_reopen(self, tmp_path, index):
+        index.add({"topic": "반도체 수출 3개월 연속 증가", "title": "수출 회복",
+                   "content": "본문"})
+        reopened = DuplicateIndex(index.path)
+
+        match = reopened.find_topic("반도체 수출: 3개월 연속 증가!")
+
+        assert match["title"] == "수출 회복"
+        assert match["similarity"] >= dedup.DEFAULT_THRESHOLD
+        assert reopened.find_topic("핵융합 실험로, 최장 운전 기록 경신") is None
+        reopened.close()
+
+    def test_near_identical_topic_does_not_match(self, index):
+        index.add({"topic": "미국 금리 인상", "content": "본문"})
+        index.add({"topic": "iPhone 15 출시", "content": "본문"})
+
+        assert index.find_topic("미국 금리 인하") is None
+        assert index.find_topic("iPhone 16 출시") is None
+
+    def test_old_signatures_are_recomputed(self, index):
+        key = index.add({"topic": "반도체 수출 3개월 연속 증가", "content": "본문"})
+        # 이전 방식(글자 2-gram)으로 저장된 색인을 흉내 냅니다
+        index._conn.execute("UPDATE articles SET topic_signature = ? WHERE id = ?",
+                            (dedup._pack(tuple(range(NUM_PERM))), key))
+        index._conn.execute("PRAGMA user_version = 0")
+        index._conn.commit()
+
+        reopened = DuplicateIndex(index.path)
+
+        assert reopened.find_topic("반도체 수출: 3개월 연속 증가!")["id"] == key
+        reopened.close()
+
+    def test_lookup_stays_fast_with_many_articles(self):
+        lsh = LSHIndex()
+        rng = random.Random(0)
+        for key in range(30000):
+            lsh.add(key, tuple(rng.getrandbits(32) for _ in range(NUM_PERM)))
+        query = minhash("오픈소스 AI 모델, 상용 모델 성능 따라잡아")
+        lsh.add(-1, query)
+
+        start = time.perf_counter()
+        for _ in range(100):
+            matches = lsh.query(query, dedup.DEFAULT_THRESHOLD)
+        elapsed = (time.perf_counter() - start) / 100
+
+        assert matches == [(1.0, -1)]
+        assert elapsed < 0.001
+
+
+@pytest.mark.usefixtures("whitespace_tokens")
+class TestWorkflowReuse:
+    """Tests for skipping the debate when a similar topic was already covered"""
+
+    def test_similar_topic_reuses_article(self, monkeypatch, index):
+        dedup.configure_dedup("reuse", index)
+        stub = AsyncStubModel(latency=0)
+        monkeypatch.setattr(main, "model", stub)
+        monkeypatch.setattr(main, "publish_to_notion",
+                            lambda state: {"notion_url": "https://www.notion.so/page1"})
+        sages = main.load_personas('personas.json')[:2]
+
+        first = asyncio.run(main.arun_workflow(sages, "반도체 수출 3개월 연속 증가"))
+        calls = stub.calls
+        second = asyncio.run(main.arun_workflow(sages, "반도체 수출: 3개월 연속 증가!"))
+
+        assert stub.calls == calls
+        assert second["duplicate_of"] == "반도체 수출 3개월 연속 증가"
+        assert second["content"] == first["content"]
+        assert second["title"] == first["title"]
+        assert second["notion_url"] == "https://www.notion.so/page1"
+
+    def test_article_without_page_is_not_reused(self, monkeypatch, index):
+        dedup.configure_dedup("reuse", index)
+        stub = AsyncStubModel(latency=0)
+        monkeypatch.setattr(main, "model", stub)
+        monkeypatch.setattr(main, "publish_to_notion",
+                            lambda state: {"notion_url": "Notion 저장 실패"})
+        sages = main.load_personas('personas.json')[:2]
+
+        asyncio.run(main.arun_workflow(sages, "반도체 수출 3개월 연속 증가"))
+        calls = stub.calls
+        second = asyncio.run(main.arun_workflow(sages, "반도체 수출: 3개월 연속 증가!"))
+
+        assert stub.calls > calls
+        assert not second.get("duplicate_of")
+        assert index.find_topic("반도체 수출 3개월 연속 증가")["notion_url"] == ""
+
+    def test_pending_page_is_resolved_from_outbox(self, monkeypatch, tmp_path, index):
+        outbox = notion_outbox.Outbox(str(tmp_path / "outbox.sqlite3"))
+        worker = notion_outbox.OutboxWorker(outbox, publish=lambda payload: "unused")
+        monkeypatch.setattr(main, "get_worker", lambda publish: worker)
+        done, waiting = outbox.enqueue({}), outbox.enqueue({})
+        outbox.mark_done(done, "https://www.notion.so/done")
+
+        assert main.reusable_page_url(notion_outbox.pending_url(done)) == \
+            "https://www.notion.so/done"
+        assert main.reusable_page_url(notion_outbox.pending_url(waiting)) == \
+            notion_outbox.pending_url(waiting)
+        assert main.reusable_page_url(notion_outbox.pending_url(999)) is None
+        assert main.reusable_page_url("Notion 미설정") is None
+        outbox.close()
+
+    def test_warn_mode_still_runs(self, monkeypatch, index):
+        dedup.configure_dedup("warn", index)
+        index.add({"topic": "반도체 수출 3개월 연속 증가", "content": "예전 기사"})
+        stub = AsyncStubModel(latency=0)
+        monkeypatch.setattr(main, "model", stub)
+
+        result = asyncio.run(main.arun_workflow(
+            main.load_personas('personas.json')[:2], "반도체 수출: 3개월 연속 증가!"))
+
+        assert stub.calls > 0
+        assert result["content"] != "예전 기사"
+        assert not result.get("duplicate_of")
+
+    def test_fallback_topic_is_never_reused(self, monkeypatch, index):
+        dedup.configure_dedup("reuse", index)
+        index.add({"topic": main.DEFAULT_TOPIC, "content": "예전 기사"})
+        stub = AsyncStubModel(latency=0)
+        monkeypatch.setattr(main, "model", stub)
+
+        result = asyncio.run(main.arun_workflow(
+            main.load_personas('personas.json')[:2], main.DEFAULT_TOPIC))
+
+        assert stub.calls > 0
+        assert not result.get("duplicate_of")
+
+    def test_no_dedup_flag_turns_check_off(self, monkeypatch):
+        dedup.configure_dedup("reuse")
+        monkeypatch.setattr(main, "run_batch_mode", lambda *args: None)
+
+        main.main(["--no-dedup", "--batch", "jobs.jsonl"])
+
+        assert dedup.dedup_mode() == "off"
@@ -0,0 +1,109 @@
+"""
+Unit tests for the deterministic fake chat model
+"""
+
+import asyncio
+
+import pytest
+
+import budget
+import dedup
+import fake_llm
+import llm_cache
+from fake_llm import FakeChatModel, FakeModelError, Latency
+
+
+def test_from_spec_parses_options():
+    model = FakeChatModel.from_spec(
+        "latency=lognormal:1.2,0.4;tokens=10-20;failure_rate=0.5;seed=7;chunk_tokens=3")
+    assert model.latency.kind == "lognormal"
+    assert model.latency.params == (1.2, 0.4)
+    assert model.tokens == (10, 20)
+    assert model.failure_rate == 0.5
+    assert model.seed == 7
+    assert model.chunk_tokens == 3
+
+
+def test_from_spec_rejects_unknown_options():
+    with pytest.raises(ValueError):
+        FakeChatModel.from_spec("temperature=1")
+    with pytest.raises(ValueError):
+        Latency.parse("pareto:1,2")
+
+
+def test_latency_is_never_negative():
+    import random
+    rng = random.Random(0)
+    latency = Latency.parse("normal:0,1")
+    assert all(latency.sample(rng) >= 0 for _ in range(100))
+    assert Latency.parse("0.25").sample(rng) == 0.25
+
+
+def test_invoke_is_deterministic_per_prompt():
+    sleeps = []
+    model = FakeChatModel(Latency("uniform", 0.1, 0.2), tokens=(5, 9), sleep=sleeps.append)
+    first = model.invoke("질문")
+    again = FakeChatModel(Latency("uniform", 0.1, 0.2), tokens=(5, 9), sleep=sleeps.append)
+    assert again.invoke("질문").content == first.content
+    assert sleeps[0] == sleeps[1] and 0.1 <= sleeps[0] <= 0.2
+    assert 5 <= first.usage_metadata["output_tokens"] <= 9
+    assert model.invoke("다른 질문").content != first.content
+    assert model.calls == 2
+
+
+def test_metadata_prompt_gets_parseable_answer():
+    model = FakeChatModel(sleep=lambda _: None)
+    content = model.invoke("제목:\n부제목:\n요약:\n슬러그:").content
+    assert [line.split(":")[0] for line in content.splitlines()] == ["제목", "부제목", "요약", "슬러그"]
+
+
+def test_failure_rate_raises():
+    model = FakeChatModel(failure_rate=1.0, sleep=lambda _: None)
+    with pytest.raises(FakeModelError):
+        model.invoke("질문")
+    with pytest.raises(FakeModelError):
+        list(model.stream("질문"))
+    assert model.failures == 2
+
+
+def test_stream_matches_invoke_and_reports_usage_last():
+    model = FakeChatModel(tokens=(20, 20), chunk_tokens=6, sleep=lambda _: None)
+    chunks = list(model.stream("질문"))
+    assert len(chunks) == 4
+    assert "".join(chunk.content for chunk in chunks).strip() == model.invoke("질문").content
+    assert chunks[-1].usage_metadata["output_tokens"] == 20
+    assert all(chunk.usage_metadata is None for chunk in chunks[:-1])
+
+
+def test_async_calls():
+    model = FakeChatModel(tokens=(4, 4))
+
+    async def run():
+        message = await model.ainvoke("질문")
+        chunks = [chunk async for chunk in model.astream("질문")]
+        return message, chunks
+
+    message, chunks = asyncio.run(run())
+    assert "".join(chunk.content for chunk in chunks).strip() == message.content
+
+
+def test_fake_model_from_env(monkeypatch):
+    monkeypatch.delenv("FAKE_LLM", raising=False)
+    assert fake_llm.fake_model_from_env() is None
+    monkeypatch.setenv("FAKE_LLM", "on")
+    assert isinstance(fake_llm.fake_model_from_env(), FakeChatModel)
+    monkeypatch.setenv("FAKE_LLM", "tokens=3")
+    assert fake_llm.fake_model_from_env().tokens == (3, 3)
+
+
+def test_fake_model_turns_off_real_side_effects(monkeypatch):
+    monkeypatch.setattr(budget, "_enabled", True)
+    monkeypatch.setattr(llm_cache, "_enabled", True)
+    monkeypatch.setattr(dedup, "_mode", "reuse")
+    monkeypatch.setenv("FAKE_LLM", "on")
+
+    fake_llm.fake_model_from_env()
+
+    assert budget.get_governor() is None
+    assert llm_cache.get_cache() is None
+    assert dedup.get_duplicate_index() is None
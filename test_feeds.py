@@ -0,0 +1,104 @@
+"""
+Unit tests for feed-based topic selection, run offline against fixture feeds
+"""
+
+import os
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+
+import main
+from feeds import FeedIndex, auto_topic, normalize_url, parse_feed, poll_feed
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "feeds")
+FEEDS = {
+    "https://news.example.com/rss": "tech_rss.xml",
+    "https://science.example.org/atom": "science_atom.xml",
+}
+NOW = datetime(2026, 10, 16, 4, tzinfo=timezone.utc).timestamp()
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class FakeResponse:
+    def __init__(self, content=b"", status_code=200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FixtureSession:
+    """Serves fixture feeds with an ETag and answers 304 to a matching If-None-Match"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, headers, timeout):
+        self.calls.append((url, headers))
+        etag = f'"{FEEDS[url]}"'
+        if headers.get("If-None-Match") == etag:
+            return FakeResponse(status_code=304)
+        return FakeResponse(fixture(FEEDS[url]), headers={"ETag": etag})
+
+
+@pytest.fixture
+def index(tmp_path):
+    feed_index = FeedIndex(str(tmp_path / "feeds.sqlite3"))
+    yield feed_index
+    feed_index.close()
+
+
+class TestParseFeed:
+    """Tests for RSS/Atom parsing and entry keys"""
+
+    def test_same_story_gets_same_key_across_formats(self):
+        rss = parse_feed(fixture("tech_rss.xml"))
+        atom = parse_feed(fixture("science_atom.xml"))
+
+        assert len(rss) == 3 and len(atom) == 2
+        assert rss[0].key == atom[0].key == "https://news.example.com/articles/open-models"
+        assert rss[1].key == "news-example-chips-1016"
+        assert rss[0].published == atom[0].published
+
+    def test_normalize_url(self):
+        assert normalize_url("HTTPS://Example.com:443/a/?utm_medium=x&b=2&a=1#frag") == \
+            "https://example.com/a?a=1&b=2"
+
+
+class TestAutoTopic:
+    """Tests for incremental polling and topic ranking"""
+
+    def test_picks_unseen_topics_by_score(self, index):
+        session = FixtureSession()
+
+        picks = [auto_topic(list(FEEDS), index, session, now=NOW) for _ in range(4)]
+
+        # the story in both feeds wins; the month-old entry is never picked
+        assert picks == ["오픈소스 AI 모델, 상용 모델 성능 따라잡아",
+                         "반도체 수출 3개월 연속 증가",
+                         "핵융합 실험로, 최장 운전 기록 경신",
+                         None]
+
+    def test_repeat_polls_are_conditional(self, index):
+        session = FixtureSession()
+        url = "https://news.example.com/rss"
+
+        assert poll_feed(index, url, session) == 3
+        assert poll_feed(index, url, session) == 0
+        assert session.calls[1][1] == {"If-None-Match": '"tech_rss.xml"'}
+
+    def test_no_feeds_falls_back_to_default_topic(self):
+        assert auto_topic([]) is None
+        assert main.get_topic(None) == "최신 AI 기술 동향"
+
+    @patch('main.auto_topic', return_value="피드 주제")
+    def test_get_topic_uses_feeds(self, mock_auto_topic):
+        assert main.get_topic(None) == "피드 주제"
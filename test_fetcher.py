@@ -0,0 +1,104 @@
+"""
+Unit tests for the streaming, conditional-GET page title fetcher
+"""
+
+import pytest
+import requests
+
+import fetcher
+from fetcher import TitleCache, fetch_title, read_head
+
+
+class FakeResponse:
+    def __init__(self, body=b"", status_code=200, headers=None, chunk=8):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.chunk = chunk
+        self.closed = False
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), self.chunk):
+            yield self.body[start:start + self.chunk]
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code}")
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, headers, timeout, stream):
+        self.calls.append({"url": url, "headers": headers, "timeout": timeout,
+                           "stream": stream})
+        return self.responses.pop(0)
+
+
+PAGE = b"<html><head><title> Test Title </title></head><body>" + b"x" * 100000
+
+
+class TestReadHead:
+    """Tests for the bounded streaming read"""
+
+    def test_stops_after_title(self):
+        response = FakeResponse(PAGE)
+
+        data = read_head(response)
+
+        assert b"</title>" in data
+        assert len(data) < 100
+        assert response.closed
+
+    def test_caps_pages_without_head(self):
+        response = FakeResponse(b"y" * 10000, chunk=1024)
+
+        assert len(read_head(response, max_bytes=3000)) == 3000
+
+
+class TestFetchTitle:
+    """Tests for title extraction and the conditional-GET cache"""
+
+    def test_requests_with_timeouts_and_streaming(self):
+        session = FakeSession(FakeResponse(PAGE))
+
+        assert fetch_title("http://example.com", session=session) == "Test Title"
+        assert session.calls[0]["stream"] is True
+        assert session.calls[0]["timeout"] == (fetcher.CONNECT_TIMEOUT, fetcher.READ_TIMEOUT)
+
+    def test_uses_declared_charset(self):
+        body = "<title>한글 제목</title>".encode("euc-kr")
+        session = FakeSession(FakeResponse(
+            body, headers={"Content-Type": "text/html; charset=euc-kr"}))
+
+        assert fetch_title("http://example.com", session=session) == "한글 제목"
+
+    def test_error_status_raises(self):
+        session = FakeSession(FakeResponse(b"<title>Not Found</title>", status_code=404))
+
+        with pytest.raises(requests.HTTPError):
+            fetch_title("http://example.com", session=session)
+
+    def test_not_modified_reuses_cached_title(self, tmp_path):
+        cache = TitleCache(str(tmp_path / "fetch.sqlite3"))
+        fetcher.configure_fetch_cache(True, cache)
+        session = FakeSession(
+            FakeResponse(PAGE, headers={"ETag": '"v1"', "Last-Modified": "Mon"}),
+            FakeResponse(status_code=304))
+
+        assert fetch_title("http://example.com", session=session) == "Test Title"
+        assert fetch_title("http://example.com", session=session) == "Test Title"
+
+        assert session.calls[1]["headers"] == {
+            "If-None-Match": '"v1"', "If-Modified-Since": "Mon"}
+        assert (cache.hits, cache.misses) == (1, 1)
+        cache.close()
@@ -0,0 +1,136 @@
+"""
+Unit tests for concurrent bulk URL ingestion
+"""
+
+import asyncio
+import time
+from threading import Lock
+from urllib.parse import urlsplit
+
+import pytest
+
+import main
+from batch import BatchJob
+from ingest import RobotsCache, TopicResolver, resolve_topics
+
+
+class FakeResponse:
+    def __init__(self, text="", status_code=200):
+        self.text = text
+        self.status_code = status_code
+        self.headers = {}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def iter_content(self, chunk_size):
+        yield self.text.encode("utf-8")
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def close(self):
+        pass
+
+
+class FakeWeb:
+    """Session stub that serves titles, robots.txt rules and tracks concurrency per host"""
+
+    def __init__(self, robots=None, latency=0.05):
+        self.robots = robots or {}
+        self.latency = latency
+        self.active = {}
+        self.peak = {}
+        self.peak_total = 0
+        self.robots_requests = 0
+        self._lock = Lock()
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        parts = urlsplit(url)
+        if parts.path == "/robots.txt":
+            with self._lock:
+                self.robots_requests += 1
+            rules = self.robots.get(parts.netloc)
+            return FakeResponse(rules) if rules is not None else FakeResponse(status_code=404)
+        if parts.path == "/broken":
+            raise ConnectionError("connection reset")
+        with self._lock:
+            self.active[parts.netloc] = self.active.get(parts.netloc, 0) + 1
+            self.peak[parts.netloc] = max(self.peak.get(parts.netloc, 0),
+                                          self.active[parts.netloc])
+            self.peak_total = max(self.peak_total, sum(self.active.values()))
+        time.sleep(self.latency)
+        with self._lock:
+            self.active[parts.netloc] -= 1
+        return FakeResponse(f"<title>{parts.netloc}{parts.path}</title>")
+
+
+def resolve(web, urls, **kwargs):
+    return resolve_topics(urls, robots=RobotsCache(session=web), session=web, **kwargs)
+
+
+class TestResolveTopics:
+    """Tests for bulk title resolution"""
+
+    def test_results_keep_order_and_report_errors(self):
+        web = FakeWeb(robots={"b.com": "User-agent: *\nDisallow: /private"})
+        urls = ["http://a.com/1", "http://b.com/private/2", "http://a.com/broken",
+                "ftp://a.com/3", "http://b.com/4"]
+
+        results = resolve(web, urls)
+
+        assert [r.url for r in results] == urls
+        assert results[0].topic == "a.com/1"
+        assert "robots.txt" in results[1].error
+        assert "connection reset" in results[2].error
+        assert results[3].error == "지원하지 않는 URL입니다"
+        assert results[4].topic == "b.com/4"
+
+    def test_per_host_and_global_limits(self):
+        web = FakeWeb()
+        urls = [f"http://{host}/{i}" for host in ("a.com", "b.com", "c.com")
+                for i in range(6)]
+
+        start = time.perf_counter()
+        results = resolve(web, urls, concurrency=5, per_host=2)
+        elapsed = time.perf_counter() - start
+
+        assert all(r.ok for r in results)
+        assert max(web.peak.values()) == 2
+        assert web.peak_total <= 5
+        # 18 requests, 5 at a time, well under the 0.9s a sequential run would take
+        assert elapsed < 0.6
+
+    def test_robots_fetched_once_per_host(self):
+        web = FakeWeb(latency=0)
+        urls = [f"http://a.com/{i}" for i in range(10)] + ["http://b.com/1"]
+
+        resolve(web, urls)
+
+        assert web.robots_requests == 2
+
+
+class TestBatchUrlJobs:
+    """Tests for resolving URL topics in batch jobs"""
+
+    def test_failed_url_is_reported_per_job(self):
+        web = FakeWeb(latency=0)
+        topics = TopicResolver(robots=RobotsCache(session=web), session=web)
+        job = BatchJob(id="x", url="http://a.com/broken")
+
+        with pytest.raises(ValueError, match="connection reset"):
+            asyncio.run(main.arun_job(job, [], topics=topics))
+
+    def test_shared_resolver_fetches_each_url_once(self):
+        web = FakeWeb(latency=0)
+        requested = []
+        get = web.get
+        web.get = lambda url, **kwargs: requested.append(url) or get(url, **kwargs)
+        topics = TopicResolver(robots=RobotsCache(session=web), session=web)
+
+        results = [topics.resolve("http://a.com/1") for _ in range(3)]
+
+        assert [r.topic for r in results] == ["a.com/1"] * 3
+        assert requested.count("http://a.com/1") == 1
@@ -0,0 +1,110 @@
+"""
+Unit tests for the persistent LLM response cache
+"""
+
+import time
+from unittest.mock import Mock
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import llm
+import llm_cache
+from llm_cache import ResponseCache, cache_key
+
+MODEL = "claude-3-5-sonnet-20240620"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def enabled_cache(cache):
+    llm_cache.configure_cache(enabled=True, cache=cache)
+    return cache
+
+
+def reply(content="답변"):
+    return AIMessage(content=content, usage_metadata={
+        "input_tokens": 100, "output_tokens": 50, "total_tokens": 150})
+
+
+class TestResponseCache:
+    """Tests for the SQLite cache itself"""
+
+    def test_key_depends_on_model_prompt_and_params(self):
+        """Test that every key component changes the key"""
+        base = cache_key(MODEL, "prompt", {"temperature": 0.5})
+        assert base == cache_key(MODEL, "prompt", {"temperature": 0.5})
+        assert base != cache_key("other-model", "prompt", {"temperature": 0.5})
+        assert base != cache_key(MODEL, "prompt 2", {"temperature": 0.5})
+        assert base != cache_key(MODEL, "prompt", {"temperature": 1.0})
+
+    def test_ttl_expires_entries(self, cache):
+        """Test that entries older than the TTL are treated as misses"""
+        cache.put("k", MODEL, "value")
+        assert cache.get("k") == "value"
+
+        cache.ttl = 0
+        time.sleep(0.01)
+        assert cache.get("k") is None
+        assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0, "bytes": 0}
+
+    def test_lru_eviction_respects_size_limit(self, cache):
+        """Test that the least recently used entries are evicted first"""
+        cache.max_bytes = 10
+        cache.put("a", MODEL, "aaaa")
+        time.sleep(0.01)
+        cache.put("b", MODEL, "bbbb")
+        time.sleep(0.01)
+        cache.get("a")
+        cache.put("c", MODEL, "cccc")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "aaaa"
+        assert cache.get("c") == "cccc"
+
+    def test_persists_across_instances(self, tmp_path):
+        """Test that cached responses survive a restart"""
+        path = str(tmp_path / "cache.sqlite3")
+        first = ResponseCache(path=path)
+        first.put("k", MODEL, "value")
+        first.close()
+
+        second = ResponseCache(path=path)
+        assert second.get("k") == "value"
+        second.close()
+
+
+class TestCachedModelCalls:
+    """Tests for cache integration in call_model"""
+
+    def test_hit_skips_model_and_costs_nothing(self, enabled_cache):
+        """Test that a repeated call is served from cache at zero cost"""
+        model = Mock()
+        model.invoke.return_value = reply()
+
+        first = llm.call_model(model, MODEL, "prompt")
+        second = llm.call_model(model, MODEL, "prompt")
+
+        assert model.invoke.call_count == 1
+        assert first.cost > 0 and not first.cached
+        assert second.content == first.content
+        assert second.cached
+        assert (second.input_tokens, second.output_tokens, second.cost) == (0, 0, 0.0)
+
+    def test_bypass_switch(self, enabled_cache):
+        """Test that disabling the cache always calls the model"""
+        llm_cache.configure_cache(enabled=False)
+        model = Mock()
+        model.invoke.return_value = reply()
+
+        llm.call_model(model, MODEL, "prompt")
+        llm.call_model(model, MODEL, "prompt")
+
+        assert model.invoke.call_count == 2
+        assert enabled_cache.stats()["entries"] == 0
@@ -0,0 +1,109 @@
+"""
+Unit tests for map-reduce article generation
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import main
+import mapreduce
+from llm import ModelCall
+from stubs import AsyncStubModel
+
+
+pytestmark = pytest.mark.usefixtures("whitespace_tokens")
+
+
+def fake_call(prompt):
+    return ModelCall(content="note " * 5, input_tokens=len(prompt.split()),
+                     output_tokens=5, cost=0.01)
+
+
+def turns(count, words=10):
+    return [{"role": f"sage{i % 2}", "content": " ".join(["word"] * words)}
+            for i in range(count)]
+
+
+class TestPack:
+    """Tests for token-budgeted grouping"""
+
+    def test_groups_stay_under_budget(self):
+        """Test that consecutive texts are grouped without exceeding the budget"""
+        texts = ["a b c", "d e", "f g h i", "j"]
+        assert mapreduce.pack(texts, 5) == [["a b c", "d e"], ["f g h i", "j"]]
+
+    def test_oversized_text_gets_own_group(self):
+        """Test that a text over the budget is not split or dropped"""
+        assert mapreduce.pack(["a b c d e f", "g"], 3) == [["a b c d e f"], ["g"]]
+
+
+class TestMapReduceNotes:
+    """Tests for condensing a debate into section notes"""
+
+    def test_accounts_every_sub_call(self):
+        """Test that each chunk is condensed and every call is returned"""
+        notes, calls = mapreduce.map_reduce_notes(fake_call, "Topic", turns(12), budget=40)
+
+        # 12 turns of 11 tokens fit 3 per chunk -> 4 notes that fit the budget
+        assert len(notes) == 4
+        assert len(calls) == 4
+
+    def test_reduces_notes_over_budget(self):
+        """Test that notes over the budget are merged hierarchically"""
+        notes, calls = mapreduce.map_reduce_notes(fake_call, "Topic", turns(40), budget=24)
+
+        assert sum(len(note.split()) for note in notes) <= 24
+        assert len(calls) > 20
+
+    def test_async_matches_sync(self):
+        """Test that the async variant produces the same notes and calls"""
+        async def acall(prompt):
+            return fake_call(prompt)
+
+        sync = mapreduce.map_reduce_notes(fake_call, "Topic", turns(40), budget=24)
+        result = asyncio.run(
+            mapreduce.amap_reduce_notes(acall, "Topic", turns(40), budget=24))
+
+        assert result == sync
+
+    def test_estimate_counts_map_and_reduce_calls(self):
+        """Test that the estimate includes a call per chunk and per merge"""
+        inputs, notes = mapreduce.estimate_note_calls(7000, 1000, budget=3000)
+        assert len(inputs) == 3 and notes == 3000
+
+        # 3 notes of 2000 tokens are merged into 2, which cannot shrink further
+        inputs, notes = mapreduce.estimate_note_calls(7000, 2000, budget=3000)
+        assert len(inputs) == 5 and notes == 4000
+
+
+class TestMapReduceWorkflow:
+    """Tests for the map_reduce article mode in the workflow"""
+
+    def test_article_usage_includes_notes(self, monkeypatch):
+        """Test that input_tokens and cost cover the note sub-calls"""
+        stub = AsyncStubModel(latency=0)
+        monkeypatch.setattr(main, "model", stub)
+        sages = main.load_personas('personas.json')[:2]
+        graph = main.create_workflow(sages, use_async=True)
+
+        result = asyncio.run(graph.ainvoke({"topic": "Test", "article_mode": "map_reduce"}))
+
+        # initiate + 4 turns + 1 note + article + metadata
+        assert stub.calls == 8
+        assert result["input_tokens"] == 10 * stub.calls
+        assert result["content"]
+
+    def test_single_mode_unchanged(self, monkeypatch):
+        """Test that the default mode writes the article in one call"""
+        model = AsyncStubModel(latency=0)
+        model.invoke = lambda prompt: AIMessage(content="reply", usage_metadata={
+            "input_tokens": 10, "output_tokens": 5, "total_tokens": 15})
+        monkeypatch.setattr(main, "model", model)
+        monkeypatch.setattr(main, "map_reduce_notes", None)
+        state = main.ConversationState(topic="Test", messages=turns(5))
+
+        update = main.generate_final_content(state)
+
+        assert update["input_tokens"] == 10
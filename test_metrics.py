@@ -0,0 +1,91 @@
+"""
+Unit tests for the metrics registry, node instrumentation and exporter
+"""
+
+import asyncio
+import json
+import urllib.request
+
+import pytest
+
+import main
+import metrics
+from stubs import AsyncStubModel
+
+
+@pytest.fixture
+def registry():
+    metrics.configure_metrics(enabled=True)
+    return metrics.get_registry()
+
+
+class TestRegistry:
+    """Tests for recording and exposition formats"""
+
+    def test_render_prometheus_text(self, registry):
+        metrics.inc("sages_model_cost_dollars_total", 0.25, model="m")
+        metrics.observe("sages_node_duration_seconds", 0.3, node="continue")
+
+        text = registry.render()
+
+        assert "# TYPE sages_model_cost_dollars_total counter" in text
+        assert 'sages_model_cost_dollars_total{model="m"} 0.25' in text
+        assert "# TYPE sages_node_duration_seconds histogram" in text
+        assert 'sages_node_duration_seconds_bucket{node="continue",le="0.25"} 0' in text
+        assert 'sages_node_duration_seconds_bucket{node="continue",le="0.5"} 1' in text
+        assert 'sages_node_duration_seconds_bucket{node="continue",le="+Inf"} 1' in text
+        assert 'sages_node_duration_seconds_count{node="continue"} 1' in text
+
+    def test_timer_counts_errors(self, registry):
+        with pytest.raises(RuntimeError):
+            with metrics.timer("sages_http_request_duration_seconds",
+                               "sages_http_errors_total", kind="title"):
+                raise RuntimeError("boom")
+
+        snapshot = registry.snapshot()
+        assert snapshot["counters"] == [
+            {"name": "sages_http_errors_total", "labels": {"kind": "title"}, "value": 1}]
+        assert snapshot["histograms"][0]["count"] == 1
+
+    def test_disabled_is_noop(self):
+        node = lambda state: {}
+
+        assert metrics.timed_node("initiate", node) is node
+        assert metrics.timer("sages_node_duration_seconds", node="x") is metrics._NOOP
+        metrics.inc("sages_model_calls_total", model="m")
+        assert metrics.get_registry().snapshot() == {"counters": [], "histograms": []}
+
+
+@pytest.mark.usefixtures("whitespace_tokens")
+def test_workflow_records_nodes_and_calls(registry, monkeypatch):
+    stub = AsyncStubModel(latency=0)
+    monkeypatch.setattr(main, "model", stub)
+    sages = main.load_personas('personas.json')[:2]
+
+    result = asyncio.run(main.arun_workflow(sages, "Test"))
+
+    snapshot = registry.snapshot()
+    nodes = {h["labels"]["node"]: h["count"] for h in snapshot["histograms"]
+             if h["name"] == "sages_node_duration_seconds"}
+    assert nodes["continue"] == 4
+    assert nodes["generate_metadata"] == 1
+    counters = {(c["name"], tuple(sorted(c["labels"].items()))): c["value"]
+                for c in snapshot["counters"]}
+    assert counters[("sages_model_tokens_total",
+                     (("kind", "input"), ("model", main.model_name)))] == 10 * stub.calls
+    assert counters[("sages_model_cost_dollars_total",
+                     (("model", main.model_name),))] == pytest.approx(result["cost"])
+
+
+def test_http_exporter(registry):
+    metrics.inc("sages_cache_hits_total", cache="llm")
+    server = metrics.start_server(0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert 'sages_cache_hits_total{cache="llm"} 1' in response.read().decode()
+        with urllib.request.urlopen(f"{base}/metrics.json") as response:
+            assert json.load(response)["counters"][0]["value"] == 1
+    finally:
+        metrics.stop_server()
@@ -4,6 +4,11 @@ from pydantic import BaseModel
 
 # main.py에서 필요한 함수와 변수를 임포트합니다
 from main import save_to_notion, ConversationState, notion, NOTION_DATABASE_ID
+import httpx
+from notion_client.errors import APIResponseError
+import main
+import notion_schema
+from notion_blocks import PartialPageError
 
 
 class TestSaveToNotion(unittest.TestCase):
@@ -42,7 +47,7 @@ class TestSaveToNotion(unittest.TestCase):
         result = save_to_notion(state)
 
         # 검증
-        self.assertEqual(result, "https://www.notion.so/testpageid")
+        self.assertEqual(result["notion_url"], "https://www.notion.so/testpageid")
         mock_notion.pages.create.assert_called_once()
 
     @patch('main.notion')
@@ -75,7 +80,7 @@ class TestSaveToNotion(unittest.TestCase):
 
         result = save_to_notion(state)
 
-        self.assertEqual(result, "Notion 저장 실패")
+        self.assertEqual(result["notion_url"], "Notion 저장 실패")
 
     @patch('main.notion')
     @patch('main.NOTION_DATABASE_ID', 'test-database-id')
@@ -99,7 +104,87 @@ class TestSaveToNotion(unittest.TestCase):
 
         result = save_to_notion(state)
 
-        self.assertEqual(result, "Notion 저장 실패")
+        self.assertEqual(result["notion_url"], "Notion 저장 실패")
+
+
+
+class TestNotionSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        notion_schema.invalidate_schema()
+        self.database = {
+            'properties': {
+                'Name': {'type': 'title'},
+                'Subtitle': {'type': 'rich_text'},
+                'Slug': {'type': 'rich_text'}
+            }
+        }
+        self.state = ConversationState(
+            topic="Test Topic", content="Test Content", title="Test Title",
+            subtitle="Test Subtitle", description="Test Description", slug="test-slug")
+
+    @patch('main.notion')
+    @patch('main.NOTION_DATABASE_ID', 'test-database-id')
+    def test_schema_retrieved_once(self, mock_notion):
+        # 여러 번 저장해도 데이터베이스 조회는 한 번만 합니다
+        mock_notion.databases.retrieve.return_value = self.database
+        mock_notion.pages.create.return_value = {'id': 'test-page-id'}
+
+        for _ in range(3):
+            save_to_notion(self.state)
+
+        self.assertEqual(mock_notion.databases.retrieve.call_count, 1)
+        self.assertEqual(mock_notion.pages.create.call_count, 3)
+        properties = mock_notion.pages.create.call_args.kwargs['properties']
+        self.assertEqual(set(properties), {'Name', 'Subtitle', 'Slug'})
+
+    @patch('main.notion')
+    @patch('main.NOTION_DATABASE_ID', 'test-database-id')
+    def test_property_error_invalidates_schema(self, mock_notion):
+        # 속성 오류가 나면 스키마를 다시 조회하고 한 번 재시도합니다
+        mock_notion.databases.retrieve.side_effect = [
+            self.database, {'properties': {'Name': {'type': 'title'}}}]
+        mock_notion.pages.create.side_effect = [
+            APIResponseError(code="validation_error", status=400,
+                             message="Subtitle is not a property that exists.",
+                             headers=httpx.Headers(), raw_body_text=""),
+            {'id': 'test-page-id'}]
+
+        result = save_to_notion(self.state)
+
+        self.assertEqual(result["notion_url"], "https://www.notion.so/testpageid")
+        self.assertEqual(mock_notion.databases.retrieve.call_count, 2)
+        properties = mock_notion.pages.create.call_args.kwargs['properties']
+        self.assertEqual(set(properties), {'Name'})
+
+    @patch('main.notion')
+    @patch('main.NOTION_DATABASE_ID', 'test-database-id')
+    def test_append_error_does_not_recreate_page(self, mock_notion):
+        # 페이지를 만든 뒤 이어 붙이기에서 난 오류로는 페이지를 다시 만들지 않습니다
+        mock_notion.databases.retrieve.return_value = self.database
+        mock_notion.pages.create.return_value = {'id': 'test-page-id'}
+        mock_notion.blocks.children.append.side_effect = APIResponseError(
+            code="validation_error", status=400, message="body failed validation",
+            headers=httpx.Headers(), raw_body_text="")
+        state = self.state.model_copy(
+            update={"content": "\n\n".join(f"문단 {i}" for i in range(150))})
+
+        with self.assertRaises(PartialPageError) as raised:
+            main.create_notion_page(state)
+
+        self.assertEqual(raised.exception.page, {'id': 'test-page-id'})
+        self.assertEqual(mock_notion.pages.create.call_count, 1)
+        self.assertEqual(mock_notion.databases.retrieve.call_count, 1)
+
+    def test_schema_expires_after_ttl(self):
+        client = Mock()
+        client.databases.retrieve.return_value = self.database
+        cache = notion_schema.SchemaCache(ttl=-1)
+
+        cache.get(client, 'db')
+        cache.get(client, 'db')
+
+        self.assertEqual(client.databases.retrieve.call_count, 2)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,84 @@
+"""
+Unit tests for the chunked Notion block writer, run against a local fake client
+"""
+
+import pytest
+from notion_client.errors import APIResponseError
+
+from notion_blocks import MAX_TEXT_CHARS, NotionWriter, TokenBucket, content_blocks, split_text
+from stubs import FakeClock, FakeNotion
+
+
+def block_text(block):
+    return "".join(item["text"]["content"] for item in block[block["type"]]["rich_text"])
+
+
+class TestContentBlocks:
+    """Tests for splitting article text into blocks"""
+
+    def test_paragraphs_and_headings(self):
+        blocks = content_blocks("# 제목\n\n첫 문단입니다.\n\n## 소제목\n\n둘째 문단\n이어짐")
+
+        assert [b["type"] for b in blocks] == [
+            "heading_1", "paragraph", "heading_2", "paragraph"]
+        assert block_text(blocks[0]) == "제목"
+        assert block_text(blocks[3]) == "둘째 문단\n이어짐"
+
+    def test_long_paragraph_split_at_sentences(self):
+        sentence = "이것은 긴 문장입니다. " * 300
+        pieces = split_text(sentence.strip())
+
+        assert all(len(piece) <= MAX_TEXT_CHARS for piece in pieces)
+        assert all(piece.endswith(".") for piece in pieces)
+        assert " ".join(pieces) == sentence.strip()
+
+    def test_unbroken_text_is_hard_cut(self):
+        assert [len(p) for p in split_text("x" * 4500)] == [2000, 2000, 500]
+
+
+class TestNotionWriter:
+    """Tests for batched page creation"""
+
+    def test_long_article_is_appended_in_batches(self):
+        notion = FakeNotion()
+        content = "\n\n".join(f"문단 {i}" for i in range(250))
+
+        page = NotionWriter(notion, limiter=TokenBucket(rate=1e9)).create_page(
+            "db", {}, content)
+
+        assert notion.requests == ["create", "append", "append"]
+        assert [block_text(b) for b in notion.stored[page["id"]]] == [
+            f"문단 {i}" for i in range(250)]
+
+    def test_backs_off_on_429(self):
+        notion = FakeNotion(rate_limited=2)
+        clock = FakeClock()
+        writer = NotionWriter(notion, limiter=TokenBucket(rate=1e9), sleep=clock.sleep)
+
+        writer.create_page("db", {}, "본문")
+
+        assert clock.sleeps == [2.0, 2.0]
+        assert writer.requests == 3
+
+    def test_gives_up_after_max_retries(self):
+        notion = FakeNotion(rate_limited=10)
+        writer = NotionWriter(notion, limiter=TokenBucket(rate=1e9),
+                              max_retries=2, sleep=lambda seconds: None)
+
+        with pytest.raises(APIResponseError):
+            writer.create_page("db", {}, "본문")
+        assert writer.requests == 3
+
+
+class TestTokenBucket:
+    """Tests for the client-side rate limiter"""
+
+    def test_limits_sustained_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=3, capacity=3, clock=clock, sleep=clock.sleep)
+
+        for _ in range(9):
+            bucket.acquire()
+
+        # the first 3 requests burst, the next 6 are spaced 1/3s apart
+        assert clock.now == pytest.approx(2.0)
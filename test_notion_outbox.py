@@ -0,0 +1,202 @@
+"""
+Unit tests for the persistent Notion write-behind outbox
+"""
+
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+from notion_client.errors import APIResponseError
+
+import main
+import notion_outbox
+from notion_blocks import PartialPageError
+from notion_outbox import Outbox, OutboxWorker, backoff_delay, pending_id, pending_url
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.sqlite3"))
+    yield box
+    box.close()
+
+
+class TestOutbox:
+    """Tests for the SQLite queue"""
+
+    def test_claimed_item_is_leased(self, outbox):
+        item_id = outbox.enqueue({"title": "제목"})
+
+        assert outbox.claim() == [(item_id, {"title": "제목"}, 1)]
+        # 게시 중인 항목은 다시 가져가지 않습니다
+        assert outbox.claim() == []
+        assert outbox.pending_count() == 1
+
+    def test_failed_item_is_retried_after_backoff(self, outbox):
+        item_id = outbox.enqueue({"title": "제목"})
+        outbox.claim()
+        outbox.mark_retry(item_id, "boom", delay=0)
+
+        assert outbox.claim() == [(item_id, {"title": "제목"}, 2)]
+        assert outbox.get(item_id)["last_error"] == "boom"
+        assert [backoff_delay(n) for n in (1, 2, 3)] == [2, 4, 8]
+        assert backoff_delay(100) == notion_outbox.BACKOFF_MAX
+
+    def test_pending_items_survive_restart(self, tmp_path):
+        path = str(tmp_path / "outbox.sqlite3")
+        first = Outbox(path)
+        item_id = first.enqueue({"title": "제목"})
+        first.close()
+
+        second = Outbox(path)
+        published = []
+        worker = OutboxWorker(second, lambda payload: published.append(payload) or "url")
+
+        assert worker.process_due() == 1
+        assert published == [{"title": "제목"}]
+        assert second.get(item_id)["status"] == "done"
+        second.close()
+
+    def test_pending_marker_round_trip(self):
+        assert pending_id(pending_url(7)) == 7
+        assert pending_id("https://www.notion.so/abc") is None
+
+
+class TestSaveThroughOutbox:
+    """Tests for the workflow's save node with the outbox enabled"""
+
+    @pytest.fixture(autouse=True)
+    def enable_outbox(self, outbox):
+        notion_outbox.configure_outbox(True, outbox)
+        yield
+        if notion_outbox._worker is not None:
+            notion_outbox._worker.stop()
+
+    def state(self):
+        return main.ConversationState(
+            topic="주제", title="제목", subtitle="부제", description="설명",
+            slug="slug", content="본문")
+
+    @patch('main.NOTION_DATABASE_ID', 'test-db-id')
+    @patch('main.notion')
+    def test_save_returns_pending_then_resolves(self, mock_notion):
+        mock_notion.databases.retrieve.return_value = {
+            'properties': {'Name': {'type': 'title'}}}
+        mock_notion.pages.create.return_value = {'id': 'test-page-id'}
+
+        result = main.save_to_notion(self.state())
+
+        assert pending_id(result["notion_url"]) is not None
+        assert main.resolve_notion_url(result["notion_url"], timeout=5) == \
+            "https://www.notion.so/testpageid"
+
+    @patch('main.NOTION_DATABASE_ID', 'test-db-id')
+    @patch('main.notion')
+    def test_failed_publish_stays_pending(self, mock_notion, outbox):
+        mock_notion.databases.retrieve.side_effect = Exception("API Error")
+
+        result = main.save_to_notion(self.state())
+        item_id = pending_id(result["notion_url"])
+
+        assert "게시 대기 중" in main.resolve_notion_url(result["notion_url"], timeout=0.5)
+        item = outbox.get(item_id)
+        assert item["status"] == "pending"
+        assert item["last_error"] == "API Error"
+
+    @patch('main.NOTION_DATABASE_ID', 'test-db-id')
+    @patch('main.notion')
+    def test_permanent_error_fails_without_retry(self, mock_notion, outbox):
+        mock_notion.databases.retrieve.side_effect = APIResponseError(
+            code="object_not_found", status=404, message="Could not find database",
+            headers=httpx.Headers(), raw_body_text="")
+
+        result = main.save_to_notion(self.state())
+        resolved = main.resolve_notion_url(result["notion_url"], timeout=5)
+
+        item = outbox.get(pending_id(result["notion_url"]))
+        assert item["status"] == "failed" and item["attempts"] == 1
+        assert "게시 실패" in resolved
+
+    @patch('main.NOTION_DATABASE_ID', 'test-db-id')
+    @patch('main.notion')
+    def test_partial_page_keeps_its_url(self, mock_notion, outbox):
+        mock_notion.databases.retrieve.return_value = {
+            'properties': {'Name': {'type': 'title'}}}
+        mock_notion.pages.create.return_value = {'id': 'test-page-id'}
+        mock_notion.blocks.children.append.side_effect = ValueError("body failed validation")
+        state = self.state().model_copy(
+            update={"content": "\n\n".join(f"문단 {i}" for i in range(150))})
+
+        result = main.save_to_notion(state)
+        resolved = main.resolve_notion_url(result["notion_url"], timeout=5)
+
+        item = outbox.get(pending_id(result["notion_url"]))
+        assert item["status"] == "partial" and item["attempts"] == 1
+        assert item["url"] == "https://www.notion.so/testpageid"
+        assert resolved.startswith("https://www.notion.so/testpageid (본문 일부 누락")
+        assert main.published_url(result["notion_url"]) == item["url"]
+        assert main.reusable_page_url(result["notion_url"]) == item["url"]
+        assert mock_notion.pages.create.call_count == 1
+
+
+class TestRetryLimits:
+    """Tests for giving up on items and keeping leases while publishing"""
+
+    def test_gives_up_after_max_attempts(self, outbox, monkeypatch):
+        monkeypatch.setattr(notion_outbox, "MAX_ATTEMPTS", 2)
+        item_id = outbox.enqueue({"title": "제목"})
+
+        def fail(payload):
+            raise ConnectionError("timeout")
+
+        worker = OutboxWorker(outbox, fail)
+        worker.process_due()
+        assert outbox.get(item_id)["status"] == "pending"
+        outbox.mark_retry(item_id, "timeout", delay=0)
+        worker.process_due()
+
+        item = outbox.get(item_id)
+        assert item["status"] == "failed" and item["last_error"] == "timeout"
+        assert worker.process_due() == 0
+
+    def test_partial_page_without_url_fails(self, outbox):
+        item_id = outbox.enqueue({"title": "제목"})
+
+        def partial(payload):
+            raise PartialPageError({"id": "p"}, ConnectionError("reset"))
+
+        OutboxWorker(outbox, partial).process_due()
+
+        assert outbox.get(item_id)["status"] == "failed"
+
+    def test_error_classification(self):
+        assert notion_outbox.is_permanent_error(ValueError("Title field not found"))
+        assert notion_outbox.is_permanent_error(PartialPageError({"id": "p"}, Exception()))
+        assert not notion_outbox.is_permanent_error(ConnectionError())
+        for status, permanent in ((400, True), (404, True), (409, False), (429, False),
+                                  (502, False)):
+            error = APIResponseError(code="x", status=status, message="m",
+                                     headers=httpx.Headers(), raw_body_text="")
+            assert notion_outbox.is_permanent_error(error) is permanent
+
+    def test_lease_is_renewed_while_publishing(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(notion_outbox, "LEASE_SECONDS", 0.15)
+        path = str(tmp_path / "outbox.sqlite3")
+        first, second = Outbox(path), Outbox(path)
+        item_id = first.enqueue({"title": "제목"})
+        stolen = []
+
+        def slow_publish(payload):
+            # 임대 시간보다 오래 걸리는 게시 도중 다른 작업자가 항목을 가져가려고 합니다
+            for _ in range(4):
+                time.sleep(0.1)
+                stolen.extend(second.claim())
+            return "https://www.notion.so/page"
+
+        OutboxWorker(first, slow_publish).process_due()
+
+        assert stolen == []
+        assert first.get(item_id)["status"] == "done"
+        first.close()
+        second.close()
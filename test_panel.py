@@ -0,0 +1,72 @@
+"""
+Unit tests for the parallel panel debate mode
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import main
+from panel import fan_out
+from stubs import AsyncStubModel, SleepyModel
+
+pytestmark = pytest.mark.usefixtures("whitespace_tokens")
+
+
+class TestFanOut:
+    """Tests for the thread fan-out helper"""
+
+    def test_results_keep_input_order(self):
+        """Test that slower early calls still come back first"""
+        def make(i):
+            def call():
+                time.sleep(0.05 * (3 - i))
+                return i
+            return call
+
+        assert fan_out([make(i) for i in range(3)]) == [0, 1, 2]
+
+
+class TestPanelRound:
+    """Tests for one concurrent panel round"""
+
+    def test_round_takes_one_latency(self, monkeypatch):
+        """Test that N sages answer in about one model latency"""
+        monkeypatch.setattr(main, "model", SleepyModel(latency=0.1))
+        monkeypatch.setattr(main, "print_chat_message", lambda message, color: None)
+        sages = main.load_personas('personas.json')[:4]
+        state = main.ConversationState(
+            topic="Test", messages=[{"role": "assistant", "content": "hi"}])
+
+        start = time.perf_counter()
+        update = main.panel_round(state, sages)
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.3
+        assert [m["role"] for m in update["messages"]] == [s.name for s in sages]
+        assert [m["content"] for m in update["messages"]] == [
+            f"answer to {s.instruction.split()[1]}" for s in sages]
+        assert update["input_tokens"] == 40
+        assert update["turn_input_tokens"] == [10] * 4
+
+    def test_panel_workflow(self, monkeypatch):
+        """Test that panel mode routes every debate round through the panel node"""
+        stub = AsyncStubModel(latency=0)
+        monkeypatch.setattr(main, "model", stub)
+        sages = main.load_personas('personas.json')[:3]
+        graph = main.create_workflow(sages, use_async=True)
+
+        async def run():
+            nodes = []
+            async for chunk in graph.astream({"topic": "Test", "debate_mode": "panel"},
+                                             stream_mode="updates"):
+                nodes.extend(chunk)
+            return nodes
+
+        nodes = asyncio.run(run())
+
+        # initiate + 2 rounds of 3 answers reach the 5-message threshold
+        assert nodes[:3] == ["initiate", "panel", "panel"]
+        assert "continue" not in nodes
+        assert stub.calls == 1 + 6 + 2
@@ -0,0 +1,81 @@
+"""
+Unit tests for the pricing registry and cache-aware cost accounting
+"""
+
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import llm
+import pricing
+from pricing import ModelPrice, PricingRegistry, UnknownModelError
+
+
+@pytest.fixture
+def registry():
+    return PricingRegistry.load()
+
+
+class TestPricingRegistry:
+    """Tests for model name resolution"""
+
+    def test_dated_snapshots_use_family_price(self, registry):
+        assert registry.price("claude-3-5-sonnet-20241022") == registry.prices["claude-3-5-sonnet"]
+        assert registry.price("claude-3-5-haiku-latest") == registry.prices["claude-3-5-haiku"]
+
+    def test_longest_prefix_wins(self, registry):
+        assert registry.price("claude-opus-4-1-20250805") == registry.prices["claude-opus-4-1"]
+        assert registry.price("claude-opus-4-20250514") == registry.prices["claude-opus-4"]
+
+    def test_unknown_model(self, registry):
+        with pytest.raises(UnknownModelError, match="gpt-4o"):
+            registry.price("gpt-4o")
+        # 계열 이름의 일부만 같은 모델은 접두사로 보지 않습니다
+        with pytest.raises(ValueError):
+            registry.price("claude-3-5-sonnetish")
+
+    def test_cache_rates_default_from_input_rate(self, tmp_path):
+        path = tmp_path / "pricing.json"
+        path.write_text(json.dumps({"models": {"test-model": {"input": 2.0, "output": 10.0}}}))
+
+        price = PricingRegistry.load(str(path)).price("test-model")
+
+        assert price == ModelPrice(input=2.0, output=10.0, cache_read=0.2, cache_write=2.5)
+
+    def test_configure_pricing(self, tmp_path):
+        path = tmp_path / "pricing.json"
+        path.write_text(json.dumps({"models": {"new-model": {"input": 1.0, "output": 1.0}}}))
+        try:
+            pricing.configure_pricing(path=str(path))
+            assert llm.calculate_cost(1_000_000, 0, "new-model") == pytest.approx(1.0)
+        finally:
+            pricing.configure_pricing()
+
+
+class TestCacheAccounting:
+    """Tests for pricing prompt-cache reads and writes separately"""
+
+    MODEL = "claude-3-5-sonnet-20240620"
+
+    def test_usage_metadata_cache_details(self):
+        response = AIMessage(content="답변", usage_metadata={
+            "input_tokens": 1000, "output_tokens": 100, "total_tokens": 1100,
+            "input_token_details": {"cache_read": 800, "cache_creation": 100}})
+
+        result = llm.account("prompt", response, self.MODEL)
+
+        assert result.input_tokens == 1000
+        assert (result.cache_read_tokens, result.cache_write_tokens) == (800, 100)
+        expected = (100 * 3.0 + 100 * 15.0 + 800 * 0.3 + 100 * 3.75) / 1_000_000
+        assert result.cost == pytest.approx(expected)
+        assert result.model == self.MODEL
+
+    def test_raw_usage_cache_fields(self):
+        response = AIMessage(content="답변", response_metadata={"usage": {
+            "input_tokens": 10, "output_tokens": 5, "cache_read_input_tokens": 90}})
+
+        result = llm.account("prompt", response, self.MODEL)
+
+        assert (result.input_tokens, result.cache_read_tokens) == (100, 90)
+        assert result.cost == pytest.approx((10 * 3.0 + 5 * 15.0 + 90 * 0.3) / 1_000_000)
@@ -0,0 +1,154 @@
+"""
+Unit tests for per-run span traces in Chrome trace format
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import fetcher
+import main
+import notion_outbox
+import tracing
+from batch import BatchJob
+from ingest import TopicResolver
+from notion_blocks import NotionWriter, TokenBucket
+from stubs import AsyncStubModel, FakeClock, FakeNotion, SleepyModel
+
+pytestmark = pytest.mark.usefixtures("whitespace_tokens")
+
+
+@pytest.fixture
+def trace_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_enabled", True)
+    monkeypatch.setenv("TRACE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def spans(trace, category=None):
+    return [e for e in trace.events
+            if e["ph"] == "X" and (category is None or e["cat"] == category)]
+
+
+class TestTrace:
+    """Tests for recording spans and writing trace files"""
+
+    def test_nested_spans_and_file(self, trace_dir):
+        """Test that nested spans are recorded inside their parent and written to a file"""
+        with tracing.run_trace("abc") as trace:
+            with tracing.span("outer", "node") as outer:
+                with tracing.span("inner", "llm"):
+                    pass
+                outer.set(size=3)
+
+        inner, outer, run = spans(trace)
+        assert (inner["name"], outer["name"], run["name"]) == ("inner", "outer", "run abc")
+        assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+        assert outer["args"] == {"size": 3}
+        data = json.loads((trace_dir / "abc.json").read_text(encoding="utf-8"))
+        assert data["otherData"]["run_id"] == "abc"
+        assert len(data["traceEvents"]) == len(trace.events) + 1
+
+        # 같은 실행 ID를 이어서 실행하면 새 파일에 씁니다
+        with tracing.run_trace("abc") as resumed:
+            pass
+        assert resumed.path == str(trace_dir / "abc-2.json")
+
+    def test_disabled_records_nothing(self, tmp_path):
+        """Test that spans are no-ops when tracing is off"""
+        with tracing.run_trace("abc") as trace:
+            assert tracing.span("x", "node") is tracing._NOOP
+        assert trace is None
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestWorkflowTrace:
+    """Tests for traces of whole workflow runs"""
+
+    def test_panel_calls_overlap_on_separate_lanes(self, trace_dir, monkeypatch):
+        """Test that concurrent panel calls are drawn on separate lanes"""
+        monkeypatch.setattr(main, "model", SleepyModel(latency=0.05))
+        sages = main.load_personas('personas.json')[:3]
+        graph = main.create_workflow(sages)
+
+        with tracing.run_trace("panel") as trace:
+            graph.invoke({"topic": "Test", "debate_mode": "panel"})
+
+        nodes = [e["name"] for e in spans(trace, "node")]
+        assert nodes[:3] == ["initiate", "panel", "panel"]
+        calls = spans(trace, "llm")
+        assert all(call["args"]["input_tokens"] == 10 for call in calls)
+        # 한 라운드의 세 호출은 서로 다른 레인에서 겹쳐 실행됩니다
+        first_round = sorted(calls, key=lambda e: e["ts"])[1:4]
+        assert len({call["tid"] for call in first_round}) == 3
+        assert max(c["ts"] for c in first_round) < min(c["ts"] + c["dur"] for c in first_round)
+
+    def test_concurrent_jobs_write_separate_traces(self, trace_dir, monkeypatch):
+        """Test that concurrent batch jobs do not mix their spans"""
+        monkeypatch.setattr(main, "model", AsyncStubModel(latency=0.01))
+        personas = main.load_personas('personas.json')
+        jobs = [BatchJob(id=f"job{i}", topic=f"Topic {i}") for i in range(2)]
+
+        async def run_all():
+            return await asyncio.gather(*(main.arun_job(job, personas) for job in jobs))
+
+        asyncio.run(run_all())
+
+        for job in jobs:
+            data = json.loads((trace_dir / f"{job.id}.json").read_text(encoding="utf-8"))
+            llm_calls = [e for e in data["traceEvents"] if e.get("cat") == "llm"]
+            # initiate + 4 turns + article + metadata
+            assert len(llm_calls) == 7
+
+    def test_job_url_is_fetched_inside_its_trace(self, trace_dir, monkeypatch):
+        """Test that a batch job's URL title is fetched while its own trace is current"""
+        monkeypatch.setattr(main, "model", AsyncStubModel(latency=0))
+        fetched = []
+
+        def fetch(url, *args):
+            fetched.append((url, tracing.current().run_id))
+            return "가져온 제목"
+
+        monkeypatch.setattr(fetcher, "_fetch_title", fetch)
+        robots = type("Robots", (), {"allowed": lambda self, url: True})()
+        topics = TopicResolver(robots=robots)
+        job = BatchJob(id="url-job", url="https://example.com/a")
+
+        result = asyncio.run(main.arun_job(job, main.load_personas('personas.json'),
+                                           topics=topics))
+
+        assert result["topic"] == "가져온 제목"
+        assert fetched == [("https://example.com/a", "url-job")]
+
+
+class TestNotionTrace:
+    """Tests for Notion requests in traces"""
+
+    def test_notion_retries_are_spans(self, trace_dir):
+        """Test that rate-limit retries show up as request and wait spans"""
+        clock = FakeClock()
+        writer = NotionWriter(FakeNotion(rate_limited=1), limiter=TokenBucket(rate=1e9),
+                              sleep=clock.sleep)
+
+        with tracing.run_trace("notion") as trace:
+            writer.create_page("db", {}, "본문")
+
+        events = [(e["name"], e["args"].get("attempt")) for e in spans(trace, "notion")]
+        assert events == [("pages.create", 0), ("retry wait", None), ("pages.create", 1)]
+        assert "error" in spans(trace, "notion")[0]["args"]
+
+    def test_outbox_publish_is_added_to_written_trace(self, trace_dir, tmp_path):
+        """Test that a publish finished after the run still lands in the run's trace file"""
+        outbox = notion_outbox.Outbox(str(tmp_path / "outbox.sqlite3"))
+        worker = notion_outbox.OutboxWorker(
+            outbox, publish=lambda payload: "https://www.notion.so/p")
+
+        with tracing.run_trace("publish"):
+            item_id = worker.submit({"title": "제목"})
+        worker.process_due()
+
+        data = json.loads((trace_dir / "publish.json").read_text(encoding="utf-8"))
+        published = [e for e in data["traceEvents"] if e.get("name") == "publish"]
+        assert [e["args"]["item_id"] for e in published] == [item_id]
+        outbox.close()
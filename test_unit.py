@@ -2,9 +2,18 @@
 Unit tests for AI Sage Content Generator
 """
 
+import asyncio
+import time
 import pytest
 import json
 from unittest.mock import Mock, patch
+import llm
+import main
+import token_counter
+from reducers import MessageLog, append_messages
+from stubs import AsyncStubModel, FakeEncoding
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
 from main import (
     count_tokens,
     calculate_cost,
@@ -37,6 +46,39 @@ class TestTokenFunctions:
         assert isinstance(result, int)
 
 
+class TestTokenCounter:
+    """Tests for the cached tokenizer service"""
+
+    @pytest.fixture
+    def encoding(self, monkeypatch):
+        fake = FakeEncoding()
+        monkeypatch.setattr(token_counter, "get_encoding", lambda: fake)
+        token_counter.clear_cache()
+        yield fake
+        token_counter.clear_cache()
+
+    def test_repeated_string_is_memoized(self, encoding):
+        """Test that repeated strings are encoded only once"""
+        assert token_counter.count_tokens("one two three") == 3
+        assert token_counter.count_tokens("one two three") == 3
+        assert encoding.single_calls == 1
+        assert token_counter.cache_info()["hits"] == 1
+
+    def test_count_tokens_many_uses_single_batch(self, encoding):
+        """Test that uncached strings are encoded in one batch call"""
+        token_counter.count_tokens("a b")
+        counts = token_counter.count_tokens_many(["a b", "c d e", "", "f"])
+        assert counts == [2, 3, 0, 1]
+        assert encoding.batch_calls == 1
+
+    def test_cache_is_bounded(self, encoding, monkeypatch):
+        """Test that the LRU cache evicts old entries"""
+        monkeypatch.setattr(token_counter._cache, "maxsize", 2)
+        for text in ["a", "b", "c"]:
+            token_counter.count_tokens(text)
+        assert token_counter.cache_info()["size"] == 2
+
+
 class TestCostCalculation:
     """Tests for cost calculation"""
 
@@ -64,6 +106,82 @@ class TestCostCalculation:
         assert cost == 0.0
 
 
+class TestUsageAccounting:
+    """Tests for provider-reported usage accounting"""
+
+    MODEL = "claude-3-5-sonnet-20240620"
+
+    def test_uses_usage_metadata(self, monkeypatch):
+        """Test that reported usage is used without local tokenizing"""
+        monkeypatch.setattr(llm, "count_tokens", Mock(side_effect=AssertionError))
+        response = AIMessage(content="답변", usage_metadata={
+            "input_tokens": 1000, "output_tokens": 1000, "total_tokens": 2000})
+
+        result = llm.account("prompt", response, self.MODEL)
+
+        assert (result.input_tokens, result.output_tokens) == (1000, 1000)
+        assert result.cost == pytest.approx(0.018)
+
+    def test_uses_raw_anthropic_usage(self):
+        """Test fallback to the raw usage block in response_metadata"""
+        response = AIMessage(content="답변", response_metadata={"usage": {
+            "input_tokens": 10, "output_tokens": 5,
+            "cache_read_input_tokens": 90}})
+
+        assert llm.usage_from_response(response) == (100, 5)
+
+    def test_falls_back_to_local_count(self, monkeypatch):
+        """Test local token counting when usage is absent"""
+        monkeypatch.setattr(llm, "count_tokens", lambda text: len(text))
+        model = Mock()
+        model.invoke.return_value = AIMessage(content="abc")
+
+        result = llm.call_model(model, self.MODEL, "prompt")
+
+        assert result.content == "abc"
+        assert (result.input_tokens, result.output_tokens) == (6, 3)
+
+
+class TestStreaming:
+    """Tests for token streaming through call_model"""
+
+    MODEL = "claude-3-5-sonnet-20240620"
+
+    def test_streams_tokens_and_accounts_usage(self):
+        """Test that chunks reach the callback and usage is summed"""
+        model = Mock()
+        model.stream.return_value = iter([
+            AIMessageChunk(content="안녕", usage_metadata={
+                "input_tokens": 1000, "output_tokens": 1, "total_tokens": 1001}),
+            AIMessageChunk(content="하세요", usage_metadata={
+                "input_tokens": 0, "output_tokens": 999, "total_tokens": 999}),
+        ])
+        tokens = []
+
+        result = llm.call_model(model, self.MODEL, "prompt", on_token=tokens.append)
+
+        assert tokens == ["안녕", "하세요"]
+        assert result.content == "안녕하세요"
+        assert (result.input_tokens, result.output_tokens) == (1000, 1000)
+        model.invoke.assert_not_called()
+
+    def test_workflow_streams_each_turn(self, monkeypatch):
+        """Test that every sage turn and the article are streamed by role"""
+        monkeypatch.setattr(token_counter, "get_encoding", FakeEncoding)
+        monkeypatch.setattr(main, "model", GenericFakeChatModel(messages=iter(
+            AIMessage(content=f"reply {i}") for i in range(10))))
+        sages = load_personas('personas.json')[:2]
+        roles = []
+
+        graph = main.create_workflow(
+            sages, on_token=lambda role, text: roles.append(role))
+        graph.invoke({"topic": "Test"})
+
+        assert roles[0] == "assistant"
+        assert roles[-1] == main.ARTICLE_ROLE
+        assert {sage.name for sage in sages} <= set(roles)
+
+
 class TestGetTopic:
     """Tests for topic retrieval"""
 
@@ -82,22 +200,19 @@ class TestGetTopic:
         topic = get_topic("")
         assert topic == ""
 
-    @patch('main.requests.get')
-    def test_get_topic_url_success(self, mock_get):
+    @patch('main.fetch_title')
+    def test_get_topic_url_success(self, mock_fetch):
         """Test URL topic extraction with successful response"""
-        # Mock successful HTTP response
-        mock_response = Mock()
-        mock_response.text = '<html><head><title>Test Title</title></head></html>'
-        mock_get.return_value = mock_response
+        mock_fetch.return_value = "Test Title"
 
         topic = get_topic("http://example.com")
         assert topic == "Test Title"
 
-    @patch('main.requests.get')
-    def test_get_topic_url_failure(self, mock_get):
+    @patch('main.fetch_title')
+    def test_get_topic_url_failure(self, mock_fetch):
         """Test URL topic extraction with failed response"""
         # Mock failed HTTP response
-        mock_get.side_effect = Exception("Network error")
+        mock_fetch.side_effect = Exception("Network error")
 
         topic = get_topic("http://example.com")
         assert topic == "URL에서 주제를 가져오는데 실패했습니다"
@@ -172,6 +287,54 @@ class TestConversationState:
         assert state.cost == 0.6
 
 
+class TestMessageLog:
+    """Tests for the append-only message log reducer"""
+
+    def test_append_shares_history_without_mutation(self):
+        """Test that appending returns a new log and leaves the old one intact"""
+        first = append_messages([], [{"role": "a", "content": "1"}])
+        second = append_messages(first, [{"role": "b", "content": "2"}])
+        branch = append_messages(first, [{"role": "c", "content": "3"}])
+
+        assert len(first) == 1
+        assert [m["content"] for m in second] == ["1", "2"]
+        assert [m["content"] for m in branch] == ["1", "3"]
+
+    def test_does_not_mutate_caller_list(self):
+        """Test that the initial list passed by the caller is copied"""
+        initial = [{"role": "a", "content": "1"}]
+        append_messages(initial, [{"role": "b", "content": "2"}])
+        assert initial == [{"role": "a", "content": "1"}]
+
+    def test_tail_and_negative_indexing(self):
+        """Test reading recent turns without materializing the history"""
+        log = MessageLog()
+        for i in range(10):
+            log = log.extend([{"role": "r", "content": str(i)}])
+
+        assert log[-1]["content"] == "9"
+        assert [m["content"] for m in log[-3:]] == ["7", "8", "9"]
+        assert log[0]["content"] == "0"
+        assert len(log) == 10
+
+    def test_nodes_return_deltas(self, monkeypatch, whitespace_tokens):
+        """Test that a debate turn returns only the new message and usage"""
+        model = Mock()
+        model.invoke.return_value = AIMessage(content="reply", usage_metadata={
+            "input_tokens": 10, "output_tokens": 5, "total_tokens": 15})
+        monkeypatch.setattr(main, "model", model)
+        monkeypatch.setattr(main, "print_chat_message", lambda message, color: None)
+        sage = load_personas('personas.json')[0]
+        state = ConversationState(
+            topic="Test", messages=[{"role": "assistant", "content": "hi"}],
+            input_tokens=100)
+
+        update = main.continue_conversation(state, [sage])
+
+        assert update["messages"] == [{"role": sage.name, "content": "reply"}]
+        assert update["input_tokens"] == 10
+
+
 class TestEvaluateConversation:
     """Tests for conversation evaluation"""
 
@@ -218,5 +381,40 @@ class TestEvaluateConversation:
         assert evaluate_conversation(state) == True
 
 
+@pytest.mark.usefixtures("whitespace_tokens")
+class TestAsyncWorkflow:
+    """Tests for the ainvoke-based workflow engine"""
+
+    def test_arun_workflow_completes(self, monkeypatch):
+        """Test that the async graph runs every node to completion"""
+        stub = AsyncStubModel(latency=0)
+        monkeypatch.setattr(main, "model", stub)
+        sages = load_personas('personas.json')[:2]
+
+        result = asyncio.run(main.arun_workflow(sages, "Test"))
+
+        assert len(result["messages"]) == 5
+        assert result["content"]
+        assert result["input_tokens"] == 10 * stub.calls
+
+    def test_concurrent_runs_overlap(self, monkeypatch):
+        """Test that concurrent runs overlap their model waits"""
+        stub = AsyncStubModel(latency=0.05)
+        monkeypatch.setattr(main, "model", stub)
+        sages = load_personas('personas.json')[:2]
+
+        async def run_many():
+            return await asyncio.gather(
+                *[main.arun_workflow(sages, f"Topic {i}") for i in range(5)])
+
+        start = time.perf_counter()
+        results = asyncio.run(run_many())
+        elapsed = time.perf_counter() - start
+
+        assert len(results) == 5
+        # 5 runs x 8 calls x 50ms would take 2s sequentially
+        assert elapsed < 1.0
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
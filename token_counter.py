@@ -0,0 +1,114 @@
+"""
+토큰 계산 서비스
+
+인코딩은 프로세스당 한 번만 로드하고, 페르소나 instruction이나 고정 프롬프트처럼
+반복되는 문자열의 토큰 수는 크기가 제한된 LRU 캐시에 보관합니다.
+"""
+
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from typing import List
+
+import tiktoken
+
+ENCODING_NAME = "cl100k_base"
+CACHE_SIZE = 4096
+# 이보다 긴 문자열은 재사용 가능성이 낮으므로 캐시하지 않습니다 (대화 전체 프롬프트 등)
+MAX_CACHED_LENGTH = 2000
+BATCH_THREADS = os.cpu_count() or 1
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = ENCODING_NAME):
+    """인코딩을 한 번만 로드하여 재사용합니다."""
+    return tiktoken.get_encoding(name)
+
+
+class TokenCountCache:
+    """스레드 안전한 LRU 토큰 수 캐시"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str):
+        with self._lock:
+            count = self._data.get(text)
+            if count is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(text)
+            self.hits += 1
+            return count
+
+    def put(self, text: str, count: int):
+        if len(text) > MAX_CACHED_LENGTH:
+            return
+        with self._lock:
+            self._data[text] = count
+            self._data.move_to_end(text)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+_cache = TokenCountCache()
+
+
+def count_tokens(text: str) -> int:
+    """문자열의 토큰 수를 계산합니다."""
+    if not text:
+        return 0
+    cached = _cache.get(text)
+    if cached is not None:
+        return cached
+    count = len(get_encoding().encode_ordinary(text))
+    _cache.put(text, count)
+    return count
+
+
+def count_tokens_many(texts: List[str]) -> List[int]:
+    """여러 문자열의 토큰 수를 한 번의 배치 인코딩으로 계산합니다."""
+    counts: List[int] = [0] * len(texts)
+    pending_idx: List[int] = []
+    pending_texts: List[str] = []
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        cached = _cache.get(text)
+        if cached is not None:
+            counts[i] = cached
+        else:
+            pending_idx.append(i)
+            pending_texts.append(text)
+
+    if pending_texts:
+        encoded = get_encoding().encode_ordinary_batch(
+            pending_texts, num_threads=BATCH_THREADS)
+        for i, text, tokens in zip(pending_idx, pending_texts, encoded):
+            counts[i] = len(tokens)
+            _cache.put(text, counts[i])
+    return counts
+
+
+def cache_info() -> dict:
+    """캐시 상태(hit/miss, 크기)를 반환합니다."""
+    return {"hits": _cache.hits, "misses": _cache.misses,
+            "size": len(_cache), "maxsize": _cache.maxsize}
+
+
+def clear_cache():
+    _cache.clear()
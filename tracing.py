@@ -0,0 +1,240 @@
+"""
+실행 추적
+
+워크플로우 실행 하나의 구간(span) 트리(노드 → 모델 호출, 주제 URL/피드 가져오기, Notion
+요청과 재시도 대기)를 시작/종료 시각, 토큰 수, 크기와 함께 기록하고, 실행이 끝나면 실행
+ID별 Chrome trace JSON 파일로 저장합니다. chrome://tracing이나 Perfetto UI
+(ui.perfetto.dev)에서 열면 순차로 기다린 구간과 겹쳐 실행된 구간이 시간축에 보입니다.
+
+현재 추적은 contextvars로 전달되므로 동시에 진행되는 배치 작업의 구간이 섞이지 않습니다.
+Notion 아웃박스 작업자처럼 실행이 끝난 뒤 다른 스레드에서 이어지는 작업은 continue_trace로
+같은 추적에 기록하며, 이미 쓴 추적 파일은 그때 다시 씁니다.
+동시에 실행되는 스레드와 asyncio 태스크는 각각 별도의 레인(tid)에 그려집니다.
+추적이 꺼져 있거나 실행 밖에서 호출되면 구간 기록은 아무것도 하지 않습니다.
+
+환경 변수:
+    TRACE       "on"/"1"/"true"이면 실행마다 추적 파일을 씁니다 (기본값: off, TRACE_DIR가 있으면 on)
+    TRACE_DIR   추적 파일 디렉터리 (기본값: .cache/traces)
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_DIR = os.path.join(".cache", "traces")
+PID = 1
+
+
+def _lane_key() -> Tuple[str, int]:
+    """현재 asyncio 태스크 또는 스레드"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return "task", id(task)
+    return "thread", threading.get_ident()
+
+
+class Span:
+    """진행 중인 구간. set()으로 인자(토큰 수, 크기 등)를 더할 수 있습니다."""
+
+    __slots__ = ("trace", "name", "category", "args", "start", "lane")
+
+    def __init__(self, trace: "Trace", name: str, category: str, args: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def set(self, **args: Any):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.lane = self.trace.lane()
+        self.start = self.trace.now()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.trace.add({"name": self.name, "cat": self.category, "ph": "X",
+                        "ts": self.start, "dur": self.trace.now() - self.start,
+                        "pid": PID, "tid": self.lane, "args": self.args})
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **args: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    """실행 하나의 구간 이벤트를 모읍니다. 시각은 실행 시작부터의 마이크로초입니다."""
+
+    def __init__(self, run_id: str, clock: Callable[[], float] = time.perf_counter):
+        self.run_id = run_id
+        self._clock = clock
+        self._origin = clock()
+        self.started_at = time.time()
+        self.events: List[Dict[str, Any]] = []
+        self.path: Optional[str] = None
+        self._lanes: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return (self._clock() - self._origin) * 1e6
+
+    def lane(self) -> int:
+        key = _lane_key()
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = len(self._lanes) + 1
+                label = "main" if lane == 1 else f"{key[0]} {lane}"
+                self.events.append({"name": "thread_name", "ph": "M", "pid": PID,
+                                    "tid": lane, "args": {"name": label}})
+            return lane
+
+    def add(self, event: Dict[str, Any]):
+        with self._lock:
+            self.events.append(event)
+
+    def span(self, name: str, category: str, **args: Any) -> Span:
+        return Span(self, name, category, args)
+
+    def instant(self, name: str, category: str, **args: Any):
+        self.add({"name": name, "cat": category, "ph": "i", "s": "t", "ts": self.now(),
+                  "pid": PID, "tid": self.lane(), "args": args})
+
+    def to_json(self) -> Dict[str, Any]:
+        with self._lock:
+            events = [{"name": "process_name", "ph": "M", "pid": PID, "tid": 0,
+                       "args": {"name": f"run {self.run_id}"}}, *self.events]
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"run_id": self.run_id, "started_at": self.started_at}}
+
+    def write(self, directory: str = DEFAULT_DIR) -> str:
+        """<directory>/<실행 ID>.json에 씁니다. 이어서 실행한 경우 기존 파일을 덮어쓰지 않습니다."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.run_id}.json")
+        attempt = 1
+        while os.path.exists(path):
+            attempt += 1
+            path = os.path.join(directory, f"{self.run_id}-{attempt}.json")
+        # 경로를 먼저 정해 두어, 쓰는 동안 더해진 구간은 continue_trace가 다시 쓰게 합니다
+        self.path = path
+        self.save()
+        return path
+
+    def save(self):
+        """이미 정한 경로에 다시 씁니다."""
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, ensure_ascii=False)
+
+
+def _env_enabled() -> bool:
+    value = os.getenv("TRACE")
+    if value is None:
+        return bool(os.getenv("TRACE_DIR"))
+    return value.lower() in ("on", "1", "true", "yes")
+
+
+_enabled = _env_enabled()
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def configure_tracing(enabled: bool = True):
+    global _enabled
+    _enabled = enabled
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def span(name: str, category: str, **args: Any):
+    """현재 실행의 추적에 구간을 기록합니다. 추적 중이 아니면 아무것도 하지 않습니다."""
+    trace = _current.get()
+    return trace.span(name, category, **args) if trace is not None else _NOOP
+
+
+def instant(name: str, category: str, **args: Any):
+    trace = _current.get()
+    if trace is not None:
+        trace.instant(name, category, **args)
+
+
+@contextmanager
+def run_trace(run_id: str, directory: Optional[str] = None) -> Iterator[Optional[Trace]]:
+    """with 블록 동안 run_id의 구간을 모으고, 끝나면(실패해도) 파일로 씁니다."""
+    if not _enabled:
+        yield None
+        return
+    trace = Trace(run_id)
+    token = _current.set(trace)
+    try:
+        with trace.span(f"run {run_id}", "run"):
+            yield trace
+    finally:
+        _current.reset(token)
+        trace.path = trace.write(directory or os.getenv("TRACE_DIR") or DEFAULT_DIR)
+
+
+@contextmanager
+def continue_trace(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """다른 스레드에서 trace에 이어서 기록합니다. 이미 파일로 쓴 추적이면 끝날 때 다시 씁니다."""
+    if trace is None:
+        yield None
+        return
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        if trace.path:
+            trace.save()
+
+
+def traced_node(name: str, node: Callable) -> Callable:
+    """노드 실행을 구간으로 기록하도록 감쌉니다. 추적이 꺼져 있으면 노드를 그대로 반환합니다."""
+    if not _enabled:
+        return node
+    if inspect.iscoroutinefunction(node):
+        @wraps(node)
+        async def atraced(state):
+            with span(name, "node") as current_span:
+                update = await node(state)
+                current_span.set(updated=sorted(update or ()))
+                return update
+        return atraced
+
+    @wraps(node)
+    def traced(state):
+        with span(name, "node") as current_span:
+            update = node(state)
+            current_span.set(updated=sorted(update or ()))
+            return update
+    return traced